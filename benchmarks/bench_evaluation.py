@@ -0,0 +1,36 @@
+"""Benchmarks of fitness evaluation against the in-process stand-in for Elasticsearch."""
+
+import random
+
+import common
+
+from queries import EvaluationMode, Queries
+
+
+class Evaluation():
+    params = [
+            common.population_sizes(),
+            [ "search", "profile" ],
+            ]
+    param_names = [ "population_size", "mode" ]
+
+    def setup(self, population_size, mode):
+        random.seed(0)
+
+        self.index = common.local_index()
+        self.target_id = self.index.random_document()['hits']['hits'][0]['_id']
+
+        # Queries from the indexed words, so that some of them match
+        wordlist = self.index.vocabulary.wordlist()
+
+        self.queries = Queries(
+                words = wordlist,
+                queries = common.random_queries(population_size, wordlist),
+                )
+
+    def time_evaluate(self, population_size, mode):
+        self.queries.evaluate(
+                index = self.index,
+                target_id = self.target_id,
+                mode = EvaluationMode[mode.upper()],
+                )
@@ -0,0 +1,60 @@
+"""Benchmarks of the evolutionary actions on populations."""
+
+import random
+
+import common
+
+from columnar_queries import ColumnarQueries
+from queries import Queries, RecombinationMode, SelectionMode
+from stringmaker import StringMaker
+
+
+class Population():
+    params = [
+            common.population_sizes(),
+            [ "queries", "columnar" ],
+            ]
+    param_names = [ "population_size", "layout" ]
+
+    def setup(self, population_size, layout):
+        random.seed(0)
+
+        wordlist = common.words(common.N_WORDS)
+        population_class = ColumnarQueries if layout == "columnar" else Queries
+
+        self.queries = population_class(
+                words = wordlist,
+                queries = common.random_queries(population_size, wordlist),
+                )
+
+    def time_mutate(self, population_size, layout):
+        self.queries.mutate()
+
+    def time_select(self, population_size, layout):
+        self.queries.select()
+
+    def time_select_tournament(self, population_size, layout):
+        self.queries.select(
+                mode = SelectionMode.TOURNAMENT,
+                n_elites = 1,
+                )
+
+    def time_random_purge(self, population_size, layout):
+        self.queries.random_purge(population_size // 2)
+
+    def time_remove_duplicates(self, population_size, layout):
+        self.queries.remove_duplicates()
+
+    def time_recombine(self, population_size, layout):
+        self.queries.recombine()
+
+    def time_recombine_uniform(self, population_size, layout):
+        self.queries.recombine(
+                mode = RecombinationMode.UNIFORM
+                )
+
+    def time_average_score(self, population_size, layout):
+        self.queries.average_score()
+
+    def time_stringmaker_queries(self, population_size, layout):
+        StringMaker.queries(self.queries)
@@ -0,0 +1,36 @@
+"""Benchmarks of drawing words from vocabularies."""
+
+import random
+
+import common
+
+
+class Sampling():
+    params = [
+            common.vocabulary_sizes(),
+            ]
+    param_names = [ "vocabulary_size" ]
+
+    # Draws per timed call
+    n_draws = 1000
+
+    def setup(self, vocabulary_size):
+        random.seed(0)
+
+        self.vocabulary = common.vocabulary(vocabulary_size)
+        self.blacklist = set(self.vocabulary.sample(common.QUERY_LENGTH))
+
+        # Build cached tables outside of the timings
+        self.vocabulary.random_word(weighted = True)
+
+    def time_sample(self, vocabulary_size):
+        for _ in range(self.n_draws):
+            self.vocabulary.sample(1, without = self.blacklist)
+
+    def time_sample_weighted(self, vocabulary_size):
+        for _ in range(self.n_draws):
+            self.vocabulary.sample(1, without = self.blacklist, weighted = True)
+
+    def time_random_word(self, vocabulary_size):
+        for _ in range(self.n_draws):
+            self.vocabulary.random_word(without = self.blacklist)
@@ -0,0 +1,101 @@
+"""Shared fixtures of the benchmark suites.
+
+The scale of the parameter grids is chosen by the runner, see ``run.py``:
+``quick`` for a smoke run, ``default`` for regression checks,
+and ``full`` for population and vocabulary sizes up to a million.
+"""
+
+from __future__ import annotations
+
+from typing import List
+
+import os
+import random
+
+from index import Index
+from local_backend import LocalBackend
+from query import Query
+from vocabulary import Vocabulary
+
+
+SCALES = {
+        'quick': {
+            'population_sizes': [ 10, 1000 ],
+            'vocabulary_sizes': [ 100, 10000 ],
+            },
+        'default': {
+            'population_sizes': [ 10, 1000, 100000 ],
+            'vocabulary_sizes': [ 100, 10000, 100000 ],
+            },
+        'full': {
+            'population_sizes': [ 10, 1000, 100000, 1000000 ],
+            'vocabulary_sizes': [ 100, 10000, 1000000 ],
+            },
+        }
+
+# Vocabulary size of population benchmarks
+N_WORDS = 10000
+
+# Number of documents of the local stand-in for Elasticsearch
+N_DOCUMENTS = 2000
+
+# Words per document and per initial query
+DOCUMENT_LENGTH = 8
+QUERY_LENGTH = 4
+
+
+def scale() -> str:
+    return os.environ.get("BENCHMARK_SCALE", "default")
+
+def population_sizes() -> List[int]:
+    return SCALES[scale()]['population_sizes']
+
+def vocabulary_sizes() -> List[int]:
+    return SCALES[scale()]['vocabulary_sizes']
+
+def words(n: int) -> List[str]:
+    return [
+            "w{}".format(i)
+            for i in range(n)
+            ]
+
+def random_queries(n: int, wordlist: List[str]) -> List[Query]:
+    """Returns queries with random terms and fitness.
+    """
+    return [
+            Query(
+                musts = random.sample(wordlist, QUERY_LENGTH // 2),
+                must_nots = random.sample(wordlist, QUERY_LENGTH // 2),
+                fitness = random.random(),
+                )
+            for _ in range(n)
+            ]
+
+def vocabulary(n: int) -> Vocabulary:
+    """Returns vocabulary of ``n`` words with Zipf-like counts.
+    """
+    vocabulary = Vocabulary()
+
+    for i, word in enumerate(words(n)):
+        vocabulary.add_words([ word ] * (1 + n // (i + 1) // 100))
+
+    return vocabulary
+
+def local_index(n_words: int = N_WORDS) -> Index:
+    """Returns index on the in-process backend, as stand-in for Elasticsearch,
+    without fitness cache.
+    """
+    index = Index(
+            "benchmark",
+            backend = LocalBackend("benchmark"),
+            cache_size = 0,
+            )
+
+    wordlist = words(n_words)
+
+    index.add_bulk(
+            " ".join(random.sample(wordlist, DOCUMENT_LENGTH))
+            for _ in range(N_DOCUMENTS)
+            )
+
+    return index
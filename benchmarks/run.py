@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Runs the benchmark suites and stores the timings as JSON.
+
+Suites are the classes in the ``bench_*.py`` modules of this directory,
+in the style of airspeed velocity: ``params`` and ``param_names`` span a grid,
+``setup`` prepares fresh state for each parameter combination and repetition,
+and each ``time_*`` method is timed once per repetition.
+"""
+
+import argparse
+import datetime
+import importlib
+import inspect
+import itertools
+import json
+import os
+import pathlib
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = pathlib.Path(__file__).resolve().parent
+
+sys.path.append(str(BENCHMARK_DIR.parent / "src" / "python"))
+sys.path.append(str(BENCHMARK_DIR))
+
+
+def parsed_args():
+    parser = argparse.ArgumentParser(
+            description = "Run benchmarks of evolve-a-query."
+            )
+
+    parser.add_argument(
+            "--scale",
+            dest = "scale",
+            type = str,
+            choices = [ "quick", "default", "full" ],
+            default = "default",
+            action = "store",
+            help = "size of parameter grids, 'full' goes up to a million queries and words (default: default)",
+            )
+
+    parser.add_argument(
+            "--repeat",
+            dest = "repeat",
+            type = int,
+            default = 5,
+            action = "store",
+            help = "number of timed repetitions per benchmark (default: 5)",
+            )
+
+    parser.add_argument(
+            "--filter",
+            dest = "filter",
+            type = str,
+            default = None,
+            action = "store",
+            help = "regular expression that benchmark names must match",
+            )
+
+    parser.add_argument(
+            "--output",
+            dest = "output",
+            type = pathlib.Path,
+            default = None,
+            action = "store",
+            help = "path of JSON file to write results to",
+            )
+
+    parser.add_argument(
+            "--compare",
+            dest = "compare",
+            type = pathlib.Path,
+            default = None,
+            action = "store",
+            help = "path of JSON results to compare against, exits with status 1 on regressions",
+            )
+
+    parser.add_argument(
+            "--threshold",
+            dest = "threshold",
+            type = float,
+            default = 1.5,
+            action = "store",
+            help = "ratio of median times above which a benchmark counts as regressed (default: 1.5)",
+            )
+
+    return parser.parse_args()
+
+def benchmarks(pattern):
+    """Yields name, suite class and method name of each benchmark.
+    """
+    for path in sorted(BENCHMARK_DIR.glob("bench_*.py")):
+        module = importlib.import_module(path.stem)
+
+        for class_name, suite in inspect.getmembers(module, inspect.isclass):
+            if suite.__module__ != module.__name__:
+                continue
+
+            for method_name in sorted(dir(suite)):
+                name = "{}.{}.{}".format(path.stem, class_name, method_name)
+
+                if method_name.startswith("time_") \
+                        and (pattern is None or re.search(pattern, name)):
+                    yield name, suite, method_name
+
+def timed(suite, method_name, params, repeat):
+    """Returns wall times in seconds of ``repeat`` calls, each after a fresh setup.
+    """
+    times = []
+
+    for _ in range(repeat):
+        instance = suite()
+        instance.setup(*params)
+        method = getattr(instance, method_name)
+
+        start_time = time.perf_counter()
+        method(*params)
+        times.append(time.perf_counter() - start_time)
+
+    return times
+
+def metadata(args):
+    try:
+        commit = subprocess.run(
+                [ "git", "rev-parse", "HEAD" ],
+                cwd = BENCHMARK_DIR,
+                capture_output = True,
+                text = True,
+                ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+            'timestamp': datetime.datetime.now().isoformat(timespec = "seconds"),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'repeat': args.repeat,
+            }
+
+def key(result):
+    return result['name'], json.dumps(result['params'], sort_keys = True)
+
+def regressions(results, baseline, threshold):
+    """Returns results whose median time exceeds the baseline median by more than ``threshold``.
+    """
+    baseline_medians = {
+            key(result): result['median']
+            for result in baseline['results']
+            }
+
+    return [
+            dict(
+                result,
+                baseline_median = baseline_medians[key(result)],
+                )
+            for result in results
+            if key(result) in baseline_medians
+            and result['median'] > threshold * baseline_medians[key(result)]
+            ]
+
+def main():
+    args = parsed_args()
+
+    # Parameter grids are read when suites are imported
+    os.environ["BENCHMARK_SCALE"] = args.scale
+
+    results = []
+
+    for name, suite, method_name in benchmarks(args.filter):
+        for params in itertools.product(*suite.params):
+            times = timed(suite, method_name, params, args.repeat)
+
+            result = {
+                    'name': name,
+                    'params': dict(zip(suite.param_names, params)),
+                    'min': min(times),
+                    'median': statistics.median(times),
+                    'times': times,
+                    }
+            results.append(result)
+
+            print(
+                    "{:<60} {:<40} {:>12.6f} s".format(
+                        name,
+                        json.dumps(result['params']),
+                        result['median'],
+                        ),
+                    flush = True,
+                    )
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents = True, exist_ok = True)
+
+        with open(args.output, "w") as file:
+            json.dump(
+                    {
+                        'metadata': metadata(args),
+                        'results': results,
+                        },
+                    file,
+                    indent = 4,
+                    )
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            regressed = regressions(results, json.load(file), args.threshold)
+
+        for result in regressed:
+            print(
+                    "regression: {} {} {:.6f} s, baseline {:.6f} s".format(
+                        result['name'],
+                        json.dumps(result['params']),
+                        result['median'],
+                        result['baseline_median'],
+                        )
+                    )
+
+        if len(regressed) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,31 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
+import contextlib
 import json
 import logging
 import pathlib
+import random
 import sys
+import time
 
 sys.path.append("src/python")
 
-from src.python.action import Action
-from src.python.document import ESDocument
-from src.python.index import Index
-from src.python.queries import Queries
-from src.python.query import Query
-from src.python.stringmaker import StringMaker
+import corpus
+import instrumentation
+
+from action import evolutionary_actions
+from document import ESDocument
+from index import Index
+from islands import Islands, ProfileEvaluator, SearchEvaluator
+from local_backend import LocalBackend
+from profiling import Profiler, ProfileMode
+from proposal import PROPOSALS, ProposalMode
+from queries import EvaluationMode, Queries, RecombinationMode, SelectionMode
+from query import Query
+from strategy import FixedSequenceStrategy, GeneticAlgorithmStrategy, WeightedRandomStrategy
+from stringmaker import StringMaker
 
 logging.basicConfig(
         level = logging.ERROR
@@ -31,6 +43,53 @@ def parsed_args():
             help = "path to language file with one sentence per line"
             )
 
+    parser.add_argument(
+            "--backend",
+            dest = "backend",
+            type = str,
+            choices = [ "elasticsearch", "local" ],
+            default = "elasticsearch",
+            action = "store",
+            help = "search engine for indexing and scoring (default: elasticsearch)",
+            )
+
+    parser.add_argument(
+            "--scoring",
+            dest = "scoring",
+            type = str,
+            choices = [ "search", "profile" ],
+            default = "search",
+            action = "store",
+            help = "score each query via the backend, or all queries locally from precomputed target term weights (default: search)",
+            )
+
+    parser.add_argument(
+            "--explain-top",
+            dest = "explain_top",
+            type = int,
+            default = 0,
+            action = "store",
+            help = "number of fittest queries whose full score explanations are requested and shown in interactive mode (default: 0)",
+            )
+
+    parser.add_argument(
+            "--cache-size",
+            dest = "cache_size",
+            type = int,
+            default = 100000,
+            action = "store",
+            help = "maximum number of cached query scores, 0 disables the cache (default: 100000)",
+            )
+
+    parser.add_argument(
+            "--concurrency",
+            dest = "concurrency",
+            type = int,
+            default = None,
+            action = "store",
+            help = "score queries with this many concurrent asynchronous Elasticsearch requests, requires elasticsearch[async] (default: batched synchronous requests)",
+            )
+
     parser.add_argument(
             "--es-host",
             dest = "es_host",
@@ -67,36 +126,440 @@ def parsed_args():
             help = "number of lines from file to use for indexing (default: 0, all lines are used)",
             )
 
-    return parser.parse_args()
+    parser.add_argument(
+            "--bulk-chunk-size",
+            dest = "bulk_chunk_size",
+            type = int,
+            default = 500,
+            action = "store",
+            help = "maximum number of documents per bulk indexing request (default: 500)",
+            )
 
-def _actions(queries):
-    return [
-            Action(
-                title = "Love Is In The Air",
-                descr = "... but for now just clone each query once, doubling the population size.",
-                func = queries.recombine,
-                ),
-            Action(
-                title = "The Weak Shall Perish",
-                descr = "Remove all queries whose scores match the worst score.",
-                func = queries.select,
-                ),
-            Action(
-                title = "Deus Ex Machina",
-                descr = "Remove random queries from the population.",
-                func = queries.random_purge,
-                ),
-            Action(
-                title = "Gamma Party",
-                descr = "Apply random mutations throughout the population. For each query, either a term will be removed or a random new term will be added with a random prefix (+/-).",
-                func = queries.mutate,
-                ),
-            Action(
-                title = "This Town Is Too Small For The Both Of Us",
-                descr = "Remove duplicate queries.",
-                func = queries.remove_duplicates,
-                ),
-            ]
+    parser.add_argument(
+            "--bulk-max-chunk-bytes",
+            dest = "bulk_max_chunk_bytes",
+            type = int,
+            default = 100 * 1024 * 1024,
+            action = "store",
+            help = "maximum size of bulk indexing requests in bytes (default: 100 MiB)",
+            )
+
+    parser.add_argument(
+            "--bulk-threads",
+            dest = "bulk_threads",
+            type = int,
+            default = 1,
+            action = "store",
+            help = "number of threads sending bulk indexing requests (default: 1)",
+            )
+
+    parser.add_argument(
+            "--reuse-index",
+            dest = "reuse_index",
+            type = str,
+            default = None,
+            action = "store",
+            metavar = "SNAPSHOT_DIR",
+            help = "reuse the existing index if it holds the same lines of the language file, with vocabulary snapshots kept in SNAPSHOT_DIR (default: always recreate the index)",
+            )
+
+    parser.add_argument(
+            "--mmap",
+            dest = "mmap",
+            action = "store_true",
+            help = "read the language file through a memory map",
+            )
+
+    parser.add_argument(
+            "--strategy",
+            dest = "strategy",
+            type = str,
+            choices = [ "fixed", "weighted", "ga" ],
+            default = None,
+            action = "store",
+            help = "run without prompts, picking actions by this policy and printing one line of statistics per generation (default: interactive play)",
+            )
+
+    parser.add_argument(
+            "--strategy-sequence",
+            dest = "strategy_sequence",
+            type = _comma_separated(int),
+            default = [0, 3, 1, 4],
+            action = "store",
+            help = "comma-separated action numbers cycled through by strategy 'fixed' (default: 0,3,1,4)",
+            )
+
+    parser.add_argument(
+            "--strategy-weights",
+            dest = "strategy_weights",
+            type = _comma_separated(float),
+            default = None,
+            action = "store",
+            help = "comma-separated relative probabilities of the actions for strategy 'weighted' (default: uniform)",
+            )
+
+    parser.add_argument(
+            "--max-population",
+            dest = "max_population",
+            type = int,
+            default = None,
+            action = "store",
+            help = "population size above which strategy 'ga' removes random queries (default: no limit)",
+            )
+
+    parser.add_argument(
+            "--selection",
+            dest = "selection",
+            type = str,
+            choices = [ "without-lowest", "truncation", "tournament", "roulette" ],
+            default = None,
+            action = "store",
+            help = "selection operator of strategy 'ga' (default: the action 'The Weak Shall Perish')",
+            )
+
+    parser.add_argument(
+            "--elites",
+            dest = "elites",
+            type = int,
+            default = 0,
+            action = "store",
+            help = "number of fittest queries always kept by the selection operator of strategy 'ga' (default: 0)",
+            )
+
+    parser.add_argument(
+            "--recombination",
+            dest = "recombination",
+            type = str,
+            choices = [ "clone", "uniform", "one-point", "union", "intersection" ],
+            default = None,
+            action = "store",
+            help = "recombination mode of the action 'Love Is In The Air', also used by strategy 'ga' (default: clone)",
+            )
+
+    parser.add_argument(
+            "--proposal",
+            dest = "proposal",
+            type = str,
+            choices = [ "uniform", "frequency", "idf", "cooccurrence" ],
+            default = None,
+            action = "store",
+            help = "distribution of new terms for mutations (default: uniform over the word list)",
+            )
+
+    parser.add_argument(
+            "--islands",
+            dest = "islands",
+            type = int,
+            default = None,
+            action = "store",
+            help = "number of populations evolving in parallel processes, requires --strategy (default: one population in this process)",
+            )
+
+    parser.add_argument(
+            "--migration-interval",
+            dest = "migration_interval",
+            type = int,
+            default = 10,
+            action = "store",
+            help = "number of generations between migrations across islands (default: 10)",
+            )
+
+    parser.add_argument(
+            "--migrants",
+            dest = "migrants",
+            type = int,
+            default = 1,
+            action = "store",
+            help = "number of fittest queries each island sends to the next per migration (default: 1)",
+            )
+
+    parser.add_argument(
+            "--workers",
+            dest = "workers",
+            type = int,
+            default = None,
+            action = "store",
+            help = "number of worker processes for islands (default: number of processors)",
+            )
+
+    parser.add_argument(
+            "--json-serializer",
+            dest = "json_serializer",
+            type = str,
+            choices = [ "auto", "orjson", "json" ],
+            default = "auto",
+            action = "store",
+            help = "JSON serializer of Elasticsearch requests and responses, 'auto' uses orjson if it is installed (default: auto)",
+            )
+
+    parser.add_argument(
+            "--http-compress",
+            dest = "http_compress",
+            action = "store_true",
+            help = "gzip Elasticsearch requests and accept compressed responses",
+            )
+
+    parser.add_argument(
+            "--compact-queries",
+            dest = "compact_queries",
+            action = "store_true",
+            help = "send one match clause per kind of term instead of one per term, except for positive terms the analyzer splits into several tokens",
+            )
+
+    parser.add_argument(
+            "--metrics",
+            dest = "metrics",
+            type = pathlib.Path,
+            default = None,
+            action = "store",
+            help = "path of file to write timings and counters of each generation to",
+            )
+
+    parser.add_argument(
+            "--metrics-format",
+            dest = "metrics_format",
+            type = str,
+            choices = [ "jsonl", "prometheus" ],
+            default = "jsonl",
+            action = "store",
+            help = "append one JSON line per generation, or keep the last generation in Prometheus text format (default: jsonl)",
+            )
+
+    parser.add_argument(
+            "--profile",
+            dest = "profile",
+            type = str,
+            choices = [ "cpu", "memory" ],
+            default = None,
+            action = "store",
+            help = "profile CPU time with cProfile or allocations with tracemalloc, and write reports of each generation to --profile-dir",
+            )
+
+    parser.add_argument(
+            "--profile-dir",
+            dest = "profile_dir",
+            type = pathlib.Path,
+            default = pathlib.Path("profile"),
+            action = "store",
+            help = "directory to write profiling reports to (default: profile)",
+            )
+
+    parser.add_argument(
+            "--profile-top",
+            dest = "profile_top",
+            type = int,
+            default = 20,
+            action = "store",
+            help = "number of functions or allocation sites per profiling report (default: 20)",
+            )
+
+    parser.add_argument(
+            "--seed",
+            dest = "seed",
+            type = int,
+            default = None,
+            action = "store",
+            help = "seed for the random number generator",
+            )
+
+    args = parser.parse_args()
+
+    if args.islands is not None and args.strategy is None:
+        parser.error("--islands requires --strategy")
+
+    if args.reuse_index is not None and args.backend != "elasticsearch":
+        # The local backend keeps its index only in memory, so there is nothing to reuse
+        parser.error("--reuse-index requires --backend elasticsearch")
+
+    if args.concurrency is not None and args.backend != "elasticsearch":
+        parser.error("--concurrency requires --backend elasticsearch")
+
+    if args.concurrency is not None and args.scoring == "profile":
+        parser.error("--concurrency requires --scoring search")
+
+    return args
+
+def _comma_separated(type):
+    def parse(string):
+        return [
+                type(value)
+                for value in string.split(",")
+                ]
+    return parse
+
+def _strategy(args):
+    if args.strategy == "fixed":
+        return FixedSequenceStrategy(args.strategy_sequence)
+    elif args.strategy == "weighted":
+        return WeightedRandomStrategy(args.strategy_weights)
+    elif args.strategy == "ga":
+        return GeneticAlgorithmStrategy(
+                select = 1,
+                recombine = 0,
+                mutate = 3,
+                remove_duplicates = 4,
+                max_population = args.max_population,
+                selection_mode = SelectionMode[args.selection.upper().replace("-", "_")]
+                if args.selection is not None
+                else None,
+                n_elites = args.elites,
+                recombination_mode = _recombination_mode(args)
+                if args.recombination is not None
+                else None,
+                )
+    else:
+        return None
+
+def _recombination_mode(args):
+    if args.recombination is None:
+        return RecombinationMode.CLONE
+
+    return RecombinationMode[args.recombination.upper().replace("-", "_")]
+
+def _backend(args, name):
+    if args.backend == "local":
+        return LocalBackend(name)
+
+    from es_backend import ESBackend, json_serializer
+
+    return ESBackend(
+            name = name,
+            host = args.es_host,
+            port = args.es_port,
+            bulk_chunk_size = args.bulk_chunk_size,
+            bulk_max_chunk_bytes = args.bulk_max_chunk_bytes,
+            bulk_threads = args.bulk_threads,
+            serializer = json_serializer(args.json_serializer),
+            http_compress = args.http_compress,
+            )
+
+def _proposal(args, index):
+    if args.proposal is None:
+        return None
+
+    return PROPOSALS[ProposalMode[args.proposal.upper()]](index.vocabulary)
+
+def _profiler(args):
+    if args.profile is None:
+        return contextlib.nullcontext()
+
+    return Profiler(
+            mode = ProfileMode[args.profile.upper()],
+            directory = args.profile_dir,
+            top_n = args.profile_top,
+            )
+
+def _play_islands(args, index, target_sentence, strategy, profiler):
+    words = index.vocabulary.wordlist()
+    proposal = _proposal(args, index)
+
+    if args.backend == "local" or args.scoring == "profile":
+        evaluator = ProfileEvaluator(
+                index.target_profile(target_sentence.id)
+                )
+    else:
+        evaluator = SearchEvaluator(
+                name = index.name,
+                host = args.es_host,
+                port = args.es_port,
+                target_id = target_sentence.id,
+                compact_body = args.compact_queries,
+                serializer = args.json_serializer,
+                http_compress = args.http_compress,
+                )
+
+    islands = Islands(
+            populations = [
+                Queries(
+                    queries = [
+                        Query(
+                            musts = index.vocabulary.sample(1)
+                            )
+                        ],
+                    words = words,
+                    proposal = proposal,
+                    )
+                for _ in range(args.islands)
+                ],
+            words = words,
+            evaluator = evaluator,
+            strategy = strategy,
+            proposal = proposal,
+            recombination_mode = _recombination_mode(args),
+            n_migrants = args.migrants,
+            max_workers = args.workers,
+            seed = args.seed,
+            )
+
+    n_epochs = -(-args.n_rounds // args.migration_interval)
+
+    start_time = time.perf_counter()
+
+    for epoch in islands.evolve(
+            n_epochs = n_epochs,
+            n_generations = args.migration_interval,
+            ):
+        print(
+                as_json_line(
+                    {
+                        'epoch': epoch + 1,
+                        'sizes': [
+                            queries.size()
+                            for queries in islands.populations
+                            ],
+                        'average_scores': [
+                            queries.average_score()
+                            for queries in islands.populations
+                            ],
+                        'seconds': time.perf_counter() - start_time,
+                        }
+                    )
+                )
+
+        write_metrics(
+                args,
+                instrumentation.record(
+                    epoch = epoch + 1,
+                    size = sum(
+                        [
+                            queries.size()
+                            for queries in islands.populations
+                            ]
+                        ),
+                    ),
+                )
+
+        if profiler is not None:
+            profiler.snapshot(
+                    generation = epoch + 1,
+                    populations = islands.populations,
+                    )
+
+    best = islands.best()
+
+    print(
+            as_json_line(
+                {
+                    'best_score': best.fitness if best is not None else None,
+                    'target_sentence': str(target_sentence),
+                    'best_query': str(best) if best is not None else None,
+                    'ingest': index.bulk_stats,
+                    }
+                )
+            )
+
+def write_metrics(args, record):
+    if args.metrics is None:
+        return
+
+    if args.metrics_format == "prometheus":
+        # Replaced atomically for collectors reading the file
+        path = args.metrics.with_name(args.metrics.name + ".tmp")
+        path.write_text(instrumentation.prometheus_text(record))
+        path.replace(args.metrics)
+    else:
+        with open(args.metrics, "a") as file:
+            file.write(as_json_line(record) + "\n")
 
 def as_json(data):
     return json.dumps(
@@ -104,36 +567,82 @@ def as_json(data):
             indent = 4
             )
 
-def read_lines(filepath):
-    with open(filepath) as file:
-        return [
-                line.rstrip()
-                for line in file.readlines()
-                ]
+def as_json_line(data):
+    return json.dumps(data)
 
 def main():
     args = parsed_args()
 
+    with _profiler(args) as profiler:
+        play(args, profiler)
+
+def play(args, profiler):
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    strategy = _strategy(args)
+
     index = Index(
             name = "evolve_a_query",
             host = args.es_host,
             port = args.es_port,
+            backend = _backend(args, "evolve_a_query"),
+            cache_size = args.cache_size,
+            recreate = args.reuse_index is None,
+            record_documents = args.proposal is not None
+            and PROPOSALS[ProposalMode[args.proposal.upper()]].uses_documents,
             )
 
-    index.add_bulk(
-            read_lines(
-                args.language_file
-                )[0:args.n_lines_from_file]
+    Query.compact_body = index.backend.is_single_token if args.compact_queries else None
+
+    instrumentation.reset()
+
+    lines = corpus.lines(
+            args.language_file,
+            n_lines = args.n_lines_from_file,
+            use_mmap = args.mmap,
             )
 
-    logging.debug("index_info: " + as_json(index.es.info()))
-    logging.debug("index_indices_mapping: " + as_json(index.es.indices.get_mapping()))
+    with instrumentation.timer("ingest"):
+        if args.reuse_index is not None:
+            reused = index.load(
+                    lines,
+                    corpus_fingerprint = corpus.fingerprint(
+                        args.language_file,
+                        n_lines = args.n_lines_from_file,
+                        ),
+                    snapshot_dir = args.reuse_index,
+                    )
+            logging.info("reused_index: " + str(reused))
+        else:
+            index.add_bulk(lines)
+
+    logging.info("bulk_stats: " + as_json(index.bulk_stats))
+
+    write_metrics(
+            args,
+            instrumentation.record(
+                generation = 0,
+                ),
+            )
+
+    if profiler is not None:
+        profiler.snapshot(generation = 0)
+
+    if args.backend == "elasticsearch":
+        logging.debug("index_info: " + as_json(index.es.info()))
+        logging.debug("index_indices_mapping: " + as_json(index.es.indices.get_mapping()))
 
     target_sentence = ESDocument(
             index.random_document()
             )
 
     logging.debug("target_sentence: " + str(target_sentence))
+
+    if args.islands is not None:
+        _play_islands(args, index, target_sentence, strategy, profiler)
+        return
+
     logging.debug("generating seed individual")
 
     queries = Queries(
@@ -142,37 +651,75 @@ def main():
                     musts = index.vocabulary.sample(1)
                     )
                 ],
-            words = index.vocabulary.wordlist()
+            words = index.vocabulary.wordlist(),
+            proposal = _proposal(args, index),
             )
 
-    actions = _actions(queries)
+    actions = evolutionary_actions(
+            queries,
+            recombination_mode = _recombination_mode(args),
+            )
 
     logging.debug("seed_query: " + str(queries.queries[0]))
 
     highscore = queries.average_score()
 
+    async_index = None
+    if args.concurrency is not None:
+        from async_index import AsyncIndex
+        from es_backend import json_serializer
+
+        event_loop = asyncio.new_event_loop()
+        async_index = AsyncIndex(
+                name = index.name,
+                host = args.es_host,
+                port = args.es_port,
+                concurrency = args.concurrency,
+                serializer = json_serializer(args.json_serializer),
+                http_compress = args.http_compress,
+                )
+
     for generation in [*range(args.n_rounds)]:
+        start_time = time.perf_counter()
+
         logging.debug("computing fitness scores for each individual in population")
 
-        for query in queries.queries:
-            query.update_with_explanation(
-                    index.explain(
-                        query = query,
-                        id = target_sentence.id
+        with instrumentation.timer("evaluate"):
+            if async_index is not None:
+                event_loop.run_until_complete(
+                        async_index.evaluate_population(
+                            queries = queries,
+                            target_id = target_sentence.id,
+                            index = index,
+                            )
+                        )
+            else:
+                queries.evaluate(
+                        index = index,
+                        target_id = target_sentence.id,
+                        mode = EvaluationMode[args.scoring.upper()],
                         )
-                    )
 
-        logging.debug("presenting population with fitness scores")
+        if strategy is None:
+            logging.debug("presenting population with fitness scores")
 
-        print(
-                StringMaker.section_title(
-                    "Generation " + str(generation + 1)
+            print(
+                    StringMaker.section_title(
+                        "Generation " + str(generation + 1)
+                        )
                     )
-                )
 
-        print(
-                StringMaker.newline_delimited_list_of_titled_blocks(
-                    [
+            explained = []
+            if args.explain_top > 0:
+                with instrumentation.timer("explain"):
+                    explained = queries.explain_top(
+                            index = index,
+                            target_id = target_sentence.id,
+                            k = args.explain_top,
+                            )
+
+            with instrumentation.timer("render"):
+                blocks = [
                         {
                             'title': "Vocabulary",
                             'block': index.vocabulary,
@@ -190,45 +737,123 @@ def main():
                             'block': StringMaker.actions(actions),
                             },
                         ]
-                    )
-                )
 
-        logging.debug("prompting for next action")
+                if len(explained) > 0:
+                    blocks.insert(
+                            2,
+                            {
+                                'title': "Score explanations of fittest queries",
+                                'block': StringMaker.explanations(explained),
+                                },
+                            )
 
-        action_number = None
-        while action_number not in [*range(len(actions))]:
-            try:
-                action_number = int(
-                        input(
-                            "Which evolutionary action to take?\n> "
+                print(
+                        StringMaker.newline_delimited_list_of_titled_blocks(
+                            blocks
                             )
                         )
 
-            except ValueError:
-                print(StringMaker.prompt_number(
-                    0,
-                    len(actions)-1)
-                    )
+            logging.debug("prompting for next action")
+
+            action_number = None
+            while action_number not in [*range(len(actions))]:
+                try:
+                    action_number = int(
+                            input(
+                                "Which evolutionary action to take?\n> "
+                                )
+                            )
+
+                except ValueError:
+                    print(StringMaker.prompt_number(
+                        0,
+                        len(actions)-1)
+                        )
+
+            chosen_actions = [ actions[action_number] ]
+
+        else:
+            logging.debug("picking actions by strategy")
+
+            stats = {
+                    'generation': generation + 1,
+                    'size': queries.size(),
+                    'average_score': queries.average_score(),
+                    'best_score': max(
+                        queries.fitnesses(),
+                        default = 0.0
+                        ),
+                    }
+
+            with instrumentation.timer("strategy"):
+                chosen_actions = strategy.actions(
+                        generation = generation,
+                        queries = queries,
+                        actions = actions,
+                        )
 
         logging.debug("performing action on population")
 
-        actions[action_number].func()
+        for action in chosen_actions:
+            with instrumentation.timer("action." + action.title):
+                action.func()
 
         logging.debug("target_sentence: " + str(target_sentence))
 
+        if strategy is not None:
+            stats['actions'] = [ action.title for action in chosen_actions ]
+            stats['seconds'] = time.perf_counter() - start_time
+
+            print(as_json_line(stats))
+
+        write_metrics(
+                args,
+                instrumentation.record(
+                    generation = generation + 1,
+                    size = queries.size(),
+                    fitness_cache_size = len(index.fitness_cache),
+                    ),
+                )
+
+        if profiler is not None:
+            profiler.snapshot(
+                    generation = generation + 1,
+                    populations = [ queries ],
+                    )
+
         score = queries.average_score()
 
         if highscore < score:
             highscore = score
 
         if queries.size() == 0:
-            print(
-                    StringMaker.string(
-                        "Your queries died out. You lost. Game over."
+            if strategy is None:
+                print(
+                        StringMaker.string(
+                            "Your queries died out. You lost. Game over."
+                            )
                         )
-                    )
             break
 
+    if async_index is not None:
+        event_loop.run_until_complete(async_index.close())
+        event_loop.close()
+
+    if strategy is not None:
+        print(
+                as_json_line(
+                    {
+                        'best_average_score': highscore,
+                        'target_sentence': str(target_sentence),
+                        'best_query': str(queries.sorted_queries()[0])
+                        if queries.size() > 0
+                        else None,
+                        'ingest': index.bulk_stats,
+                        }
+                    )
+                )
+        return
+
     print(StringMaker.delimiter())
 
     print(
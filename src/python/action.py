@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import Callable
+from typing import Callable, List
+
+from queries import RecombinationMode
 
 class Action():
     def __init__(
@@ -13,3 +15,53 @@ class Action():
         self.descr = descr
         self.func = func
 
+
+def evolutionary_actions(
+        queries: Queries,
+        recombination_mode: RecombinationMode = RecombinationMode.CLONE,
+        ) -> List[Action]:
+    """Returns the evolutionary actions available on a population of queries.
+
+    :param queries: Population of queries
+    :type queries: :class:`Queries`
+
+    :param recombination_mode: Recombination mode of the action "Love Is In The Air",
+        defaults to `RecombinationMode.CLONE`
+    :type recombination_mode: Member of enum :class:`RecombinationMode`, optional
+
+    :return: Actions, numbered by position
+    :rtype: List[Action]
+    """
+    return [
+            Action(
+                title = "Love Is In The Air",
+                descr = "Clone each query once, doubling the population size."
+                    if recombination_mode == RecombinationMode.CLONE
+                    else "Cross each query with a random mate by {} crossover, adding one child per query.".format(
+                        recombination_mode.name.lower().replace("_", "-")
+                        ),
+                func = lambda: queries.recombine(
+                    mode = recombination_mode,
+                    ),
+                ),
+            Action(
+                title = "The Weak Shall Perish",
+                descr = "Remove all queries whose scores match the worst score.",
+                func = queries.select,
+                ),
+            Action(
+                title = "Deus Ex Machina",
+                descr = "Remove random queries from the population.",
+                func = queries.random_purge,
+                ),
+            Action(
+                title = "Gamma Party",
+                descr = "Apply random mutations throughout the population. For each query, either a term will be removed or a random new term will be added with a random prefix (+/-).",
+                func = queries.mutate,
+                ),
+            Action(
+                title = "This Town Is Too Small For The Both Of Us",
+                descr = "Remove duplicate queries.",
+                func = queries.remove_duplicates,
+                ),
+            ]
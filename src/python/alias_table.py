@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from array import array
+from typing import List
+
+import random
+
+
+class AliasTable():
+    """Table for drawing indices with given weights in constant time
+    (Walker's alias method, in Vose's variant).
+
+    Building the table takes linear time in the number of weights.
+
+    :param weights: Non-negative weights, not all zero
+    :type weights: List[float]
+    """
+
+    def __init__(self, weights: List[float]):
+        """Constructor method
+        """
+        n = len(weights)
+        total = float(sum(weights))
+
+        if n == 0 or total <= 0.0:
+            raise ValueError("weights must contain a positive weight")
+
+        self._weights = array('d', weights)
+
+        # Probability of keeping the drawn column instead of taking its alias
+        self._probabilities = array('d', [ 0.0 ] * n)
+        self._aliases = array('I', range(n))
+
+        scaled = [
+                weight * n / total
+                for weight in weights
+                ]
+        small = [ i for i, p in enumerate(scaled) if p < 1.0 ]
+        large = [ i for i, p in enumerate(scaled) if p >= 1.0 ]
+
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+
+            self._probabilities[i] = scaled[i]
+            self._aliases[i] = j
+
+            scaled[j] -= 1.0 - scaled[i]
+            if scaled[j] < 1.0:
+                small.append(j)
+            else:
+                large.append(j)
+
+        # Remaining columns are full, up to rounding errors
+        for i in small + large:
+            self._probabilities[i] = 1.0
+
+    def __len__(self):
+        return len(self._probabilities)
+
+    def weight(self, i: int) -> float:
+        """Returns weight of index.
+
+        :param i: Index into the weights
+        :type i: int
+
+        :rtype: float
+        """
+        return self._weights[i]
+
+    def draw(self) -> int:
+        """Returns random index, with probability proportional to its weight.
+
+        :return: Index into the weights
+        :rtype: int
+        """
+        i = random.randrange(len(self._probabilities))
+
+        if random.random() < self._probabilities[i]:
+            return i
+        else:
+            return self._aliases[i]
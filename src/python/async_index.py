@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+import asyncio
+
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.serializer import JSONSerializer
+
+from columnar_queries import ColumnarQueries
+from es_backend import EXPLANATION_FILTER_PATH, SCORE_FILTER_PATH, SEARCH_FILTER_PATH, ESBackend, json_serializer
+from index import Index
+from queries import Queries
+from query import Query
+
+
+class AsyncIndex():
+    """Class for concurrent requests to an existing Elasticsearch index.
+    Requires the ``elasticsearch[async]`` extra.
+
+    Requests are fanned out concurrently, at most ``concurrency`` at a time,
+    over a pool of as many connections.
+
+    :param name: Index name
+    :type name: str
+
+    :param host: Elasticsearch host URL
+    :type host: str
+
+    :param port: Elasticsearch host port
+    :type port: int
+
+    :param concurrency: Maximum number of requests in flight,
+        defaults to 64
+    :type concurrency: int, optional
+
+    :param serializer: JSON serializer of requests and responses,
+        defaults to orjson if it is installed, see :func:`es_backend.json_serializer`
+    :type serializer: :class:`JSONSerializer`, optional
+
+    :param http_compress: Whether to gzip request bodies and accept compressed responses,
+        defaults to False
+    :type http_compress: bool, optional
+    """
+
+    def __init__(
+            self,
+            name: str,
+            host: str = "localhost",
+            port: int = 9200,
+            concurrency: int = 64,
+            serializer: Optional[JSONSerializer] = None,
+            http_compress: bool = False,
+            ):
+        """Constructor method
+        """
+        self.name = name
+
+        self.es = AsyncElasticsearch(
+                [
+                    {
+                        'host': host,
+                        'port': port,
+                        }
+                    ],
+                timeout = 300,
+                maxsize = concurrency,
+                serializer = serializer or json_serializer(),
+                http_compress = http_compress,
+                )
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self) -> AsyncIndex:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Closes all connections.
+        """
+        await self.es.close()
+
+    async def _bounded(self, request: Awaitable) -> Dict:
+        async with self._semaphore:
+            return await request
+
+    async def search(self, query: Query) -> Dict:
+        """Returns query response from index.
+
+        :param query: Query
+        :type query: :class:`Query`
+
+        :return: Elasticsearch response
+        :rtype: Dict
+        """
+        return await self._bounded(
+                self.es.search(
+                    index = self.name,
+                    body = query.body,
+                    filter_path = SEARCH_FILTER_PATH,
+                    )
+                )
+
+    async def explain(self, query: Query, id: str) -> Dict:
+        """Returns Elasticsearch explanation for match between query and document by ID.
+
+        :param query: Query
+        :type query: :class:`Query`
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Elasticsearch response with ``matched`` and ``explanation`` only
+        :rtype: Dict
+        """
+        return await self._bounded(
+                self.es.explain(
+                    index = self.name,
+                    id = id,
+                    body = query.body,
+                    filter_path = EXPLANATION_FILTER_PATH,
+                    )
+                )
+
+    async def score(self, query: Query, id: str) -> float:
+        """Returns match score between query and document by ID.
+        A query that does not match the document scores 0.0.
+
+        :param query: Query
+        :type query: :class:`Query`
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Score
+        :rtype: float
+        """
+        return await self._score_body(query.body, id)
+
+    async def _score_body(self, body: Dict, id: str) -> float:
+        # Responses without hits are empty after filtering
+        hits = (
+                await self._bounded(
+                    self.es.search(
+                        index = self.name,
+                        body = ESBackend._scoring_body(body, id),
+                        filter_path = SCORE_FILTER_PATH,
+                        )
+                    )
+                ).get('hits', {}).get('hits', [])
+
+        return hits[0]['_score'] if len(hits) > 0 else 0.0
+
+    async def explain_many(self, queries: List[Query], id: str) -> List[Dict]:
+        """Returns explanations for many queries, requested concurrently.
+
+        :param queries: List of queries
+        :type queries: List[Query]
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Elasticsearch responses in order of ``queries``
+        :rtype: List[Dict]
+        """
+        return await asyncio.gather(
+                *[
+                    self.explain(query, id)
+                    for query in queries
+                    ]
+                )
+
+    async def score_many(
+            self,
+            queries: List[Query],
+            id: str,
+            index: Optional[Index] = None,
+            ) -> List[float]:
+        """Returns match scores for many queries, requested concurrently.
+        Equal genotypes are requested once.
+
+        :param queries: List of queries
+        :type queries: List[Query]
+
+        :param id: ID of document in index
+        :type id: str
+
+        :param index: Index whose fitness cache is looked up first and filled with new scores,
+            see :meth:`Index.cached_scores`, defaults to None for no caching
+        :type index: :class:`Index`, optional
+
+        :return: Scores in order of ``queries``
+        :rtype: List[float]
+        """
+        return await self.score_genotypes(
+                keys = [
+                    query.genotype_key()
+                    for query in queries
+                    ],
+                body = lambda i: queries[i].body,
+                id = id,
+                index = index,
+                )
+
+    async def score_genotypes(
+            self,
+            keys: List[bytes],
+            body: Callable[[int], Dict],
+            id: str,
+            index: Optional[Index] = None,
+            ) -> List[float]:
+        """Returns match scores for many genotypes, requested concurrently,
+        as in :meth:`Index.score_genotypes`.
+        Equal genotypes are requested once.
+
+        :param keys: Genotype keys, see :meth:`Query.genotype_key`
+        :type keys: List[bytes]
+
+        :param body: Function returning the query body of a genotype by its position
+        :type body: Callable[[int], Dict]
+
+        :param id: ID of document in index
+        :type id: str
+
+        :param index: Index whose fitness cache is looked up first and filled with new scores,
+            see :meth:`Index.cached_scores`, defaults to None for no caching
+        :type index: :class:`Index`, optional
+
+        :return: Scores in order of ``keys``
+        :rtype: List[float]
+        """
+        if index is not None:
+            scores, misses = index.cached_scores(keys, id)
+        else:
+            scores = [ None ] * len(keys)
+            misses = {}
+            for i, key in enumerate(keys):
+                misses.setdefault(key, []).append(i)
+
+        new_scores = await asyncio.gather(
+                *[
+                    self._score_body(body(positions[0]), id)
+                    for positions in misses.values()
+                    ]
+                )
+
+        if index is not None:
+            index.cache_scores(scores, misses, new_scores)
+        else:
+            for positions, score in zip(misses.values(), new_scores):
+                for i in positions:
+                    scores[i] = score
+
+        return scores
+
+    async def evaluate_population(
+            self,
+            queries: Union[Queries, ColumnarQueries],
+            target_id: str,
+            explain: bool = False,
+            index: Optional[Index] = None,
+            ) -> None:
+        """Updates fitness of all queries against target document with concurrent requests.
+
+        :param queries: Population of queries
+        :type queries: :class:`Queries` or :class:`ColumnarQueries`
+
+        :param target_id: ID of target document in index
+        :type target_id: str
+
+        :param explain: Whether to request and keep full explanations,
+            only possible with :class:`Queries`, defaults to False
+        :type explain: bool, optional
+
+        :param index: Index whose fitness cache is used for scores,
+            defaults to None for no caching
+        :type index: :class:`Index`, optional
+
+        :raises TypeError: if explanations are requested for :class:`ColumnarQueries`
+        """
+        if explain:
+            if not isinstance(queries, Queries):
+                raise TypeError("only Queries keep explanations")
+
+            for query, explanation in zip(
+                    queries.queries,
+                    await self.explain_many(queries.queries, target_id),
+                    ):
+                query.update_with_explanation(explanation)
+        else:
+            queries.update_with_scores(
+                    await self.score_genotypes(
+                        keys = queries.genotype_keys(),
+                        body = queries.body,
+                        id = target_id,
+                        index = index,
+                        )
+                    )
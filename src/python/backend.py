@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Backend(ABC):
+    """Interface for search engines that store the documents of an :class:`Index`.
+
+    Backends work on raw query bodies in Elasticsearch query DSL
+    and return responses shaped like Elasticsearch responses.
+
+    :param name: Index name
+    :type name: str
+    """
+
+    def __init__(self, name: str):
+        super().__init__()
+
+        self.name = name
+
+    @abstractmethod
+    def ensure_index(self) -> None:
+        """Creates or recreates empty index."""
+        pass
+
+    @abstractmethod
+    def add(self, text: str) -> Dict:
+        """Adds single document to index."""
+        pass
+
+    @abstractmethod
+    def add_bulk(self, texts: Iterable[str]) -> Tuple[int, List]:
+        """Adds many documents to index, consuming texts in a single pass."""
+        pass
+
+    @abstractmethod
+    def get(self, id: str) -> Dict:
+        """Returns document by ID."""
+        pass
+
+    @abstractmethod
+    def search(self, body: Dict) -> Dict:
+        """Returns search response for query body."""
+        pass
+
+    @abstractmethod
+    def random_document(self) -> Dict:
+        """Returns search response with one random document."""
+        pass
+
+    @abstractmethod
+    def explain(self, body: Dict, id: str) -> Dict:
+        """Returns explanation for match between query body and document by ID."""
+        pass
+
+    @abstractmethod
+    def score_many(self, bodies: List[Dict], id: str) -> List[float]:
+        """Returns match scores between many query bodies and document by ID."""
+        pass
+
+    def index_body(self) -> Dict:
+        """Returns settings and mappings of created indices,
+        which are part of the fingerprint of an index, see :meth:`Index.load`.
+        """
+        return {}
+
+    def fingerprint(self) -> Optional[str]:
+        """Returns fingerprint of the indexed corpus, or None if there is none.
+        """
+        return None
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Records fingerprint of the indexed corpus, until the index is recreated.
+        """
+        pass
+
+    def is_single_token(self, term: str) -> bool:
+        """Returns whether the index analyzer turns term into exactly one token,
+        so that it can share the compact ``match`` clause of :meth:`Query.render_body`.
+        Backends that cannot tell return False, which keeps bodies correct.
+        """
+        return False
+
+    def term_weights(self, id: str) -> Dict[str, float]:
+        """Returns score contribution of each term in document by ID.
+
+        :raises NotImplementedError: if backend cannot provide term weights
+        """
+        raise NotImplementedError(
+                "{} does not provide term weights.".format(type(self).__name__)
+                )
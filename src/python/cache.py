@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class FitnessCache():
+    """Bounded least-recently-used memo of fitness scores.
+
+    :param maxsize: Maximum number of entries, 0 disables caching,
+        defaults to 100000
+    :type maxsize: int, optional
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        """Constructor method
+        """
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        """Returns cached score and marks it as recently used.
+
+        :param key: Cache key
+        :type key: Hashable
+
+        :return: Score, or None if key is not cached
+        :rtype: Optional[float]
+        """
+        try:
+            score = self._entries[key]
+
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key: Hashable, score: float) -> None:
+        """Caches score, evicting the least recently used entry if full.
+
+        :param key: Cache key
+        :type key: Hashable
+
+        :param score: Score
+        :type score: float
+        """
+        if self.maxsize <= 0:
+            return
+
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last = False)
+
+    def clear(self) -> None:
+        """Removes all entries. Hit and miss counters are kept.
+        """
+        self._entries.clear()
@@ -0,0 +1,635 @@
+from __future__ import annotations
+
+from array import array
+from itertools import compress
+from operator import itemgetter
+from typing import Callable, Container, Dict, List, Optional, Sequence, Tuple
+
+import heapq
+import logging
+import random
+
+from population import Population
+from queries import CROSSOVER_OPERATORS, EvaluationMode, RecombinationMode, SelectionMode, mates, selected_indices
+from query import Query
+from vocabulary import Vocabulary
+
+
+def _gather(values: Sequence, indices: Sequence[int]) -> Tuple:
+    """Returns values at given positions, gathered in one call.
+    """
+    if len(indices) == 0:
+        return ()
+    elif len(indices) == 1:
+        return (values[indices[0]],)
+
+    return itemgetter(*indices)(values)
+
+def _runs(indices: Sequence[int]) -> Optional[List[Tuple[int, int]]]:
+    """Returns the runs of consecutive rows in strictly increasing positions,
+    as pairs of first row and row after the last, found by bisection in O(R log N) for R runs.
+
+    :return: Runs, or None if there are too many runs to copy them one by one
+    :rtype: List[Tuple[int, int]], optional
+    """
+    max_steps = len(indices) // 32 + 64
+
+    runs = []
+    segments = [ (0, len(indices)) ] if len(indices) > 0 else []
+
+    while len(segments) > 0:
+        max_steps -= 1
+        if max_steps < 0:
+            return None
+
+        low, high = segments.pop()
+
+        if indices[high - 1] - indices[low] == high - 1 - low:
+            if len(runs) > 0 and runs[-1][1] == indices[low]:
+                runs[-1] = (runs[-1][0], indices[high - 1] + 1)
+            else:
+                runs.append((indices[low], indices[high - 1] + 1))
+        else:
+            middle = (low + high) // 2
+            segments.append((middle, high))
+            segments.append((low, middle))
+
+    return runs
+
+def _taken(
+        column: array,
+        indices: Sequence[int],
+        runs: Optional[List[Tuple[int, int]]] = None,
+        ) -> array:
+    """Returns new column with given rows, copied run by run if runs are given.
+    """
+    if runs is None:
+        return array(column.typecode, _gather(column, indices))
+
+    taken = array(column.typecode)
+    for first, stop in runs:
+        taken += column[first:stop]
+    return taken
+
+
+class TermMatrix():
+    """Rows of term IDs in one append-only buffer:
+    the terms of row ``i`` are ``terms[starts[i]:ends[i]]``.
+
+    Rows are never modified in place, so matrices taken from a matrix
+    share its buffer and only copy the row bounds.
+    Rows no longer referenced stay in the buffer until it is compacted.
+    """
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.starts = array('Q')
+        self.ends = array('Q')
+        self.terms = array('I')
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def row(self, i: int) -> array:
+        """Returns term IDs of row as new array.
+        """
+        return self.terms[self.starts[i]:self.ends[i]]
+
+    def append(self, term_ids: Sequence[int]) -> None:
+        """Appends row of term IDs.
+        """
+        self.starts.append(len(self.terms))
+        self.terms.extend(term_ids)
+        self.ends.append(len(self.terms))
+
+    def n_terms(self) -> int:
+        """Returns number of terms in rows, not counting unreferenced terms in the buffer.
+        """
+        return sum(self.ends) - sum(self.starts)
+
+    def take(
+            self,
+            indices: Sequence[int],
+            runs: Optional[List[Tuple[int, int]]] = None,
+            ) -> TermMatrix:
+        """Returns new matrix with given rows, in given order, sharing the buffer.
+
+        :param indices: Positions of rows
+        :type indices: Sequence[int]
+
+        :param runs: Runs of consecutive rows of ``indices``, see :func:`_runs`,
+            copied in bulk if given, defaults to None
+        :type runs: List[Tuple[int, int]], optional
+
+        :return: Matrix of rows
+        :rtype: :class:`TermMatrix`
+        """
+        matrix = TermMatrix()
+        matrix.starts = _taken(self.starts, indices, runs)
+        matrix.ends = _taken(self.ends, indices, runs)
+        matrix.terms = self.terms
+        return matrix
+
+    def doubled(self) -> TermMatrix:
+        """Returns new matrix with all rows repeated once after the last row,
+        sharing the buffer.
+        """
+        matrix = TermMatrix()
+        matrix.starts = self.starts * 2
+        matrix.ends = self.ends * 2
+        matrix.terms = self.terms
+        return matrix
+
+    def compacted(self) -> TermMatrix:
+        """Returns new matrix with the same rows stored contiguously in a new buffer.
+        """
+        terms = self.terms
+
+        matrix = TermMatrix()
+        for start, end in zip(self.starts, self.ends):
+            matrix.append(terms[start:end])
+        return matrix
+
+    def row_bytes(self) -> List[bytes]:
+        """Returns raw bytes of each row.
+        """
+        terms = self.terms
+
+        return [
+                terms[start:end].tobytes()
+                for start, end in zip(self.starts, self.ends)
+                ]
+
+
+class ColumnarQueries(Population):
+    """Population of queries stored column-wise:
+    fitness scores and mutation counts in flat arrays,
+    genotypes in a :class:`TermMatrix` column.
+
+    The row of a genotype holds the number of positive term IDs,
+    the sorted positive term IDs and the sorted negative term IDs,
+    so its bytes are the genotype key (see :meth:`Query.genotype_key`).
+
+    Offers the operations of :class:`Queries` without creating a
+    :class:`Query` object per individual;
+    ``queries`` is a materialized view for display.
+
+    :param words: List of words as strings
+    :type words: List[str]
+
+    :param queries: List of :class:`Query` objects to initialize population,
+        defaults to empty list
+    :type queries: List[Query]
+
+    :param proposal: Distribution of new terms for mutations,
+        see :meth:`Query.mutate`, defaults to None for uniform draws from ``words``
+    :type proposal: Callable[[array, Container[str]], Optional[str]], optional
+    """
+
+    def __init__(self,
+            words: List[str],
+            queries: List[Query] = [],
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
+            ):
+        """Constructor method
+        """
+        super().__init__([])
+
+        self._words = words
+        self._proposal = proposal
+
+        self._fitness = array('d')
+        self._n_mutations = array('I')
+        self._genotypes = TermMatrix()
+
+        for query in queries:
+            self.add(query)
+
+    def __getstate__(self) -> Dict:
+        # Term IDs are only valid within a process, so used terms are pickled as words.
+        genotypes = self._genotypes.compacted()
+
+        term_ids = set()
+        for i in range(len(genotypes)):
+            term_ids.update(genotypes.row(i)[1:])
+
+        state = self.__dict__.copy()
+        state['_genotypes'] = genotypes
+        state['_term_words'] = {
+                term_id: Vocabulary.term(term_id)
+                for term_id in term_ids
+                }
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        term_words = state.pop('_term_words')
+        self.__dict__.update(state)
+
+        new_ids = {
+                term_id: Vocabulary.term_id(word)
+                for term_id, word in term_words.items()
+                }
+
+        genotypes = self._genotypes
+        self._genotypes = TermMatrix()
+
+        for i in range(len(genotypes)):
+            row = genotypes.row(i)
+
+            self._genotypes.append(
+                    ColumnarQueries._genotype(
+                        *[
+                            array(
+                                'I',
+                                sorted(
+                                    new_ids[term_id]
+                                    for term_id in term_ids
+                                    )
+                                )
+                            for term_ids in [ row[1:1 + row[0]], row[1 + row[0]:] ]
+                            ]
+                        )
+                    )
+
+    @staticmethod
+    def _genotype(must_ids: array, must_not_ids: array) -> array:
+        """Returns genotype row of sorted term ID arrays.
+        """
+        return array('I', [ len(must_ids) ]) + must_ids + must_not_ids
+
+    def _term_ids(self, i: int) -> Tuple[array, array]:
+        """Returns sorted positive and negative term IDs of a query by position.
+        """
+        genotypes = self._genotypes
+        start = genotypes.starts[i] + 1
+        middle = start + genotypes.terms[start - 1]
+
+        return genotypes.terms[start:middle], \
+                genotypes.terms[middle:genotypes.ends[i]]
+
+    def add(self, query: Query) -> None:
+        """Adds query to population.
+
+        :param query: Query
+        :type query: :class:`Query`
+        """
+        self._fitness.append(query.fitness)
+        self._n_mutations.append(query.n_mutations)
+        self._genotypes.append(
+                ColumnarQueries._genotype(query._must_ids, query._must_not_ids)
+                )
+
+    def _query(self, i: int) -> Query:
+        must_ids, must_not_ids = self._term_ids(i)
+
+        return Query.from_term_ids(
+                must_ids = must_ids,
+                must_not_ids = must_not_ids,
+                fitness = self._fitness[i],
+                n_mutations = self._n_mutations[i],
+                )
+
+    @property
+    def queries(self) -> List[Query]:
+        """Population as new list of :class:`Query` objects.
+        Changes to these objects do not affect the population.
+        """
+        return [
+                self._query(i)
+                for i in range(self.size())
+                ]
+
+    def individuals(self) -> Query:
+        """Return individuals as iterable."""
+        for i in range(self.size()):
+            yield self._query(i)
+
+    def size(self) -> int:
+        """Returns number of queries.
+
+        :return: Number of queries
+        :rtype: int
+        """
+        return len(self._fitness)
+
+    def fitnesses(self) -> array:
+        """Returns fitness of each query.
+
+        :return: Fitness scores in population order
+        :rtype: array
+        """
+        return self._fitness
+
+    def sorted_queries(self) -> List[Query]:
+        """Returns queries sorted by fitness.
+
+        :return: List of sorted :class:`Query` objects
+        :rtype: List[Query]
+        """
+        return [
+                self._query(i)
+                for i in sorted(
+                    range(self.size()),
+                    key = self._fitness.__getitem__,
+                    reverse = True,
+                    )
+                ]
+
+    def average_score(self) -> float:
+        """Returns average score of queries.
+
+        :return: Average score of queries
+        :rtype: float
+        """
+        if self.size() == 0:
+            return 0.0
+        else:
+            return sum(self._fitness) / self.size()
+
+    def _take(self, indices: Sequence[int], ordered: bool = False) -> None:
+        """Reduces population to given rows, in given order.
+        With ``ordered``, positions must be strictly increasing,
+        and runs of consecutive rows are copied in bulk.
+        """
+        runs = _runs(indices) if ordered else None
+
+        self._fitness = _taken(self._fitness, indices, runs)
+        self._n_mutations = _taken(self._n_mutations, indices, runs)
+        self._genotypes = self._genotypes.take(indices, runs)
+
+    def evaluate(
+            self,
+            index: Index,
+            target_id: int,
+            mode: EvaluationMode = EvaluationMode.SEARCH,
+            ) -> None:
+        """Updates fitness of all queries against target document in one batch.
+
+        :param index: Index holding the target document
+        :type index: :class:`Index`
+
+        :param target_id: ID of target document in index
+        :type target_id: int
+
+        :param mode: Whether to score via backend requests or locally
+            from the precomputed target profile,
+            defaults to `EvaluationMode.SEARCH`
+        :type mode: Member of enum :class:`EvaluationMode`, optional
+        """
+        if mode == EvaluationMode.PROFILE:
+            self.evaluate_with_profile(
+                    index.target_profile(target_id)
+                    )
+        else:
+            self.update_with_scores(
+                    index.score_genotypes(
+                        keys = self.genotype_keys(),
+                        body = self.body,
+                        id = target_id,
+                        )
+                    )
+
+    def genotype_keys(self) -> List[bytes]:
+        """Returns genotype key of each query, straight from the genotype rows,
+        see :meth:`Query.genotype_key`.
+
+        :return: Genotype keys in population order
+        :rtype: List[bytes]
+        """
+        return self._genotypes.row_bytes()
+
+    def body(self, i: int) -> Dict:
+        """Returns query body of a query by position, see :meth:`Query.body`.
+
+        :param i: Position in population
+        :type i: int
+
+        :return: Query body in Elasticsearch query DSL
+        :rtype: Dict
+        """
+        must_ids, must_not_ids = self._term_ids(i)
+
+        return Query.render_body(
+                musts = [
+                    Vocabulary.term(term_id)
+                    for term_id in must_ids
+                    ],
+                must_nots = [
+                    Vocabulary.term(term_id)
+                    for term_id in must_not_ids
+                    ],
+                compact = Query.compact_body,
+                )
+
+    def update_with_scores(self, scores: Sequence[float]) -> None:
+        """Replaces fitness of all queries.
+
+        :param scores: Match scores in population order
+        :type scores: Sequence[float]
+        """
+        self._fitness = array('d', scores)
+
+    def evaluate_with_profile(self, profile: TargetProfile) -> None:
+        """Updates fitness of all queries from a precomputed target profile.
+
+        :param profile: Profile of target document
+        :type profile: :class:`TargetProfile`
+        """
+        score = profile.score_term_ids
+        term_ids = self._term_ids
+
+        self._fitness = array(
+                'd',
+                [
+                    score(*term_ids(i))
+                    for i in range(self.size())
+                    ]
+                )
+
+    def recombine(self, mode: RecombinationMode=RecombinationMode.CLONE) -> None:
+        """Recombines queries according to given mode to produce offspring.
+        Adds offspring to populaton of queries, as in :meth:`Queries.recombine`.
+
+        :param mode: Strategy for producing offspring from queries, defaults to `RecombinationMode.CLONE`
+        :type mode: Member of enum :class:`RecombinationMode`, optional
+        """
+        if mode == RecombinationMode.CLONE:
+            self._fitness = self._fitness * 2
+            self._n_mutations = self._n_mutations * 2
+            self._genotypes = self._genotypes.doubled()
+        elif mode in CROSSOVER_OPERATORS:
+            operator = CROSSOVER_OPERATORS[mode]
+
+            # Children are appended to the buffer, so rows left behind by selections are dropped first
+            if len(self._genotypes.terms) > 2 * self._genotypes.n_terms():
+                self._genotypes = self._genotypes.compacted()
+
+            genotypes = self._genotypes
+            term_ids = [
+                    self._term_ids(i)
+                    for i in range(self.size())
+                    ]
+
+            for (must_ids, must_not_ids), mate in zip(term_ids, mates(self.size())):
+                mate_must_ids, mate_must_not_ids = term_ids[mate]
+                must_ids = operator(must_ids, mate_must_ids)
+                must_not_ids = operator(must_not_ids, mate_must_not_ids)
+
+                if len(must_ids) + len(must_not_ids) > 0:
+                    self._fitness.append(0.0)
+                    self._n_mutations.append(0)
+                    genotypes.append(
+                            ColumnarQueries._genotype(must_ids, must_not_ids)
+                            )
+        else:
+            logging.error("Recombination mode {} not implemented.".format(mode))
+            exit(1)
+
+    def mutate(self) -> None:
+        """Applies mutations across population of queries.
+        """
+        fitness = array('d')
+        n_mutations = array('I')
+        genotypes = TermMatrix()
+
+        for i in range(self.size()):
+            must_ids, must_not_ids = Query.mutated_term_ids(
+                    *self._term_ids(i),
+                    self._words,
+                    self._proposal,
+                    )
+
+            if len(must_ids) + len(must_not_ids) > 0:
+                fitness.append(self._fitness[i])
+                n_mutations.append(self._n_mutations[i] + 1)
+                genotypes.append(
+                        ColumnarQueries._genotype(must_ids, must_not_ids)
+                        )
+
+        self._fitness = fitness
+        self._n_mutations = n_mutations
+        self._genotypes = genotypes
+
+    def select(
+            self,
+            mode: SelectionMode = SelectionMode.WITHOUT_LOWEST,
+            k: Optional[int] = None,
+            n_elites: int = 0,
+            tournament_size: int = 2,
+            ) -> None:
+        """Reduces population of queries to fittest members.
+        By default, removes all queries with the lowest score.
+
+        :param mode: Selection operator,
+            defaults to `SelectionMode.WITHOUT_LOWEST`
+        :type mode: Member of enum :class:`SelectionMode`, optional
+
+        :param k: Number of queries to select, ignored by `SelectionMode.WITHOUT_LOWEST`,
+            defaults to None for half the population, rounded up
+        :type k: int, optional
+
+        :param n_elites: Number of fittest queries to keep in any case,
+            defaults to 0
+        :type n_elites: int, optional
+
+        :param tournament_size: Number of queries per tournament,
+            defaults to 2
+        :type tournament_size: int, optional
+        """
+        self._take(
+                selected_indices(
+                    self._fitness,
+                    mode = mode,
+                    k = k,
+                    n_elites = n_elites,
+                    tournament_size = tournament_size,
+                    ),
+                # Only this selection keeps population order
+                ordered = mode == SelectionMode.WITHOUT_LOWEST and n_elites == 0,
+                )
+
+    def top(self, k: int) -> List[Query]:
+        """Returns the ``k`` fittest queries, in O(N log k).
+
+        :param k: Number of queries
+        :type k: int
+
+        :return: Fittest queries, fittest first
+        :rtype: List[Query]
+        """
+        return [
+                self._query(i)
+                for i in heapq.nlargest(
+                    k,
+                    range(self.size()),
+                    key = self._fitness.__getitem__,
+                    )
+                ]
+
+    def explain_top(
+            self,
+            index: Index,
+            target_id: int,
+            k: int,
+            ) -> List[Query]:
+        """Requests full explanations of the ``k`` fittest queries, for display.
+        Explanations are only kept by the returned copies of the queries.
+
+        :param index: Index holding the target document
+        :type index: :class:`Index`
+
+        :param target_id: ID of target document in index
+        :type target_id: int
+
+        :param k: Number of queries
+        :type k: int
+
+        :return: Explained queries, fittest first
+        :rtype: List[Query]
+        """
+        top = self.top(k)
+
+        for query in top:
+            query.update_with_explanation(
+                    index.explain(query, target_id)
+                    )
+
+        return top
+
+    def random_purge(self, k: int = 1) -> None:
+        """Removes random members from population.
+
+        :param k: Number of queries to be removed,
+            defaults to 1
+        :type k: int
+
+        :raises ValueError: if ``k`` exceeds population size
+        """
+        kept = bytearray(b"\x01") * self.size()
+        for i in random.sample(range(self.size()), k):
+            kept[i] = 0
+
+        self._take(
+                list(compress(range(self.size()), kept)),
+                ordered = True,
+                )
+
+    def remove_duplicates(self) -> None:
+        """Removes duplicate queries from population, keeping the first of each.
+        """
+        keys = self.genotype_keys()
+
+        # Inserted last to first, so each key ends up with its first position
+        first = dict(
+                zip(
+                    reversed(keys),
+                    range(len(keys) - 1, -1, -1),
+                    )
+                )
+
+        if len(first) < len(keys):
+            self._take(
+                    sorted(first.values()),
+                    ordered = True,
+                    )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional
+
+import hashlib
+import itertools
+import mmap
+
+
+def lines(
+        filepath: str,
+        n_lines: Optional[int] = None,
+        use_mmap: bool = False,
+        ) -> Iterator[str]:
+    """Yields lines of a text file without line endings, one at a time,
+    so that files larger than memory can be streamed into an index.
+
+    :param filepath: Path of UTF-8 text file
+    :type filepath: str
+
+    :param n_lines: Number of lines from the start of the file,
+        defaults to None for all lines
+    :type n_lines: int, optional
+
+    :param use_mmap: Whether to read the file through a memory map
+        instead of buffered reads, defaults to False
+    :type use_mmap: bool, optional
+
+    :return: Lines
+    :rtype: Iterator[str]
+    """
+    with open(filepath, "rb") as file:
+        if use_mmap:
+            try:
+                buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                return
+
+            with buffer:
+                yield from itertools.islice(
+                        _decoded(iter(buffer.readline, b"")),
+                        n_lines
+                        )
+        else:
+            yield from itertools.islice(
+                    _decoded(file),
+                    n_lines
+                    )
+
+def _decoded(raw_lines: Iterable[bytes]) -> Iterator[str]:
+    for line in raw_lines:
+        yield line.decode("utf-8").rstrip()
+
+def fingerprint(
+        filepath: str,
+        n_lines: Optional[int] = None,
+        ) -> str:
+    """Returns hash of the lines that :func:`lines` yields for the same arguments.
+
+    :param filepath: Path of text file
+    :type filepath: str
+
+    :param n_lines: Number of lines from the start of the file,
+        defaults to None for all lines
+    :type n_lines: int, optional
+
+    :return: Hexadecimal SHA-256 digest
+    :rtype: str
+    """
+    digest = hashlib.sha256(
+            "n_lines={}\n".format(n_lines).encode("utf-8")
+            )
+
+    with open(filepath, "rb") as file:
+        if n_lines is None:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        else:
+            for line in itertools.islice(file, n_lines):
+                digest.update(line)
+
+    return digest.hexdigest()
@@ -0,0 +1,89 @@
+"""Crossover operators on sorted arrays of term IDs.
+
+Each operator combines the terms of two parents into the terms of a child,
+returning a new sorted array.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+import bisect
+import random
+
+
+def uniform(a: array, b: array) -> array:
+    """Keeps terms of both parents, and each term of only one parent with probability 1/2.
+
+    :param a: Sorted term IDs of first parent
+    :type a: array
+
+    :param b: Sorted term IDs of second parent
+    :type b: array
+
+    :return: Sorted term IDs of child
+    :rtype: array
+    """
+    shared = set(a) & set(b)
+
+    return array(
+            'I',
+            sorted(
+                [
+                    term_id
+                    for term_id in set(a) | set(b)
+                    if term_id in shared or random.random() < 0.5
+                    ]
+                )
+            )
+
+def one_point(a: array, b: array) -> array:
+    """Takes the terms of the first parent below a random cut point in term order,
+    and the terms of the second parent from the cut point on.
+
+    :param a: Sorted term IDs of first parent
+    :type a: array
+
+    :param b: Sorted term IDs of second parent
+    :type b: array
+
+    :return: Sorted term IDs of child
+    :rtype: array
+    """
+    if len(a) + len(b) == 0:
+        return array('I')
+
+    cut = random.choice(
+            [ *a, *b, max([ *a, *b ]) + 1 ]
+            )
+
+    return a[:bisect.bisect_left(a, cut)] \
+            + b[bisect.bisect_left(b, cut):]
+
+def union(a: array, b: array) -> array:
+    """Keeps the terms of either parent.
+
+    :param a: Sorted term IDs of first parent
+    :type a: array
+
+    :param b: Sorted term IDs of second parent
+    :type b: array
+
+    :return: Sorted term IDs of child
+    :rtype: array
+    """
+    return array('I', sorted(set(a) | set(b)))
+
+def intersection(a: array, b: array) -> array:
+    """Keeps the terms of both parents.
+
+    :param a: Sorted term IDs of first parent
+    :type a: array
+
+    :param b: Sorted term IDs of second parent
+    :type b: array
+
+    :return: Sorted term IDs of child
+    :rtype: array
+    """
+    return array('I', sorted(set(a) & set(b)))
@@ -0,0 +1,616 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import math
+
+import elasticsearch
+import elasticsearch.helpers
+
+from elasticsearch.serializer import JSONSerializer
+from elasticsearch.exceptions import SerializationError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from backend import Backend
+from local_backend import LocalBackend, lossy_length
+
+
+# Response fields read from scoring searches, see :meth:`ESBackend._scoring_body`
+SCORE_FILTER_PATH = "hits.hits._score"
+
+# Response fields read from explanations
+EXPLANATION_FILTER_PATH = "matched,explanation"
+
+# Response fields read from searches and single documents
+SEARCH_FILTER_PATH = "took,timed_out,hits.total,hits.max_score,hits.hits._id,hits.hits._score,hits.hits._source"
+DOCUMENT_FILTER_PATH = "hits.hits._id,hits.hits._source"
+GET_FILTER_PATH = "_id,found,_source"
+
+# Response fields read from indexing requests
+INDEX_FILTER_PATH = "_index,_id,result,_shards"
+BULK_FILTER_PATH = "items.*.status,items.*.error"
+
+# Response fields read from term vectors, see :meth:`ESBackend.term_weights`
+TERM_VECTORS_FILTER_PATH = ",".join(
+        [
+            "found",
+            "term_vectors.full_text.field_statistics",
+            "term_vectors.full_text.terms.*.term_freq",
+            "term_vectors.full_text.terms.*.doc_freq",
+            ]
+        )
+
+
+class OrjsonSerializer(JSONSerializer):
+    """Serializer of request bodies and responses using orjson,
+    with the same fallbacks for non-JSON types as the default serializer.
+    """
+
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        # Strings are sent as they are, e.g. bulk lines
+        if isinstance(data, str):
+            return data
+
+        try:
+            return orjson.dumps(
+                    data,
+                    default = self.default,
+                    ).decode("utf-8")
+        except (orjson.JSONEncodeError, TypeError) as e:
+            raise SerializationError(data, e)
+
+
+# Name -> JSON serializer class of Elasticsearch clients
+SERIALIZERS = {
+        'json': JSONSerializer,
+        'orjson': OrjsonSerializer,
+        }
+
+def json_serializer(name: str = "auto") -> JSONSerializer:
+    """Returns JSON serializer for Elasticsearch clients by name.
+
+    :param name: "json" for the standard library, "orjson",
+        or "auto" for orjson if it is installed, defaults to "auto"
+    :type name: str, optional
+
+    :raises ImportError: if orjson is requested but not installed
+
+    :return: Serializer
+    :rtype: :class:`JSONSerializer`
+    """
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+
+    if name == "orjson" and orjson is None:
+        raise ImportError("orjson is not installed")
+
+    return SERIALIZERS[name]()
+
+
+class ESBackend(Backend):
+    """Backend that stores documents in an Elasticsearch index.
+
+    Responses are stripped down to the fields read by callers via ``filter_path``,
+    which saves transfer and decoding time.
+
+    :param name: Index name
+    :type name: str
+
+    :param host: Elasticsearch host URL
+    :type host: str
+
+    :param port: Elasticsearch host port
+    :type port: int
+
+    :param msearch_chunk_size: Maximum number of searches per multi search request,
+        defaults to 1000
+    :type msearch_chunk_size: int, optional
+
+    :param n_shards: Number of primary shards of created index,
+        defaults to 2
+    :type n_shards: int, optional
+
+    :param n_replicas: Number of replicas of created index,
+        defaults to 1
+    :type n_replicas: int, optional
+
+    :param bulk_chunk_size: Maximum number of documents per bulk request,
+        defaults to 500
+    :type bulk_chunk_size: int, optional
+
+    :param bulk_max_chunk_bytes: Maximum size of bulk requests in bytes,
+        defaults to 100 MiB
+    :type bulk_max_chunk_bytes: int, optional
+
+    :param bulk_threads: Number of threads sending bulk requests,
+        defaults to 1
+    :type bulk_threads: int, optional
+
+    :param serializer: JSON serializer of requests and responses,
+        defaults to orjson if it is installed, see :func:`json_serializer`
+    :type serializer: :class:`JSONSerializer`, optional
+
+    :param http_compress: Whether to gzip request bodies and accept compressed responses,
+        defaults to False
+    :type http_compress: bool, optional
+    """
+
+    def __init__(
+            self,
+            name: str,
+            host: str = "localhost",
+            port: int = 9200,
+            msearch_chunk_size: int = 1000,
+            n_shards: int = 2,
+            n_replicas: int = 1,
+            bulk_chunk_size: int = 500,
+            bulk_max_chunk_bytes: int = 100 * 1024 * 1024,
+            bulk_threads: int = 1,
+            serializer: Optional[JSONSerializer] = None,
+            http_compress: bool = False,
+            ):
+        """Constructor method
+        """
+        super().__init__(name)
+
+        self.es = elasticsearch.Elasticsearch(
+                [
+                    {
+                        'host': host,
+                        'port': port,
+                        }
+                    ],
+                timeout = 300,
+                serializer = serializer or json_serializer(),
+                http_compress = http_compress,
+                )
+
+        self.msearch_chunk_size = msearch_chunk_size
+        self.n_shards = n_shards
+        self.n_replicas = n_replicas
+        self.bulk_chunk_size = bulk_chunk_size
+        self.bulk_max_chunk_bytes = bulk_max_chunk_bytes
+        self.bulk_threads = bulk_threads
+
+        # Term -> whether the index analyzer turns it into one token
+        self._single_token = {}
+
+    def index_body(self) -> Dict:
+        """Returns settings and mappings of created indices.
+
+        :return: Index creation body
+        :rtype: Dict
+        """
+        return {
+                'settings' : {
+                    'number_of_shards': self.n_shards,
+                    'number_of_replicas': self.n_replicas
+                    },
+                'mappings': {
+                    'properties': {
+                        'full_text': {
+                            'type': 'text'
+                            },
+                        }
+                    }
+                }
+
+    def ensure_index(self) -> None:
+        """Creates or recreates index.
+        """
+        self.es.indices.delete(
+            index = self.name,
+            ignore_unavailable = True
+            )
+
+        self.es.indices.create(
+            index = self.name,
+            body = self.index_body()
+            )
+
+    def is_single_token(self, term: str) -> bool:
+        """Returns whether the analyzer of the full text field turns term into exactly one token,
+        asking the index once per term.
+
+        :param term: Term
+        :type term: str
+
+        :return: Whether term is a single token
+        :rtype: bool
+        """
+        single_token = self._single_token.get(term)
+
+        if single_token is None:
+            response = self.es.indices.analyze(
+                    index = self.name,
+                    body = {
+                        'field': "full_text",
+                        'text': term,
+                        },
+                    filter_path = "tokens.token",
+                    )
+
+            single_token = len(response.get('tokens', [])) == 1
+            self._single_token[term] = single_token
+
+        return single_token
+
+    def fingerprint(self) -> Optional[str]:
+        """Returns fingerprint of the indexed corpus from the index mapping metadata.
+
+        :return: Fingerprint, or None if the index does not exist or has none
+        :rtype: str, optional
+        """
+        try:
+            mapping = self.es.indices.get_mapping(
+                    index = self.name,
+                    filter_path = "*.mappings._meta.fingerprint",
+                    )
+
+        except elasticsearch.NotFoundError:
+            return None
+
+        # Empty after filtering if there is no fingerprint
+        return next(iter(mapping.values()), {}) \
+                .get('mappings', {}) \
+                .get('_meta', {}) \
+                .get('fingerprint')
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Records fingerprint of the indexed corpus in the index mapping metadata.
+
+        :param fingerprint: Fingerprint
+        :type fingerprint: str
+        """
+        self.es.indices.put_mapping(
+                index = self.name,
+                body = {
+                    '_meta': {
+                        'fingerprint': fingerprint,
+                        }
+                    },
+                )
+
+    def _bulk_data_generator(self, texts: Iterable[str]) -> Iterator[Dict]:
+        """Generator for document indexing actions.
+
+        :param texts: Documents
+        :type texts: Iterable[str]
+
+        :return: Action
+        :rtype: Dict
+        """
+        for text in texts:
+            yield {
+                    '_op_type': "index",
+                    '_index': self.name,
+                    '_source': {
+                        'full_text': text,
+                        },
+                    }
+
+    def add(self, text: str) -> Dict:
+        """Adds single document to index.
+
+        :param text: Document text
+        :type text: str
+
+        :return: Elasticsearch response
+        :rtype: Dict
+        """
+        return self.es.index(
+                index = self.name,
+                refresh = "wait_for",
+                body = {
+                    'full_text': text
+                    },
+                filter_path = INDEX_FILTER_PATH,
+                )
+
+    def add_bulk(self, texts: Iterable[str]) -> Tuple[int, List]:
+        """Adds many documents to index, sent in chunks as they are read,
+        by :attr:`bulk_threads` threads.
+
+        Replicas and periodic refreshes are disabled during the load,
+        and the index is refreshed once afterwards.
+
+        :param texts: Document texts
+        :type texts: Iterable[str]
+
+        :raises BulkIndexError: if documents could not be indexed
+
+        :return: Number of indexed documents and list of errors
+        :rtype: Tuple[int, List]
+        """
+        n = 0
+        errors = []
+
+        with self._bulk_load():
+            if self.bulk_threads > 1:
+                results = elasticsearch.helpers.parallel_bulk(
+                        client = self.es,
+                        actions = self._bulk_data_generator(texts),
+                        thread_count = self.bulk_threads,
+                        chunk_size = self.bulk_chunk_size,
+                        max_chunk_bytes = self.bulk_max_chunk_bytes,
+                        filter_path = BULK_FILTER_PATH,
+                        )
+            else:
+                results = elasticsearch.helpers.streaming_bulk(
+                        client = self.es,
+                        actions = self._bulk_data_generator(texts),
+                        chunk_size = self.bulk_chunk_size,
+                        max_chunk_bytes = self.bulk_max_chunk_bytes,
+                        filter_path = BULK_FILTER_PATH,
+                        )
+
+            for ok, item in results:
+                if ok:
+                    n += 1
+                else:
+                    errors.append(item)
+
+        return n, errors
+
+    @contextmanager
+    def _bulk_load(self) -> Iterator[None]:
+        """Context in which the index has no replicas and is not refreshed,
+        restoring both settings and refreshing the index on exit.
+        """
+        settings = next(
+                iter(
+                    self.es.indices.get_settings(
+                        index = self.name,
+                        flat_settings = True,
+                        ).values()
+                    )
+                )['settings']
+
+        self.es.indices.put_settings(
+                index = self.name,
+                body = {
+                    'index': {
+                        'number_of_replicas': 0,
+                        'refresh_interval': "-1",
+                        }
+                    },
+                )
+
+        try:
+            yield
+
+        finally:
+            # Settings that were not set explicitly are reset to their defaults
+            self.es.indices.put_settings(
+                    index = self.name,
+                    body = {
+                        'index': {
+                            'number_of_replicas': settings.get('index.number_of_replicas'),
+                            'refresh_interval': settings.get('index.refresh_interval'),
+                            }
+                        },
+                    )
+            self.es.indices.refresh(
+                    index = self.name,
+                    )
+
+    def get(self, id: str) -> Dict:
+        """Returns document from index by ID.
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Elasticsearch response
+        :rtype: Dict
+        """
+        return self.es.get(
+                index = self.name,
+                id = id,
+                filter_path = GET_FILTER_PATH,
+                )
+
+    def search(self, body: Dict) -> Dict:
+        """Returns query response from index.
+
+        :param body: Search body
+        :type body: Dict
+
+        :return: Elasticsearch response
+        :rtype: Dict
+        """
+        return self.es.search(
+                index = self.name,
+                body = body,
+                filter_path = SEARCH_FILTER_PATH,
+                )
+
+    def random_document(self) -> Dict:
+        """Returns random document from index.
+
+        :return: Elasticsearch response
+        :rtype: Dict
+        """
+        return self.es.search(
+                index = self.name,
+                body = {
+                    'size': 1,
+                    'query': {
+                        'function_score': {
+                            'query': {
+                                'match_all': {}
+                                },
+                            'random_score': {}
+                            }
+                        }
+                    },
+                filter_path = DOCUMENT_FILTER_PATH,
+                )
+
+    def explain(self, body: Dict, id: str) -> Dict:
+        """Returns Elasticsearch explanation for match between query body and document by ID.
+
+        :param body: Search body
+        :type body: Dict
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Elasticsearch response with ``matched`` and ``explanation`` only
+        :rtype: Dict
+        """
+        return self.es.explain(
+                index = self.name,
+                id = id,
+                body = body,
+                filter_path = EXPLANATION_FILTER_PATH,
+                )
+
+    @staticmethod
+    def _scoring_body(body: Dict, id: str) -> Dict:
+        """Returns search body that scores query body against single document by ID.
+
+        The query is wrapped as sole scoring clause next to a non-scoring
+        ``ids`` filter, so the hit score equals the explanation value.
+        Responses only need to carry the hit score, see :data:`SCORE_FILTER_PATH`.
+
+        :param body: Search body
+        :type body: Dict
+
+        :param id: ID of document in index
+        :type id: str
+
+        :return: Search body
+        :rtype: Dict
+        """
+        return {
+                'size': 1,
+                '_source': False,
+                'query': {
+                    'bool': {
+                        'must': body['query'],
+                        'filter': [
+                            {
+                                'ids': {
+                                    'values': [ id ]
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                }
+
+    def score_many(self, bodies: List[Dict], id: str) -> List[float]:
+        """Returns match scores between many query bodies and document by ID.
+        Bodies are sent in chunks via multi search requests,
+        whose responses are stripped down to the scores of the hits.
+        A query that does not match the document scores 0.0.
+
+        :param bodies: List of search bodies
+        :type bodies: List[Dict]
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises Exception: if a search in a request failed
+
+        :return: Scores in order of ``bodies``
+        :rtype: List[float]
+        """
+        scores = []
+
+        for start in range(0, len(bodies), self.msearch_chunk_size):
+            request = []
+            for body in bodies[start:start + self.msearch_chunk_size]:
+                request.append({})
+                request.append(ESBackend._scoring_body(body, id))
+
+            # Status keeps responses without hits in place
+            responses = self.es.msearch(
+                    index = self.name,
+                    body = request,
+                    filter_path = "responses.status,responses.error,responses." + SCORE_FILTER_PATH,
+                    )['responses']
+
+            for response in responses:
+                if 'error' in response:
+                    raise Exception(response['error'])
+
+                hits = response.get('hits', {}).get('hits', [])
+                scores.append(
+                        hits[0]['_score']
+                        if len(hits) > 0
+                        else 0.0
+                        )
+
+        return scores
+
+    def term_weights(self, id: str) -> Dict[str, float]:
+        """Returns BM25 score contribution of each term in document by ID,
+        computed from a single term vectors request with term and field statistics.
+
+        Statistics are those of the shard holding the document,
+        as used when scoring searches against it.
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises KeyError: if ID does not exist in index
+
+        :return: Term weights
+        :rtype: Dict[str, float]
+        """
+        response = self.es.termvectors(
+                index = self.name,
+                id = id,
+                fields = "full_text",
+                term_statistics = True,
+                field_statistics = True,
+                positions = False,
+                offsets = False,
+                payloads = False,
+                filter_path = TERM_VECTORS_FILTER_PATH,
+                )
+
+        if not response['found']:
+            raise KeyError(id)
+
+        if 'full_text' not in response.get('term_vectors', {}):
+            return {}
+
+        vectors = response['term_vectors']['full_text']
+        n_documents = vectors['field_statistics']['doc_count']
+        avgdl = vectors['field_statistics']['sum_ttf'] / n_documents
+
+        length = lossy_length(
+                sum(
+                    [
+                        statistics['term_freq']
+                        for statistics in vectors['terms'].values()
+                        ]
+                    )
+                )
+        tf_norm = LocalBackend.K1 * (
+                1
+                - LocalBackend.B
+                + LocalBackend.B * length / avgdl
+                )
+
+        return {
+                term: (LocalBackend.K1 + 1) \
+                        * math.log(
+                            1 + (n_documents - statistics['doc_freq'] + 0.5) / (statistics['doc_freq'] + 0.5)
+                            ) \
+                        * statistics['term_freq'] / (statistics['term_freq'] + tf_norm)
+                for term, statistics in vectors['terms'].items()
+                }
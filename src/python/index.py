@@ -1,16 +1,22 @@
+import hashlib
+import json
 import logging
+import os
+import time
 
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import elasticsearch
-from elasticsearch.helpers import bulk
+import instrumentation
 
+from backend import Backend
+from cache import FitnessCache
 from query import Query
+from target_profile import TargetProfile
 from vocabulary import Vocabulary
 
 
 class Index():
-    """Class for managing access Elasticsearch index.
+    """Class for managing access to a search index.
 
     :param name: Index name
     :type name: str
@@ -20,6 +26,23 @@ class Index():
 
     :param port Elasticsearch host port
     :type port: int
+
+    :param backend: Search engine storing the documents,
+        defaults to an Elasticsearch backend on ``host`` and ``port``
+    :type backend: :class:`Backend`, optional
+
+    :param cache_size: Maximum number of cached query scores, 0 disables caching,
+        defaults to 100000
+    :type cache_size: int, optional
+
+    :param recreate: Whether to recreate the index, or to attach to an existing one,
+        defaults to True
+    :type recreate: bool, optional
+
+    :param record_documents: Whether the vocabulary records documents,
+        as needed by some mutation proposals (see :attr:`Proposal.uses_documents`),
+        defaults to False
+    :type record_documents: bool, optional
     """
 
     def __init__(
@@ -27,125 +50,198 @@ class Index():
             name: str,
             host: str = "localhost",
             port: int = 9200,
+            backend: Optional[Backend] = None,
+            cache_size: int = 100000,
+            recreate: bool = True,
+            record_documents: bool = False,
             ):
         """Constructor method
         """
         self.name = name
 
-        self.es = elasticsearch.Elasticsearch(
-                [
-                    {
-                        'host': host,
-                        'port': port,
-                        }
-                    ],
-                timeout = 300
-                )
+        if backend is None:
+            from es_backend import ESBackend
 
-        self.vocabulary = Vocabulary()
+            backend = ESBackend(
+                    name = name,
+                    host = host,
+                    port = port,
+                    )
 
-        self.ensure_index()
+        self.backend = backend
+
+        self.record_documents = record_documents
+        self.vocabulary = Vocabulary(record_documents = record_documents)
+
+        # Document ID -> target profile, valid until the corpus changes
+        self._profiles = {}
+
+        # Incremented whenever the corpus changes
+        self.version = 0
+
+        self.fitness_cache = FitnessCache(cache_size)
+
+        # Throughput of the last bulk load, see :meth:`add_bulk`
+        self.bulk_stats = None
+
+        if recreate:
+            self.ensure_index()
+
+    @property
+    def es(self):
+        """Elasticsearch client of Elasticsearch backend.
+        """
+        return self.backend.es
+
+    def _corpus_changed(self) -> None:
+        """Invalidates all data derived from the corpus.
+        """
+        self.version += 1
+        self._profiles.clear()
+        self.fitness_cache.clear()
 
     def ensure_index(self) -> None:
         """Creates or recreates index.
 
         :raises Exception: if index creation failed
         """
-        try:
-            self.es.indices.delete(
-                index = self.name,
-                ignore_unavailable = True
-                )
+        self._corpus_changed()
 
-            self.es.indices.create(
-                index = self.name,
-                body = {
-                    'settings' : {
-                        'number_of_shards': 2,
-                        'number_of_replicas': 1
-                        },
-                    'mappings': {
-                        'properties': {
-                            'full_text': {
-                                'type': 'text'
-                                },
-                            }
-                        }
-                    }
-                )
+        try:
+            self.backend.ensure_index()
 
         except Exception as e:
-            logging.ERROR(str(e))
+            logging.error(str(e))
             exit(1)
 
-    def _bulk_data_generator(self, texts: List[str]) -> Dict:
-        """Generator for document indexing actions.
-
-        :param texts: List of documents
-        :type texts: List[str]
-
-        :return: Action
-        :rtype: Dict
-        """
-        for text in texts:
-            yield {
-                    '_op_type': "index",
-                    '_index': self.name,
-                    '_source': {
-                        'full_text': text,
-                        },
-                    }
-
     def add(self, text: str) -> Dict:
         """Adds single document to index and adds its words to vocabulary.
 
         :param text: Document text
         :type text: str
 
-        :return: Elasticsearch response
+        :return: Backend response
         :rtype: Dict
         """
         self.vocabulary.add_words_from(text)
+        self._corpus_changed()
 
-        return self.es.index(
-                index = self.name,
-                refresh = "wait_for",
-                body = {
-                    'full_text': text
-                    },
-                )
+        return self.backend.add(text)
 
-    def add_bulk(self, texts: List[str]) -> Dict:
+    def add_bulk(self, texts: Iterable[str]) -> Tuple[int, List]:
         """Adds many documents to index and adds their words to vocabulary.
 
-        :param text: Document text
-        :type text: str
+        Texts are consumed in a single pass, so they can be streamed,
+        e.g. from :func:`corpus.lines`, without being held in memory.
+        Afterwards, :attr:`bulk_stats` holds the number of documents and bytes,
+        the duration in seconds, and the throughput in documents and megabytes per second.
 
-        :return: Elasticsearch response
-        :rtype: Dict
+        :param texts: Document texts
+        :type texts: Iterable[str]
+
+        :return: Number of indexed documents and list of errors
+        :rtype: Tuple[int, List]
+        """
+        self.bulk_stats = {
+                'documents': 0,
+                'bytes': 0,
+                }
+        start_time = time.perf_counter()
+
+        try:
+            return self.backend.add_bulk(
+                    self._counted(texts)
+                    )
+
+        finally:
+            self._corpus_changed()
+
+            seconds = time.perf_counter() - start_time
+            self.bulk_stats['seconds'] = seconds
+            self.bulk_stats['documents_per_second'] = self.bulk_stats['documents'] / seconds \
+                    if seconds > 0 \
+                    else 0.0
+            self.bulk_stats['megabytes_per_second'] = self.bulk_stats['bytes'] / 1e6 / seconds \
+                    if seconds > 0 \
+                    else 0.0
+
+    def _counted(self, texts: Iterable[str]) -> Iterator[str]:
+        """Yields texts after adding their words to vocabulary and to :attr:`bulk_stats`.
         """
         for text in texts:
             self.vocabulary.add_words_from(text)
+            self.bulk_stats['documents'] += 1
+            self.bulk_stats['bytes'] += len(text.encode("utf-8"))
+            yield text
+
+    def load(
+            self,
+            texts: Iterable[str],
+            corpus_fingerprint: str,
+            snapshot_dir: str,
+            ) -> bool:
+        """Reuses the existing index if it holds the same corpus, or recreates it from texts.
 
-        return elasticsearch.helpers.bulk(
-                client = self.es,
-                actions = self._bulk_data_generator(texts),
-                refresh = "wait_for",
+        The fingerprint of an index combines the corpus fingerprint,
+        e.g. from :func:`corpus.fingerprint`, with the settings and mappings of the backend.
+        It is recorded in the backend after all texts have been added,
+        next to a snapshot of the vocabulary in ``snapshot_dir``.
+        If both are found, texts are not consumed at all.
+
+        :param texts: Document texts, consumed only if the index is recreated
+        :type texts: Iterable[str]
+
+        :param corpus_fingerprint: Fingerprint of the texts
+        :type corpus_fingerprint: str
+
+        :param snapshot_dir: Directory of vocabulary snapshots
+        :type snapshot_dir: str
+
+        :return: Whether the existing index was reused
+        :rtype: bool
+        """
+        fingerprint = hashlib.sha256(
+                (
+                    corpus_fingerprint
+                    + json.dumps(self.backend.index_body(), sort_keys = True)
+                    ).encode("utf-8")
+                ).hexdigest()
+
+        # Snapshots without documents cannot serve an index recording them
+        snapshot_path = os.path.join(
+                snapshot_dir,
+                fingerprint + (".documents" if self.record_documents else "") + ".vocabulary",
                 )
 
+        if self.backend.fingerprint() == fingerprint \
+                and os.path.exists(snapshot_path):
+            self.vocabulary = Vocabulary.load(
+                    snapshot_path,
+                    record_documents = self.record_documents,
+                    )
+            self._corpus_changed()
+            return True
+
+        self.ensure_index()
+        self.vocabulary = Vocabulary(record_documents = self.record_documents)
+        self.add_bulk(texts)
+
+        os.makedirs(snapshot_dir, exist_ok = True)
+        self.vocabulary.save(snapshot_path)
+        self.backend.set_fingerprint(fingerprint)
+
+        return False
+
     def get(self, id: int) -> Dict:
         """Returns document from Index by ID.
 
         :param id: ID of document in index
         :type id: int
 
-        :return: Elasticsearch response
+        :return: Backend response
         :rtype: Dict
         """
-        return self.es.get(
-                index = self.name,
-                id = id,
-                )
+        return self.backend.get(id)
 
     def search(self, query: Query) -> Dict:
         """Returns query response from index.
@@ -153,37 +249,24 @@ class Index():
         :param query: Query
         :type query: :class:`Query`
 
-        :return: Elasticsearch response
+        :return: Backend response
         :rtype: Dict
         """
-        return self.es.search(
-                index = self.name,
-                body = query.body
-                )
+        instrumentation.count("index.backend_calls")
+
+        with instrumentation.timer("index.search"):
+            return self.backend.search(query.body)
 
     def random_document(self) -> Dict:
         """Returns random document from index.
 
-        :return: Elasticsearch response
+        :return: Backend response
         :rtype: Dict
         """
-        return self.es.search(
-                index = self.name,
-                body = {
-                    'size': 1,
-                    'query': {
-                        'function_score': {
-                            'query': {
-                                'match_all': {}
-                                },
-                            'random_score': {}
-                            }
-                        }
-                    }
-                )
+        return self.backend.random_document()
 
     def explain(self, query: Query, id: int) -> Dict:
-        """Returns Elasticsearch explanation for match between query and document by ID.
+        """Returns explanation for match between query and document by ID.
 
         :param query: Query
         :type query: :class:`Query`
@@ -193,17 +276,184 @@ class Index():
 
         :raises Exception: if ID does not exist in index
 
-        :return: Elasticsearch response
+        :return: Backend response
         :rtype: Dict
         """
+        instrumentation.count("index.backend_calls")
+
         try:
-            return self.es.explain(
-                    index = self.name,
-                    id = id,
-                    body = query.body,
-                    )
+            with instrumentation.timer("index.explain"):
+                return self.backend.explain(
+                        body = query.body,
+                        id = id,
+                        )
 
         except Exception as e:
-            logging.ERROR(str(e))
+            logging.error(str(e))
             exit(1)
 
+    def score_many(self, queries: List[Query], id: int) -> List[float]:
+        """Returns match scores between many queries and document by ID.
+        A query that does not match the document scores 0.0.
+
+        :param queries: List of queries
+        :type queries: List[Query]
+
+        :param id: ID of document in index
+        :type id: int
+
+        Scores are looked up in the fitness cache first,
+        only uncached queries are sent to the backend.
+
+        :raises Exception: if scoring failed
+
+        :return: Scores in order of ``queries``
+        :rtype: List[float]
+        """
+        return self.score_genotypes(
+                keys = [
+                    query.genotype_key()
+                    for query in queries
+                    ],
+                body = lambda i: queries[i].body,
+                id = id,
+                )
+
+    def score_genotypes(
+            self,
+            keys: List[bytes],
+            body: Callable[[int], Dict],
+            id: int,
+            ) -> List[float]:
+        """Returns match scores between many genotypes and document by ID,
+        without requiring a :class:`Query` object per genotype.
+        A query that does not match the document scores 0.0.
+
+        Scores are looked up in the fitness cache first,
+        only the bodies of uncached genotypes are rendered and sent to the backend.
+
+        :param keys: Genotype keys, see :meth:`Query.genotype_key`
+        :type keys: List[bytes]
+
+        :param body: Function returning the query body of a genotype by its position
+        :type body: Callable[[int], Dict]
+
+        :param id: ID of document in index
+        :type id: int
+
+        :raises Exception: if scoring failed
+
+        :return: Scores in order of ``keys``
+        :rtype: List[float]
+        """
+        scores, misses = self.cached_scores(keys, id)
+
+        if len(misses) > 0:
+            instrumentation.count("index.backend_calls")
+            instrumentation.count("index.scored_queries", len(misses))
+
+            try:
+                with instrumentation.timer("index.score_many"):
+                    new_scores = self.backend.score_many(
+                            bodies = [
+                                body(positions[0])
+                                for positions in misses.values()
+                                ],
+                            id = id,
+                            )
+
+            except Exception as e:
+                logging.error(str(e))
+                exit(1)
+
+            self.cache_scores(scores, misses, new_scores)
+
+        return scores
+
+    def cached_scores(
+            self,
+            keys: List[bytes],
+            id: int,
+            ) -> Tuple[List[Optional[float]], Dict[Tuple, List[int]]]:
+        """Looks up scores of genotypes against document by ID in the fitness cache.
+
+        :param keys: Genotype keys, see :meth:`Query.genotype_key`
+        :type keys: List[bytes]
+
+        :param id: ID of document in index
+        :type id: int
+
+        :return: Scores in order of ``keys``, None where uncached,
+            and cache key -> positions of each distinct uncached genotype,
+            see :meth:`cache_scores`
+        :rtype: Tuple[List[Optional[float]], Dict[Tuple, List[int]]]
+        """
+        cache_keys = [
+                (key, id, self.version)
+                for key in keys
+                ]
+        scores = [
+                self.fitness_cache.get(cache_key)
+                for cache_key in cache_keys
+                ]
+
+        # Cache key -> positions of uncached genotypes, so equal genotypes are scored once
+        misses = {}
+        for i, score in enumerate(scores):
+            if score is None:
+                misses.setdefault(cache_keys[i], []).append(i)
+
+        n_misses = sum(
+                [
+                    len(positions)
+                    for positions in misses.values()
+                    ]
+                )
+        instrumentation.count("index.cache_hits", len(keys) - n_misses)
+        instrumentation.count("index.cache_misses", n_misses)
+
+        return scores, misses
+
+    def cache_scores(
+            self,
+            scores: List[Optional[float]],
+            misses: Dict[Tuple, List[int]],
+            new_scores: List[float],
+            ) -> None:
+        """Caches new scores of uncached genotypes and fills them in.
+
+        :param scores: Scores from :meth:`cached_scores`, filled in place
+        :type scores: List[Optional[float]]
+
+        :param misses: Uncached genotypes from :meth:`cached_scores`
+        :type misses: Dict[Tuple, List[int]]
+
+        :param new_scores: Scores in order of ``misses``
+        :type new_scores: List[float]
+        """
+        for (cache_key, positions), score in zip(misses.items(), new_scores):
+            self.fitness_cache.put(cache_key, score)
+            for i in positions:
+                scores[i] = score
+
+    def target_profile(self, id: int) -> TargetProfile:
+        """Returns precomputed scoring data of document by ID,
+        for scoring queries against it without further backend calls.
+
+        :param id: ID of document in index
+        :type id: int
+
+        :raises NotImplementedError: if backend cannot provide term weights
+
+        :return: Target profile
+        :rtype: :class:`TargetProfile`
+        """
+        if id not in self._profiles:
+            instrumentation.count("index.backend_calls")
+
+            with instrumentation.timer("index.target_profile"):
+                self._profiles[id] = TargetProfile(
+                        self.backend.term_weights(id)
+                        )
+
+        return self._profiles[id]
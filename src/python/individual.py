@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 
 class Individual(ABC):
+    __slots__ = ('fitness', 'n_mutations')
+
     def __init__(self):
         super().__init__()
 
@@ -0,0 +1,227 @@
+"""Process-wide timers and counters, collected into one record per generation.
+
+Library code reports what it does through the module-level functions,
+like it reports messages through :mod:`logging`::
+
+    with instrumentation.timer("index.score_many"):
+        ...
+    instrumentation.count("index.backend_calls")
+
+and the caller turns everything collected since the last record
+into a structured record with :func:`record`.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+class Instrumentation():
+    """Collects wall times, numbers of calls, counters and gauges.
+    """
+
+    def __init__(self):
+        """Constructor method
+        """
+        self.reset()
+
+    def reset(self) -> None:
+        """Discards everything collected so far.
+        """
+        # Name -> total wall time in seconds
+        self.seconds = defaultdict(float)
+
+        # Name -> number of timed calls
+        self.calls = defaultdict(int)
+
+        # Name -> count
+        self.counters = defaultdict(int)
+
+        # Name -> last value
+        self.gauges = {}
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Context that adds its wall time and one call to ``name``.
+
+        :param name: Name of timed phase or operation
+        :type name: str
+        """
+        start_time = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.seconds[name] += time.perf_counter() - start_time
+            self.calls[name] += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Adds to counter.
+
+        :param name: Name of counter
+        :type name: str
+
+        :param n: Increment, defaults to 1
+        :type n: int, optional
+        """
+        self.counters[name] += n
+
+    def gauge(self, name: str, value: float) -> None:
+        """Sets gauge to its current value.
+
+        :param name: Name of gauge
+        :type name: str
+
+        :param value: Value
+        :type value: float
+        """
+        self.gauges[name] = value
+
+    def record(self, **fields: Any) -> Dict:
+        """Returns everything collected since the last record, and resets.
+
+        :param fields: Additional fields of the record, e.g. the generation
+
+        :return: Record with the given fields, ``seconds``, ``calls``, ``counters``,
+            ``gauges`` and ``memory``
+        :rtype: Dict
+        """
+        record = {
+                **fields,
+                'seconds': dict(self.seconds),
+                'calls': dict(self.calls),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'memory': memory_usage(),
+                }
+
+        self.reset()
+
+        return record
+
+
+def memory_usage() -> Dict[str, int]:
+    """Returns current memory usage of the process.
+
+    :return: Number of allocated Python memory blocks,
+        peak resident set size in bytes where available,
+        and current and peak traced bytes if :mod:`tracemalloc` is tracing
+    :rtype: Dict[str, int]
+    """
+    usage = {
+            'allocated_blocks': sys.getallocatedblocks(),
+            }
+
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Kilobytes on Linux, bytes on macOS
+        usage['max_rss_bytes'] = max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    if tracemalloc.is_tracing():
+        usage['traced_bytes'], usage['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+
+    return usage
+
+def prometheus_text(record: Dict, prefix: str = "evolve_a_query") -> str:
+    """Returns record in the Prometheus text exposition format.
+
+    Numeric top-level fields of the record become gauges of their own.
+
+    :param record: Record from :func:`record`
+    :type record: Dict
+
+    :param prefix: Prefix of metric names,
+        defaults to "evolve_a_query"
+    :type prefix: str, optional
+
+    :return: Metrics, one sample per line
+    :rtype: str
+    """
+    lines = []
+
+    def family(name, kind, help, samples):
+        lines.append("# HELP {}_{} {}".format(prefix, name, help))
+        lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+        for labels, value in samples:
+            lines.append(
+                    "{}_{}{} {}".format(
+                        prefix,
+                        name,
+                        "{" + ",".join(
+                            '{}="{}"'.format(label, _escaped(str(label_value)))
+                            for label, label_value in labels.items()
+                            ) + "}" if len(labels) > 0 else "",
+                        repr(float(value)),
+                        )
+                    )
+
+    for field, value in record.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            family(field, "gauge", field.replace("_", " "), [ ({}, value) ])
+
+    family("phase_seconds", "gauge", "wall time per phase or operation", [
+            ({ 'name': name }, value)
+            for name, value in sorted(record['seconds'].items())
+            ])
+    family("phase_calls", "gauge", "calls per phase or operation", [
+            ({ 'name': name }, value)
+            for name, value in sorted(record['calls'].items())
+            ])
+    family("events", "gauge", "events counted since the last record", [
+            ({ 'name': name }, value)
+            for name, value in sorted(record['counters'].items())
+            ])
+    family("values", "gauge", "last reported values", [
+            ({ 'name': name }, value)
+            for name, value in sorted(record['gauges'].items())
+            ])
+    family("memory", "gauge", "memory usage", [
+            ({ 'kind': kind }, value)
+            for kind, value in sorted(record['memory'].items())
+            ])
+
+    return "\n".join(lines) + "\n"
+
+def _escaped(value: str) -> str:
+    return value \
+            .replace("\\", "\\\\") \
+            .replace("\"", "\\\"") \
+            .replace("\n", "\\n")
+
+
+# Instrumentation of this process, used through the functions below
+_instrumentation = Instrumentation()
+
+def timer(name: str):
+    """Context that times ``name``, see :meth:`Instrumentation.timer`."""
+    return _instrumentation.timer(name)
+
+def count(name: str, n: int = 1) -> None:
+    """Adds to counter, see :meth:`Instrumentation.count`."""
+    _instrumentation.count(name, n)
+
+def gauge(name: str, value: float) -> None:
+    """Sets gauge, see :meth:`Instrumentation.gauge`."""
+    _instrumentation.gauge(name, value)
+
+def record(**fields: Any) -> Dict:
+    """Returns everything collected since the last record, see :meth:`Instrumentation.record`."""
+    return _instrumentation.record(**fields)
+
+def reset() -> None:
+    """Discards everything collected so far."""
+    _instrumentation.reset()
@@ -0,0 +1,314 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+from typing import Callable, Container, Iterator, List, Optional
+
+import random
+
+from action import evolutionary_actions
+from queries import EvaluationMode, Queries, RecombinationMode
+from query import Query
+from strategy import Strategy
+from target_profile import TargetProfile
+
+
+class ProfileEvaluator():
+    """Scores populations locally from a precomputed target profile.
+
+    :param profile: Profile of target document
+    :type profile: :class:`TargetProfile`
+    """
+
+    def __init__(self, profile: TargetProfile):
+        """Constructor method
+        """
+        self.profile = profile
+
+    def __call__(self, queries: Queries) -> None:
+        queries.evaluate_with_profile(self.profile)
+
+
+class SearchEvaluator():
+    """Scores populations via requests to an existing Elasticsearch index.
+    The connection is opened lazily, so evaluators can be sent to worker processes.
+
+    :param name: Index name
+    :type name: str
+
+    :param host: Elasticsearch host URL
+    :type host: str
+
+    :param port: Elasticsearch host port
+    :type port: int
+
+    :param target_id: ID of target document in index
+    :type target_id: str
+
+    :param compact_body: Whether to send compact query bodies,
+        see :meth:`Query.render_body`, defaults to False
+    :type compact_body: bool, optional
+
+    :param serializer: Name of JSON serializer of requests and responses,
+        see :func:`es_backend.json_serializer`, defaults to "auto"
+    :type serializer: str, optional
+
+    :param http_compress: Whether to compress requests and responses,
+        defaults to False
+    :type http_compress: bool, optional
+    """
+
+    def __init__(
+            self,
+            name: str,
+            host: str,
+            port: int,
+            target_id: str,
+            compact_body: bool = False,
+            serializer: str = "auto",
+            http_compress: bool = False,
+            ):
+        """Constructor method
+        """
+        self.name = name
+        self.host = host
+        self.port = port
+        self.target_id = target_id
+        self.compact_body = compact_body
+        self.serializer = serializer
+        self.http_compress = http_compress
+
+        self._index = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
+
+    def __call__(self, queries: Queries) -> None:
+        if self._index is None:
+            from es_backend import ESBackend, json_serializer
+            from index import Index
+
+            self._index = Index(
+                    name = self.name,
+                    backend = ESBackend(
+                        name = self.name,
+                        host = self.host,
+                        port = self.port,
+                        serializer = json_serializer(self.serializer),
+                        http_compress = self.http_compress,
+                        ),
+                    recreate = False,
+                    )
+
+            # Worker processes do not necessarily inherit class attributes
+            Query.compact_body = self._index.backend.is_single_token \
+                    if self.compact_body else None
+
+        queries.evaluate(
+                index = self._index,
+                target_id = self.target_id,
+                mode = EvaluationMode.SEARCH,
+                )
+
+
+# Evaluator, words, proposal and recombination mode of the current worker process,
+# set once by :func:`_init_worker`
+_evaluator = None
+_words = None
+_proposal = None
+_recombination_mode = RecombinationMode.CLONE
+
+def _init_worker(
+        evaluator,
+        words: List[str],
+        proposal: Optional[Callable[[array, Container[str]], Optional[str]]],
+        recombination_mode: RecombinationMode,
+        ) -> None:
+    global _evaluator, _words, _proposal, _recombination_mode
+    _evaluator = evaluator
+    _words = words
+    _proposal = proposal
+    _recombination_mode = recombination_mode
+
+def _evolve_island(
+        individuals: List[Query],
+        strategy: Strategy,
+        n_generations: int,
+        seed: Optional[int],
+        ) -> List[Query]:
+    """Evolves a population in a worker process and returns its queries freshly evaluated.
+    Only queries are exchanged with the worker, as the vocabulary is sent once per worker.
+    """
+    random.seed(seed)
+
+    queries = Queries(
+            words = _words,
+            queries = individuals,
+            proposal = _proposal,
+            )
+
+    actions = evolutionary_actions(
+            queries,
+            recombination_mode = _recombination_mode,
+            )
+
+    for generation in range(n_generations):
+        if queries.size() == 0:
+            break
+
+        _evaluator(queries)
+
+        for action in strategy.actions(
+                generation = generation,
+                queries = queries,
+                actions = actions,
+                ):
+            action.func()
+
+    _evaluator(queries)
+
+    return queries.queries
+
+
+class Islands():
+    """Island model: populations that evolve independently in worker processes
+    and exchange their fittest queries between epochs.
+
+    Migration follows a ring: each island receives copies of the
+    ``n_migrants`` fittest queries of its predecessor.
+
+    :param populations: One population per island, each evolved with ``words`` and ``proposal``
+    :type populations: List[Queries]
+
+    :param words: Vocabulary of mutations, see :class:`Queries`
+    :type words: List[str]
+
+    :param evaluator: Picklable callable that updates the fitness of a population,
+        e.g. :class:`ProfileEvaluator` or :class:`SearchEvaluator`
+    :type evaluator: Callable[[Queries], None]
+
+    :param strategy: Policy picking actions in each generation
+    :type strategy: :class:`Strategy`
+
+    :param proposal: Distribution of new terms for mutations, see :class:`Queries`,
+        defaults to None for uniform draws from ``words``
+    :type proposal: Callable[[array, Container[str]], Optional[str]], optional
+
+    :param recombination_mode: Recombination of the action 'Go Forth and Multiply',
+        defaults to :attr:`RecombinationMode.CLONE`
+    :type recombination_mode: :class:`RecombinationMode`, optional
+
+    :param n_migrants: Number of queries each island sends per migration,
+        defaults to 1
+    :type n_migrants: int, optional
+
+    :param max_workers: Number of worker processes,
+        defaults to None for the number of processors
+    :type max_workers: int, optional
+
+    :param seed: Seed from which the seeds of all islands and epochs are derived,
+        defaults to None
+    :type seed: int, optional
+    """
+
+    def __init__(
+            self,
+            populations: List[Queries],
+            words: List[str],
+            evaluator,
+            strategy: Strategy,
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
+            recombination_mode: RecombinationMode = RecombinationMode.CLONE,
+            n_migrants: int = 1,
+            max_workers: Optional[int] = None,
+            seed: Optional[int] = None,
+            ):
+        """Constructor method
+        """
+        self.populations = populations
+        self.words = words
+        self.evaluator = evaluator
+        self.strategy = strategy
+        self.proposal = proposal
+        self.recombination_mode = recombination_mode
+        self.n_migrants = n_migrants
+        self.max_workers = max_workers
+
+        self._random = random.Random(seed)
+
+    def migrate(self) -> None:
+        """Sends the fittest queries of each island to the next island.
+        """
+        migrants = [
+                queries.top(self.n_migrants)
+                for queries in self.populations
+                ]
+
+        for i, queries in enumerate(self.populations):
+            for query in migrants[i - 1]:
+                queries.add(
+                        query.clone()
+                        )
+
+    def evolve(self, n_epochs: int, n_generations: int) -> Iterator[int]:
+        """Evolves all islands for several epochs, migrating after each epoch.
+
+        :param n_epochs: Number of epochs
+        :type n_epochs: int
+
+        :param n_generations: Number of generations per epoch
+        :type n_generations: int
+
+        :return: Generator yielding each zero-based epoch number after its migration
+        :rtype: Iterator[int]
+        """
+        with ProcessPoolExecutor(
+                max_workers = self.max_workers,
+                initializer = _init_worker,
+                initargs = (
+                    self.evaluator,
+                    self.words,
+                    self.proposal,
+                    self.recombination_mode,
+                    ),
+                ) as executor:
+            for epoch in range(n_epochs):
+                self.populations = [
+                        Queries(
+                            words = self.words,
+                            queries = individuals,
+                            proposal = self.proposal,
+                            )
+                        for individuals in executor.map(
+                            _evolve_island,
+                            [ queries.queries for queries in self.populations ],
+                            [ self.strategy ] * len(self.populations),
+                            [ n_generations ] * len(self.populations),
+                            [
+                                self._random.getrandbits(64)
+                                for _ in self.populations
+                                ],
+                            )
+                        ]
+
+                self.migrate()
+
+                yield epoch
+
+    def best(self) -> Optional[Query]:
+        """Returns fittest query across all islands.
+
+        :return: Fittest query, or None if all islands died out
+        :rtype: Optional[Query]
+        """
+        return max(
+                [
+                    query
+                    for queries in self.populations
+                    for query in queries.top(1)
+                    ],
+                key = lambda query: query.fitness,
+                default = None,
+                )
@@ -0,0 +1,636 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import itertools
+import math
+import random
+import re
+
+from backend import Backend
+
+
+def _int4(i: int) -> int:
+    """Encodes non-negative integer as 4-bit mantissa float, like Lucene's ``SmallFloat.longToInt4``.
+    """
+    n_bits = i.bit_length()
+    if n_bits < 4:
+        return i
+
+    shift = n_bits - 4
+    return ((i >> shift) & 0x07) | ((shift + 1) << 3)
+
+def _from_int4(i: int) -> int:
+    """Decodes value encoded by :func:`_int4`.
+    """
+    shift = (i >> 3) - 1
+    if shift == -1:
+        return i & 0x07
+
+    return ((i & 0x07) | 0x08) << shift
+
+_NUM_FREE_VALUES = 255 - _int4(2**31 - 1)
+
+def lossy_length(length: int) -> int:
+    """Returns document length as seen by Lucene after storing it in a one-byte norm.
+    Lengths below 24 are exact.
+
+    :param length: Number of terms in document field
+    :type length: int
+
+    :return: Decoded length
+    :rtype: int
+    """
+    if length < _NUM_FREE_VALUES:
+        return length
+
+    return _NUM_FREE_VALUES + _from_int4(
+            _int4(length - _NUM_FREE_VALUES)
+            )
+
+
+class LocalBackend(Backend):
+    """In-process backend with an inverted index over ``full_text``.
+
+    Scores follow the default similarity of Elasticsearch 7
+    (BM25 with ``k1`` = 1.2, ``b`` = 0.75 and lossy length norms),
+    as computed on an index with a single shard.
+    Supported queries are ``bool``, ``match``, ``match_all`` and ``ids``.
+
+    :param name: Index name
+    :type name: str
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    _TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*")
+
+    def __init__(self, name: str):
+        """Constructor method
+        """
+        super().__init__(name)
+
+        self.ensure_index()
+
+    @staticmethod
+    def analyzed(text: str) -> List[str]:
+        """Returns terms of text, approximating Elasticsearch's standard analyzer.
+
+        :param text: Text
+        :type text: str
+
+        :return: Lowercased terms
+        :rtype: List[str]
+        """
+        return LocalBackend._TOKEN_PATTERN.findall(
+                text.lower()
+                )
+
+    @staticmethod
+    def is_single_token(term: str) -> bool:
+        """Returns whether :meth:`analyzed` turns term into exactly one token.
+
+        :param term: Term
+        :type term: str
+
+        :return: Whether term is a single token
+        :rtype: bool
+        """
+        return len(LocalBackend.analyzed(term)) == 1
+
+    def ensure_index(self) -> None:
+        """Creates or recreates empty index.
+        """
+        self._ids = itertools.count(1)
+
+        # Document ID -> source
+        self._sources = {}
+
+        # Document ID -> term -> frequency
+        self._term_freqs = {}
+
+        # Term -> document ID -> frequency
+        self._postings = defaultdict(dict)
+
+        # Document ID -> lossy length
+        self._lengths = {}
+
+        self._doc_count = 0
+        self._sum_length = 0
+
+        self._fingerprint = None
+
+    def fingerprint(self) -> Optional[str]:
+        """Returns fingerprint of the indexed corpus, or None if there is none.
+
+        :rtype: str, optional
+        """
+        return self._fingerprint
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Records fingerprint of the indexed corpus, until the index is recreated.
+
+        :param fingerprint: Fingerprint
+        :type fingerprint: str
+        """
+        self._fingerprint = fingerprint
+
+    def _index(self, text: str) -> str:
+        """Adds document to inverted index.
+
+        :param text: Document text
+        :type text: str
+
+        :return: ID of new document
+        :rtype: str
+        """
+        id = str(next(self._ids))
+        terms = LocalBackend.analyzed(text)
+
+        freqs = defaultdict(int)
+        for term in terms:
+            freqs[term] += 1
+
+        for term, freq in freqs.items():
+            self._postings[term][id] = freq
+
+        self._sources[id] = {
+                'full_text': text,
+                }
+        self._term_freqs[id] = dict(freqs)
+        self._lengths[id] = lossy_length(len(terms))
+
+        if len(terms) > 0:
+            self._doc_count += 1
+            self._sum_length += len(terms)
+
+        return id
+
+    def add(self, text: str) -> Dict:
+        """Adds single document to index.
+
+        :param text: Document text
+        :type text: str
+
+        :return: Elasticsearch-like response
+        :rtype: Dict
+        """
+        return {
+                '_index': self.name,
+                '_type': "_doc",
+                '_id': self._index(text),
+                '_version': 1,
+                'result': "created",
+                '_shards': {
+                    'total': 1,
+                    'successful': 1,
+                    'failed': 0,
+                    },
+                }
+
+    def add_bulk(self, texts: Iterable[str]) -> Tuple[int, List]:
+        """Adds many documents to index.
+
+        :param texts: Document texts
+        :type texts: Iterable[str]
+
+        :return: Number of indexed documents and list of errors
+        :rtype: Tuple[int, List]
+        """
+        n = 0
+        for text in texts:
+            self._index(text)
+            n += 1
+
+        return n, []
+
+    def _hit(self, id: str, score: Optional[float]) -> Dict:
+        return {
+                '_index': self.name,
+                '_type': "_doc",
+                '_id': id,
+                '_score': score,
+                '_source': self._sources[id],
+                }
+
+    def get(self, id: str) -> Dict:
+        """Returns document from index by ID.
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises KeyError: if ID does not exist in index
+
+        :return: Elasticsearch-like response
+        :rtype: Dict
+        """
+        return {
+                '_index': self.name,
+                '_type': "_doc",
+                '_id': id,
+                '_version': 1,
+                'found': True,
+                '_source': self._sources[id],
+                }
+
+    def _hits(self, hits: List[Dict], total: int) -> Dict:
+        return {
+                'hits': {
+                    'total': {
+                        'value': total,
+                        'relation': "eq",
+                        },
+                    'max_score': max(
+                        [ hit['_score'] for hit in hits ],
+                        default = None
+                        ),
+                    'hits': hits,
+                    }
+                }
+
+    def search(self, body: Dict) -> Dict:
+        """Returns query response from index.
+        Supports ``query``, ``size``, ``from`` and boolean ``_source`` in body.
+
+        :param body: Search body
+        :type body: Dict
+
+        :return: Elasticsearch-like response
+        :rtype: Dict
+        """
+        query = body.get('query', { 'match_all': {} })
+
+        candidates = self._candidates(query)
+        if candidates is None:
+            candidates = self._sources.keys()
+
+        scored = []
+        for id in candidates:
+            score = self._score(query, id)
+            if score is not None:
+                scored.append((score, int(id)))
+
+        scored.sort(key = lambda item: (-item[0], item[1]))
+
+        start = body.get('from', 0)
+        hits = [
+                self._hit(str(id), score)
+                for score, id in scored[start:start + body.get('size', 10)]
+                ]
+
+        if body.get('_source', True) is False:
+            for hit in hits:
+                del hit['_source']
+
+        return self._hits(hits, len(scored))
+
+    def random_document(self) -> Dict:
+        """Returns random document from index.
+
+        :return: Elasticsearch-like response
+        :rtype: Dict
+        """
+        if len(self._sources) == 0:
+            return self._hits([], 0)
+
+        return self._hits(
+                [
+                    self._hit(
+                        random.choice(list(self._sources)),
+                        1.0
+                        )
+                    ],
+                len(self._sources)
+                )
+
+    def _idf(self, term: str) -> float:
+        n = len(self._postings.get(term, ()))
+        return math.log(
+                1 + (self._doc_count - n + 0.5) / (n + 0.5)
+                )
+
+    def _tf_norm(self, id: str) -> float:
+        return LocalBackend.K1 * (
+                1
+                - LocalBackend.B
+                + LocalBackend.B * self._lengths[id] / self._avgdl()
+                )
+
+    def _avgdl(self) -> float:
+        return self._sum_length / self._doc_count
+
+    def _term_score(self, term: str, id: str) -> Optional[float]:
+        """Returns BM25 score of term in document, or None if term is missing.
+        """
+        freq = self._term_freqs[id].get(term)
+        if freq is None:
+            return None
+
+        return (LocalBackend.K1 + 1) \
+                * self._idf(term) \
+                * freq / (freq + self._tf_norm(id))
+
+    @staticmethod
+    def _clauses(clauses) -> List[Dict]:
+        if clauses is None:
+            return []
+        elif isinstance(clauses, dict):
+            return [ clauses ]
+        else:
+            return clauses
+
+    @staticmethod
+    def _match_params(params: Dict) -> Tuple[str, str, str]:
+        ((field, spec),) = params.items()
+        if isinstance(spec, dict):
+            return field, spec['query'], spec.get('operator', "or").lower()
+        else:
+            return field, spec, "or"
+
+    @staticmethod
+    def _should_minimum(params: Dict) -> int:
+        if len(LocalBackend._clauses(params.get('should'))) == 0:
+            return 0
+        elif len(LocalBackend._clauses(params.get('must'))) == 0 \
+                and len(LocalBackend._clauses(params.get('filter'))) == 0:
+            return 1
+        else:
+            return 0
+
+    def _score(self, query: Dict, id: str) -> Optional[float]:
+        """Returns score of query for document, or None if it does not match.
+
+        :raises ValueError: if query type is not supported
+        """
+        ((kind, params),) = query.items()
+
+        if kind == 'match':
+            field, text, operator = LocalBackend._match_params(params)
+            if field != 'full_text':
+                return None
+
+            terms = LocalBackend.analyzed(text)
+            scores = [
+                    self._term_score(term, id)
+                    for term in terms
+                    ]
+            matched = [ score for score in scores if score is not None ]
+
+            if len(matched) == 0 \
+                    or (operator == "and" and len(matched) < len(terms)):
+                return None
+            return sum(matched)
+
+        elif kind == 'bool':
+            score = 0.0
+
+            for clause in LocalBackend._clauses(params.get('must')):
+                clause_score = self._score(clause, id)
+                if clause_score is None:
+                    return None
+                score += clause_score
+
+            for clause in LocalBackend._clauses(params.get('filter')):
+                if self._score(clause, id) is None:
+                    return None
+
+            for clause in LocalBackend._clauses(params.get('must_not')):
+                if self._score(clause, id) is not None:
+                    return None
+
+            n_should = 0
+            for clause in LocalBackend._clauses(params.get('should')):
+                clause_score = self._score(clause, id)
+                if clause_score is not None:
+                    score += clause_score
+                    n_should += 1
+
+            if n_should < LocalBackend._should_minimum(params):
+                return None
+
+            if all(
+                    len(LocalBackend._clauses(params.get(occur))) == 0
+                    for occur in [ 'must', 'filter', 'should' ]
+                    ):
+                # Pure negative queries match all other documents without score,
+                # empty queries match all documents.
+                if len(LocalBackend._clauses(params.get('must_not'))) > 0:
+                    return 0.0
+                else:
+                    return 1.0
+
+            return score
+
+        elif kind == 'match_all':
+            return params.get('boost', 1.0)
+
+        elif kind == 'ids':
+            return 1.0 if id in params['values'] else None
+
+        else:
+            raise ValueError("Query type {} not supported by local backend.".format(kind))
+
+    def _candidates(self, query: Dict) -> Optional[Set[str]]:
+        """Returns superset of IDs of documents matching query, or None for all documents.
+        """
+        ((kind, params),) = query.items()
+
+        if kind == 'match':
+            field, text, operator = LocalBackend._match_params(params)
+            if field != 'full_text':
+                return set()
+
+            postings = [
+                    set(self._postings.get(term, ()))
+                    for term in LocalBackend.analyzed(text)
+                    ]
+            if len(postings) == 0:
+                return set()
+            elif operator == "and":
+                return set.intersection(*postings)
+            else:
+                return set.union(*postings)
+
+        elif kind == 'bool':
+            required = [
+                    self._candidates(clause)
+                    for occur in [ 'must', 'filter' ]
+                    for clause in LocalBackend._clauses(params.get(occur))
+                    ]
+            required = [ ids for ids in required if ids is not None ]
+            if len(required) > 0:
+                return set.intersection(*required)
+
+            if LocalBackend._should_minimum(params) > 0:
+                optional = [
+                        self._candidates(clause)
+                        for clause in LocalBackend._clauses(params.get('should'))
+                        ]
+                if None not in optional:
+                    return set.union(*optional)
+
+            return None
+
+        elif kind == 'ids':
+            return set(params['values']) & self._sources.keys()
+
+        else:
+            return None
+
+    def _term_explanation(self, term: str, id: str) -> Dict:
+        freq = self._term_freqs[id][term]
+        idf = self._idf(term)
+        tf = freq / (freq + self._tf_norm(id))
+
+        def leaf(value, description):
+            return {
+                    'value': value,
+                    'description': description,
+                    'details': [],
+                    }
+
+        score = self._term_score(term, id)
+        return {
+                'value': score,
+                'description': "weight(full_text:{} in {}) [PerFieldSimilarity], result of:".format(term, id),
+                'details': [
+                    {
+                        'value': score,
+                        'description': "score(freq={}), computed as boost * idf * tf from:".format(float(freq)),
+                        'details': [
+                            leaf(LocalBackend.K1 + 1, "boost"),
+                            {
+                                'value': idf,
+                                'description': "idf, computed as log(1 + (N - n + 0.5) / (n + 0.5)) from:",
+                                'details': [
+                                    leaf(len(self._postings[term]), "n, number of documents containing term"),
+                                    leaf(self._doc_count, "N, total number of documents with field"),
+                                    ],
+                                },
+                            {
+                                'value': tf,
+                                'description': "tf, computed as freq / (freq + k1 * (1 - b + b * dl / avgdl)) from:",
+                                'details': [
+                                    leaf(float(freq), "freq, occurrences of term within document"),
+                                    leaf(LocalBackend.K1, "k1, term saturation parameter"),
+                                    leaf(LocalBackend.B, "b, length normalization parameter"),
+                                    leaf(float(self._lengths[id]), "dl, length of field"),
+                                    leaf(self._avgdl(), "avgdl, average length of field"),
+                                    ],
+                                },
+                            ],
+                        },
+                    ],
+                }
+
+    def _explanation(self, query: Dict, id: str) -> Dict:
+        """Returns explanation of score of matching query for document.
+        """
+        ((kind, params),) = query.items()
+        score = self._score(query, id)
+
+        if kind == 'match':
+            details = [
+                    self._term_explanation(term, id)
+                    for term in LocalBackend.analyzed(LocalBackend._match_params(params)[1])
+                    if term in self._term_freqs[id]
+                    ]
+            if len(details) == 1:
+                return details[0]
+
+        elif kind == 'bool':
+            details = [
+                    self._explanation(clause, id)
+                    for occur in [ 'must', 'should' ]
+                    for clause in LocalBackend._clauses(params.get(occur))
+                    if self._score(clause, id) is not None
+                    ]
+
+        else:
+            details = []
+
+        return {
+                'value': score,
+                'description': "sum of:" if len(details) > 0 else kind,
+                'details': details,
+                }
+
+    def explain(self, body: Dict, id: str) -> Dict:
+        """Returns explanation for match between query body and document by ID.
+
+        :param body: Search body
+        :type body: Dict
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises KeyError: if ID does not exist in index
+
+        :return: Elasticsearch-like response
+        :rtype: Dict
+        """
+        if id not in self._sources:
+            raise KeyError(id)
+
+        matched = self._score(body['query'], id) is not None
+
+        return {
+                '_index': self.name,
+                '_type': "_doc",
+                '_id': id,
+                'matched': matched,
+                'explanation': self._explanation(body['query'], id)
+                if matched
+                else {
+                    'value': 0.0,
+                    'description': "no match on required clause",
+                    'details': [],
+                    },
+                }
+
+    def score_many(self, bodies: List[Dict], id: str) -> List[float]:
+        """Returns match scores between many query bodies and document by ID.
+        A query that does not match the document scores 0.0.
+
+        :param bodies: List of search bodies
+        :type bodies: List[Dict]
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises KeyError: if ID does not exist in index
+
+        :return: Scores in order of ``bodies``
+        :rtype: List[float]
+        """
+        if id not in self._sources:
+            raise KeyError(id)
+
+        scores = []
+        for body in bodies:
+            score = self._score(body['query'], id)
+            scores.append(
+                    score
+                    if score is not None
+                    else 0.0
+                    )
+
+        return scores
+
+    def term_weights(self, id: str) -> Dict[str, float]:
+        """Returns BM25 score contribution of each term in document by ID.
+
+        :param id: ID of document in index
+        :type id: str
+
+        :raises KeyError: if ID does not exist in index
+
+        :return: Term weights
+        :rtype: Dict[str, float]
+        """
+        return {
+                term: self._term_score(term, id)
+                for term in self._term_freqs[id]
+                }
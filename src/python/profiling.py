@@ -0,0 +1,328 @@
+"""Optional CPU and memory profiling of runs, with one report per generation.
+
+A :class:`Profiler` wraps the generation loop::
+
+    with Profiler(ProfileMode.MEMORY, directory) as profiler:
+        for generation in ...:
+            ...
+            profiler.snapshot(generation + 1, [ queries ])
+
+CPU profiles are written as :mod:`pstats` files per generation and for the whole run.
+Memory reports are written as one JSON line per generation to ``memory.jsonl``,
+with the top allocation sites, their growth since the previous generation
+and the memory retained by the populations.
+"""
+
+from __future__ import annotations
+
+from enum import auto
+from typing import Dict, Iterable, Sequence
+
+import cProfile
+import io
+import json
+import pathlib
+import pstats
+import sys
+import time
+import tracemalloc
+import types
+
+from population import Population
+from queries import AutoNameEnum, Queries
+
+
+class ProfileMode(AutoNameEnum):
+    CPU = auto()
+    MEMORY = auto()
+
+
+# Allocations of the profiling machinery itself
+_IGNORED_FRAMES = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+        )
+
+
+class Profiler():
+    """Profiles the code between consecutive snapshots and writes reports to a directory.
+
+    :param mode: Whether to profile CPU time with :mod:`cProfile`
+        or allocations with :mod:`tracemalloc`
+    :type mode: :class:`ProfileMode`
+
+    :param directory: Directory to write reports to, created if missing
+    :type directory: pathlib.Path
+
+    :param top_n: Number of functions or allocation sites per report,
+        defaults to 20
+    :type top_n: int, optional
+
+    :param n_frames: Number of frames stored per traced allocation,
+        defaults to 1
+    :type n_frames: int, optional
+    """
+
+    def __init__(
+            self,
+            mode: ProfileMode,
+            directory: pathlib.Path,
+            top_n: int = 20,
+            n_frames: int = 1,
+            ):
+        """Constructor method
+        """
+        self.mode = mode
+        self.directory = pathlib.Path(directory)
+        self.top_n = top_n
+        self.n_frames = n_frames
+
+        # Profile of the current generation
+        self._profile = None
+
+        # Aggregated profile of all generations
+        self._stats = None
+
+        # Memory snapshot of the previous generation
+        self._snapshot = None
+
+        # Whether tracing is stopped again with the profiler
+        self._started_tracing = False
+
+    def __enter__(self) -> Profiler:
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Starts profiling.
+        """
+        self.directory.mkdir(parents = True, exist_ok = True)
+
+        if self.mode == ProfileMode.CPU:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(self.n_frames)
+
+            self._snapshot = self._filtered_snapshot()
+
+    def stop(self) -> None:
+        """Stops profiling and writes the report of the whole run.
+
+        The code since the last snapshot is not reported.
+        """
+        if self.mode == ProfileMode.CPU:
+            if self._profile is None:
+                return
+
+            self._profile.disable()
+            self._profile = None
+
+            if self._stats is not None:
+                self._stats.dump_stats(self.directory / "cpu.pstats")
+                (self.directory / "cpu.txt").write_text(
+                        self._summary(self._stats)
+                        )
+        else:
+            if self._snapshot is None:
+                return
+
+            self._snapshot = None
+
+            if self._started_tracing:
+                tracemalloc.stop()
+
+    def snapshot(
+            self,
+            generation: int,
+            populations: Sequence[Population] = (),
+            ) -> None:
+        """Writes the report of the code since the previous snapshot.
+
+        :param generation: Number of generation, used to name reports
+        :type generation: int
+
+        :param populations: Populations whose retained memory is reported,
+            defaults to none
+        :type populations: Sequence[:class:`Population`], optional
+        """
+        if self.mode == ProfileMode.CPU:
+            self._profile.disable()
+
+            stats = pstats.Stats(self._profile)
+            stats.dump_stats(
+                    self.directory / "generation-{:04d}.pstats".format(generation)
+                    )
+
+            if self._stats is None:
+                self._stats = stats
+            else:
+                self._stats.add(stats)
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            snapshot = self._filtered_snapshot()
+
+            with open(self.directory / "memory.jsonl", "a") as file:
+                file.write(
+                        json.dumps(
+                            self._memory_report(generation, snapshot, populations)
+                            ) + "\n"
+                        )
+
+            self._snapshot = snapshot
+
+    def _filtered_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+
+    def _memory_report(
+            self,
+            generation: int,
+            snapshot: tracemalloc.Snapshot,
+            populations: Sequence[Population],
+            ) -> Dict:
+        traced_bytes, traced_peak_bytes = tracemalloc.get_traced_memory()
+
+        # Peaks are reported per generation
+        tracemalloc.reset_peak()
+
+        return {
+                'generation': generation,
+                'time': time.time(),
+                'traced_bytes': traced_bytes,
+                'traced_peak_bytes': traced_peak_bytes,
+                'populations': [
+                    population_memory(population)
+                    for population in populations
+                    ],
+                'top_sites': [
+                    {
+                        'site': _site(statistic.traceback),
+                        'bytes': statistic.size,
+                        'count': statistic.count,
+                        }
+                    for statistic in snapshot.statistics("lineno")[:self.top_n]
+                    ],
+                'top_growth': [
+                    {
+                        'site': _site(statistic.traceback),
+                        'bytes': statistic.size,
+                        'bytes_diff': statistic.size_diff,
+                        'count_diff': statistic.count_diff,
+                        }
+                    for statistic in snapshot.compare_to(self._snapshot, "lineno")[:self.top_n]
+                    if statistic.size_diff != 0
+                    ],
+                }
+
+    def _summary(self, stats: pstats.Stats) -> str:
+        stream = io.StringIO()
+
+        stats.stream = stream
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top_n)
+        stats.stream = sys.stdout
+
+        return stream.getvalue()
+
+
+# Shared by everything, e.g. classes of instances and methods of strategies
+_NOT_FOLLOWED = (
+        type,
+        types.ModuleType,
+        types.FunctionType,
+        types.BuiltinFunctionType,
+        types.MethodType,
+        )
+
+def population_memory(population: Population) -> Dict[str, int]:
+    """Returns memory retained by a population.
+
+    Words and the proposal shared with the vocabulary are not counted.
+
+    :param population: Population
+    :type population: :class:`Population`
+
+    :return: Number of individuals, bytes retained by the population,
+        and for :class:`Queries` the number and bytes of retained explanations
+    :rtype: Dict[str, int]
+    """
+    usage = {
+            'size': population.size(),
+            'bytes': deep_size(
+                population,
+                exclude = [
+                    getattr(population, '_words', None),
+                    getattr(population, '_proposal', None),
+                    ],
+                ),
+            }
+
+    if isinstance(population, Queries):
+        explanations = [
+                query._last_explanation
+                for query in population.queries
+                if query._last_explanation is not None
+                ]
+
+        usage['explanations'] = len(explanations)
+        usage['explanation_bytes'] = deep_size(explanations) - sys.getsizeof(explanations)
+
+    return usage
+
+def deep_size(obj: object, exclude: Iterable[object] = ()) -> int:
+    """Returns size in bytes of an object and everything it references.
+
+    Referenced containers and instances are followed, classes, modules and functions are not.
+    Objects referenced more than once are counted once.
+
+    :param obj: Object
+    :type obj: object
+
+    :param exclude: Objects that are neither counted nor followed,
+        defaults to none
+    :type exclude: Iterable[object], optional
+
+    :return: Size in bytes
+    :rtype: int
+    """
+    seen = { id(excluded) for excluded in exclude if excluded is not None }
+    stack = [ obj ]
+    size = 0
+
+    while len(stack) > 0:
+        obj = stack.pop()
+
+        if id(obj) in seen or isinstance(obj, _NOT_FOLLOWED):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+
+        if hasattr(obj, '__dict__'):
+            stack.append(vars(obj))
+
+        for cls in type(obj).__mro__:
+            slots = getattr(cls, '__slots__', ())
+            for slot in (slots,) if isinstance(slots, str) else slots:
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+
+    return size
+
+def _site(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    return "{}:{}".format(frame.filename, frame.lineno)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from array import array
+from enum import auto
+from typing import Container, Optional
+
+import math
+import random
+
+from alias_table import AliasTable
+from queries import AutoNameEnum
+from vocabulary import MAX_REJECTIONS, Vocabulary, random_element
+
+
+class ProposalMode(AutoNameEnum):
+    UNIFORM = auto()
+    FREQUENCY = auto()
+    IDF = auto()
+    COOCCURRENCE = auto()
+
+
+class Proposal(ABC):
+    """Distribution of new terms for mutations, drawn from a vocabulary.
+
+    Tables are built on first use and rebuilt only after the vocabulary has changed.
+    Proposals are called with the term IDs of the query to be mutated
+    and a blacklist of words, see :meth:`Query.mutate`.
+
+    :param vocabulary: Vocabulary to draw words from
+    :type vocabulary: :class:`Vocabulary`
+    """
+
+    # Whether documents recorded by the vocabulary are used,
+    # see :attr:`Vocabulary.record_documents`
+    uses_documents = False
+
+    def __init__(self, vocabulary: Vocabulary):
+        """Constructor method
+        """
+        self.vocabulary = vocabulary
+        self._version = None
+
+    def __call__(
+            self,
+            term_ids: array,
+            without: Container[str] = (),
+            ) -> Optional[str]:
+        """Returns proposed new term.
+
+        :param term_ids: Term IDs of query to be mutated
+        :type term_ids: array
+
+        :param without: Blacklist of words to not return,
+            defaults to ()
+        :type without: Container[str], optional
+
+        :return: Word, or None if all words are blacklisted
+        :rtype: str, optional
+        """
+        if self._version != self.vocabulary.version:
+            self._refresh()
+            self._version = self.vocabulary.version
+
+        return self._word(term_ids, without)
+
+    def _refresh(self) -> None:
+        """Rebuilds tables from the vocabulary.
+        """
+        pass
+
+    @abstractmethod
+    def _word(
+            self,
+            term_ids: array,
+            without: Container[str],
+            ) -> Optional[str]:
+        """Returns proposed new term, see :meth:`__call__`.
+        """
+        pass
+
+
+class UniformProposal(Proposal):
+    """Proposes all words with equal probability.
+    """
+
+    def _word(self, term_ids: array, without: Container[str]) -> Optional[str]:
+        return self.vocabulary.random_word(without)
+
+
+class FrequencyProposal(Proposal):
+    """Proposes words proportionally to their counts.
+    """
+
+    def _word(self, term_ids: array, without: Container[str]) -> Optional[str]:
+        return self.vocabulary.random_word(
+                without,
+                weighted = True,
+                )
+
+
+class IdfProposal(Proposal):
+    """Proposes words proportionally to their inverse document frequency,
+    as weighted by BM25, so that rare and thus discriminative words are preferred.
+    """
+
+    uses_documents = True
+
+    def _refresh(self) -> None:
+        n = self.vocabulary.n_documents()
+
+        self._table = AliasTable(
+                [
+                    math.log(1 + (n - frequency + 0.5) / (frequency + 0.5))
+                    for frequency in self.vocabulary.document_frequencies()
+                    ]
+                ) if n > 0 else None
+        self._wordlist = self.vocabulary.wordlist()
+
+    def _word(self, term_ids: array, without: Container[str]) -> Optional[str]:
+        return random_element(
+                self._wordlist,
+                without = without,
+                alias_table = self._table,
+                )
+
+
+class CooccurrenceProposal(Proposal):
+    """Proposes words that occur in documents together with a term of the query,
+    proportionally to the number of such documents.
+
+    A word is drawn by choosing a random term of the query,
+    a random document containing it and a random word of that document.
+    Words of the uniform proposal are drawn instead
+    if the query has no terms occurring in documents
+    or if the drawn words are repeatedly blacklisted.
+    """
+
+    uses_documents = True
+
+    def _refresh(self) -> None:
+        vocabulary = self.vocabulary
+
+        # Postings of each word in compressed sparse row layout
+        frequencies = vocabulary.document_frequencies()
+
+        offsets = array('Q', [0])
+        for frequency in frequencies:
+            offsets.append(offsets[-1] + frequency)
+
+        postings = array('I', bytes(4 * offsets[-1]))
+        ends = array('Q', offsets[:-1])
+
+        for i in range(vocabulary.n_documents()):
+            for word_index in vocabulary.document(i):
+                postings[ends[word_index]] = i
+                ends[word_index] += 1
+
+        self._offsets = offsets
+        self._postings = postings
+        self._wordlist = vocabulary.wordlist()
+
+    def _word(self, term_ids: array, without: Container[str]) -> Optional[str]:
+        context = [
+                i
+                for i in [
+                    self.vocabulary.index_of(Vocabulary.term(term_id))
+                    for term_id in term_ids
+                    ]
+                if i is not None and self._offsets[i + 1] > self._offsets[i]
+                ]
+
+        if len(context) > 0:
+            for _ in range(MAX_REJECTIONS):
+                i = random.choice(context)
+                document = self.vocabulary.document(
+                        self._postings[
+                            random.randrange(self._offsets[i], self._offsets[i + 1])
+                            ]
+                        )
+                word = self._wordlist[random.choice(document)]
+
+                if word not in without:
+                    return word
+
+        return self.vocabulary.random_word(without)
+
+
+# Proposal class of each proposal mode
+PROPOSALS = {
+        ProposalMode.UNIFORM: UniformProposal,
+        ProposalMode.FREQUENCY: FrequencyProposal,
+        ProposalMode.IDF: IdfProposal,
+        ProposalMode.COOCCURRENCE: CooccurrenceProposal,
+        }
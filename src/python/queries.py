@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Callable, Any
+from array import array
+from typing import Dict, List, Optional, Callable, Any, Container, Sequence
 from enum import Enum, auto
 
-import copy
+import heapq
 import logging
 import random
 
@@ -11,6 +12,9 @@ from population import Population
 from individual import Individual
 from query import Query
 
+import crossover
+import selection
+
 from decorators import sorter
 
 
@@ -21,6 +25,98 @@ class AutoNameEnum(Enum):
 
 class RecombinationMode(AutoNameEnum):
     CLONE = auto()
+    UNIFORM = auto()
+    ONE_POINT = auto()
+    UNION = auto()
+    INTERSECTION = auto()
+
+
+# Crossover operator of each recombination mode that crosses two parents
+CROSSOVER_OPERATORS = {
+        RecombinationMode.UNIFORM: crossover.uniform,
+        RecombinationMode.ONE_POINT: crossover.one_point,
+        RecombinationMode.UNION: crossover.union,
+        RecombinationMode.INTERSECTION: crossover.intersection,
+        }
+
+
+def mates(n: int) -> List[int]:
+    """Returns a random mate for each of ``n`` individuals,
+    other than the individual itself if ``n`` > 1.
+
+    :param n: Population size
+    :type n: int
+
+    :return: Position of mate of each individual
+    :rtype: List[int]
+    """
+    if n < 2:
+        return list(range(n))
+
+    return [
+            (i + random.randrange(1, n)) % n
+            for i in range(n)
+            ]
+
+
+class EvaluationMode(AutoNameEnum):
+    SEARCH = auto()
+    PROFILE = auto()
+
+
+class SelectionMode(AutoNameEnum):
+    WITHOUT_LOWEST = auto()
+    TRUNCATION = auto()
+    TOURNAMENT = auto()
+    ROULETTE = auto()
+
+
+def selected_indices(
+        fitnesses: Sequence[float],
+        mode: SelectionMode = SelectionMode.WITHOUT_LOWEST,
+        k: Optional[int] = None,
+        n_elites: int = 0,
+        tournament_size: int = 2,
+        ) -> List[int]:
+    """Returns positions of individuals selected by given mode, see :mod:`selection`.
+
+    :param fitnesses: Fitness scores
+    :type fitnesses: Sequence[float]
+
+    :param mode: Selection operator,
+        defaults to `SelectionMode.WITHOUT_LOWEST`
+    :type mode: Member of enum :class:`SelectionMode`, optional
+
+    :param k: Number of individuals to select, ignored by `SelectionMode.WITHOUT_LOWEST`,
+        defaults to None for half the population, rounded up
+    :type k: int, optional
+
+    :param n_elites: Number of fittest individuals to keep in any case,
+        defaults to 0
+    :type n_elites: int, optional
+
+    :param tournament_size: Number of individuals per tournament,
+        defaults to 2
+    :type tournament_size: int, optional
+
+    :return: Positions of selected individuals, possibly repeated
+    :rtype: List[int]
+    """
+    if k is None:
+        k = (len(fitnesses) + 1) // 2
+
+    if mode == SelectionMode.WITHOUT_LOWEST:
+        selected = selection.without_lowest(fitnesses)
+    elif mode == SelectionMode.TRUNCATION:
+        selected = selection.truncation(fitnesses, k)
+    elif mode == SelectionMode.TOURNAMENT:
+        selected = selection.tournament(fitnesses, k, tournament_size)
+    elif mode == SelectionMode.ROULETTE:
+        selected = selection.roulette(fitnesses, k)
+    else:
+        raise ValueError("Selection mode {} not implemented.".format(mode))
+
+    return selection.with_elites(selected, fitnesses, n_elites)
 
 
 class Queries(Population):
@@ -32,11 +128,16 @@ class Queries(Population):
     :param queries: List of :class:`Query` objects to initialize population,
         defaults to empty list
     :type queries: List[Query]
+
+    :param proposal: Distribution of new terms for mutations,
+        see :meth:`Query.mutate`, defaults to None for uniform draws from ``words``
+    :type proposal: Callable[[array, Container[str]], Optional[str]], optional
     """
 
     def __init__(self,
             words: List[str],
             queries: List[Query] = [],
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
             ):
         """Constructor method
         """
@@ -46,6 +147,15 @@ class Queries(Population):
         self.queries = self._individuals
 
         self._words = words
+        self._proposal = proposal
+
+    def add(self, query: Query) -> None:
+        """Adds query to population.
+
+        :param query: Query
+        :type query: :class:`Query`
+        """
+        self.queries.append(query)
 
     def size(self) -> int:
         """Returns number of queries.
@@ -55,6 +165,17 @@ class Queries(Population):
         """
         return len(self.queries)
 
+    def fitnesses(self) -> List[float]:
+        """Returns fitness of each query.
+
+        :return: Fitness scores in population order
+        :rtype: List[float]
+        """
+        return [
+                query.fitness
+                for query in self.queries
+                ]
+
     @sorter(key=lambda x: x.fitness, reverse=True)
     def sorted_queries(self) -> List[Query]:
         """Returns queries sorted by fitness.
@@ -80,10 +201,91 @@ class Queries(Population):
                         ]
                     ) / len(self.queries)
 
+    def evaluate(
+            self,
+            index: Index,
+            target_id: int,
+            mode: EvaluationMode = EvaluationMode.SEARCH,
+            ) -> None:
+        """Updates fitness of all queries against target document in one batch.
+
+        :param index: Index holding the target document
+        :type index: :class:`Index`
+
+        :param target_id: ID of target document in index
+        :type target_id: int
+
+        :param mode: Whether to score via backend requests or locally
+            from the precomputed target profile,
+            defaults to `EvaluationMode.SEARCH`
+        :type mode: Member of enum :class:`EvaluationMode`, optional
+        """
+        if mode == EvaluationMode.PROFILE:
+            self.evaluate_with_profile(
+                    index.target_profile(target_id)
+                    )
+            return
+
+        scores = index.score_many(
+                queries = self.queries,
+                id = target_id,
+                )
+
+        for query, score in zip(self.queries, scores):
+            query.update_with_score(score)
+
+    def genotype_keys(self) -> List[bytes]:
+        """Returns genotype key of each query, see :meth:`Query.genotype_key`.
+
+        :return: Genotype keys in population order
+        :rtype: List[bytes]
+        """
+        return [
+                query.genotype_key()
+                for query in self.queries
+                ]
+
+    def body(self, i: int) -> Dict:
+        """Returns query body of a query by position, see :meth:`Query.body`.
+
+        :param i: Position in population
+        :type i: int
+
+        :return: Query body in Elasticsearch query DSL
+        :rtype: Dict
+        """
+        return self.queries[i].body
+
+    def update_with_scores(self, scores: Sequence[float]) -> None:
+        """Updates fitness of all queries, dropping their explanations.
+
+        :param scores: Match scores in population order
+        :type scores: Sequence[float]
+        """
+        for query, score in zip(self.queries, scores):
+            query.update_with_score(score)
+
+    def evaluate_with_profile(self, profile: TargetProfile) -> None:
+        """Updates fitness of all queries from a precomputed target profile.
+
+        :param profile: Profile of target document
+        :type profile: :class:`TargetProfile`
+        """
+        for query, score in zip(
+                self.queries,
+                profile.score_many(self.queries),
+                ):
+            query.update_with_score(score)
+
     def recombine(self, mode: RecombinationMode=RecombinationMode.CLONE) -> None:
         """Recombines queries according to given mode to produce offspring.
         Adds offspring to populaton of queries.
 
+        With `RecombinationMode.CLONE`, each query is cloned once,
+        sharing its terms with the clone (see :meth:`Query.clone`).
+        With the crossover modes, each query is crossed with a random mate
+        into one child, and children without terms are discarded.
+
         :param mode: Strategy for producing offspring from queries, defaults to `RecombinationMode.CLONE`
         :type mode: Member of enum :class:`RecombinationMode`, optional
         """
@@ -91,12 +293,33 @@ class Queries(Population):
         if mode == RecombinationMode.CLONE:
             self.queries.extend(
                     [
-                        copy.deepcopy(query)
+                        query.clone()
                         for query in self.queries
                         ]
                     )
+        elif mode in CROSSOVER_OPERATORS:
+            operator = CROSSOVER_OPERATORS[mode]
+
+            children = [
+                    query.recombine(
+                        self.queries[mate],
+                        operator = operator,
+                        )
+                    for query, mate in zip(
+                        self.queries,
+                        mates(self.size()),
+                        )
+                    ]
+
+            self.queries.extend(
+                    [
+                        child
+                        for child in children
+                        if child.size() > 0
+                        ]
+                    )
         else:
-            logging.ERROR("Recombination mode {mode} not implemented.")
+            logging.error("Recombination mode {} not implemented.".format(mode))
             exit(1)
 
     @staticmethod
@@ -119,14 +342,11 @@ class Queries(Population):
         :return: Elements of ``l`` except for lowest elements
         :rtype: List
         """
-        l_sorted = sorted(
-                l,
-                key = key,
-                )
+        keys = [ key(e) for e in l ]
+
         return [
-                e
-                for e in l
-                if key(e) > key(l_sorted[0])
+                l[i]
+                for i in selection.without_lowest(keys)
                 ]
 
     def mutate(self) -> None:
@@ -135,20 +355,108 @@ class Queries(Population):
         new_queries = []
 
         for query in self.queries:
-            query.mutate(self._words)
+            query.mutate(self._words, self._proposal)
             if query.size() > 0:
                 new_queries.append(query)
 
         self.queries = new_queries
 
-    def select(self) -> None:
+    def select(
+            self,
+            mode: SelectionMode = SelectionMode.WITHOUT_LOWEST,
+            k: Optional[int] = None,
+            n_elites: int = 0,
+            tournament_size: int = 2,
+            ) -> None:
         """Reduces population of queries to fittest members.
+        By default, removes all queries with the lowest score.
+        Queries selected more than once are cloned.
+
+        :param mode: Selection operator,
+            defaults to `SelectionMode.WITHOUT_LOWEST`
+        :type mode: Member of enum :class:`SelectionMode`, optional
+
+        :param k: Number of queries to select, ignored by `SelectionMode.WITHOUT_LOWEST`,
+            defaults to None for half the population, rounded up
+        :type k: int, optional
+
+        :param n_elites: Number of fittest queries to keep in any case,
+            defaults to 0
+        :type n_elites: int, optional
+
+        :param tournament_size: Number of queries per tournament,
+            defaults to 2
+        :type tournament_size: int, optional
+        """
+        seen = set()
+        new_queries = []
+
+        for i in selected_indices(
+                self.fitnesses(),
+                mode = mode,
+                k = k,
+                n_elites = n_elites,
+                tournament_size = tournament_size,
+                ):
+            query = self.queries[i]
+
+            if i in seen:
+                query = query.clone()
+            seen.add(i)
+
+            new_queries.append(query)
+
+        self.queries = new_queries
+
+    def top(self, k: int) -> List[Query]:
+        """Returns the ``k`` fittest queries, in O(N log k).
+
+        :param k: Number of queries
+        :type k: int
+
+        :return: Fittest queries, fittest first
+        :rtype: List[Query]
         """
-        self.queries = Queries._without_lowest(
+        return heapq.nlargest(
+                k,
                 self.queries,
-                key = lambda x: x.fitness
+                key = lambda query: query.fitness,
                 )
 
+    def explain_top(
+            self,
+            index: Index,
+            target_id: int,
+            k: int,
+            ) -> List[Query]:
+        """Requests and keeps full explanations of the ``k`` fittest queries, for display.
+        Explanations kept by all other queries are dropped.
+
+        :param index: Index holding the target document
+        :type index: :class:`Index`
+
+        :param target_id: ID of target document in index
+        :type target_id: int
+
+        :param k: Number of queries
+        :type k: int
+
+        :return: Explained queries, fittest first
+        :rtype: List[Query]
+        """
+        for query in self.queries:
+            if query.explanation is not None:
+                query.update_with_score(query.fitness)
+
+        top = self.top(k)
+
+        for query in top:
+            query.update_with_explanation(
+                    index.explain(query, target_id)
+                    )
+
+        return top
+
     def random_purge(self, k: int = 1) -> None:
         """Removes random members from population.
 
@@ -156,43 +464,40 @@ class Queries(Population):
             defaults to 1
         :type k: int
 
-        :raises ValueError:
+        :raises ValueError: if ``k`` exceeds population size
         """
         logging.debug("Removing random members from population")
 
-        # assert k <= self.size()
-
-        random_indices = random.sample(
-                list(
-                    range(
-                        0,
-                        len(self.queries)
-                        )
-                    ),
-                k
-                )
-
         try:
-            self.queries = [
-                    query
-                    for index, query in enumerate(self.queries)
-                    if index not in random_indices
-                    ]
+            random_indices = set(
+                    random.sample(
+                        range(len(self.queries)),
+                        k
+                        )
+                    )
 
         except ValueError as e:
-            logging.ERROR(str(e))
+            logging.error(str(e))
             raise e
 
+        self.queries = [
+                query
+                for index, query in enumerate(self.queries)
+                if index not in random_indices
+                ]
+
     def remove_duplicates(self) -> None:
-        """Removes duplicate querys from population.
+        """Removes duplicate querys from population, keeping the first of each.
+        Queries with the same terms in different order are duplicates.
         """
         new_queries = []
-        seen_queries = {}
+        seen_queries = set()
 
         for query in self.queries:
-            if repr(query) not in seen_queries:
+            key = query.genotype_key()
+            if key not in seen_queries:
                 new_queries.append(query)
-                seen_queries[repr(query)] = True
+                seen_queries.add(key)
 
         self.queries = new_queries
 
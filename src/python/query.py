@@ -3,17 +3,32 @@ from __future__ import annotations
 import logging
 import random
 import json
+import sys
 
-from typing import Dict, List, Optional
+from array import array
+from typing import Any, Callable, Container, Dict, List, Optional, Tuple
 
-import copy
+import bisect
+
+import crossover
 
 from individual import Individual
+from vocabulary import Vocabulary, random_element
+
+
+# Shared by all queries without terms of one kind; term arrays are never modified in place
+_NO_TERMS = array('I')
 
 
 class Query(Individual):
     """Class for managing a query as individual.
 
+    The genotype is stored compactly as sorted arrays of interned term IDs
+    (see :meth:`Vocabulary.term_id`).
+    Term arrays are replaced rather than modified on mutation,
+    so copies of a query may share them.
+    The query body is only rendered when requested and cached until the next mutation.
+
     :param musts: List of positive terms,
         defaults to None
     :type musts: List[str], optional
@@ -27,6 +42,14 @@ class Query(Individual):
     :type fitness: float, optional
     """
 
+    __slots__ = ('_must_ids', '_must_not_ids', '_genotype_key', '_body', '_last_explanation')
+
+    # Predicate of terms that the index analyzes into a single token,
+    # usually :meth:`Backend.is_single_token`. If set, bodies are rendered
+    # with one ``match`` clause per kind of term instead of one per term,
+    # see :meth:`render_body`
+    compact_body: Optional[Callable[[str], bool]] = None
+
     def __init__(
             self,
             musts: List[str]=[],
@@ -43,16 +66,207 @@ class Query(Individual):
         self.fitness = fitness
 
         # Genotype
-        self._musts = musts
-        self._must_nots = must_nots
+        self._must_ids = Query._term_ids(musts)
+        self._must_not_ids = Query._term_ids(must_nots)
+        self._genotype_key = None
+        self._body = None
+
+    @classmethod
+    def from_term_ids(
+            cls,
+            must_ids: array,
+            must_not_ids: array,
+            fitness: float = 0.0,
+            n_mutations: int = 0,
+            ) -> Query:
+        """Returns query with given term ID arrays, which it may share.
+
+        :param must_ids: Sorted positive term IDs
+        :type must_ids: array
+
+        :param must_not_ids: Sorted negative term IDs
+        :type must_not_ids: array
+
+        :param fitness: Fitness score,
+            defaults to 0.0
+        :type fitness: float, optional
+
+        :param n_mutations: Number of mutations so far,
+            defaults to 0
+        :type n_mutations: int, optional
+
+        :return: New query
+        :rtype: :class:`Query`
+        """
+        query = cls.__new__(cls)
+        query._must_ids = must_ids if len(must_ids) > 0 else _NO_TERMS
+        query._must_not_ids = must_not_ids if len(must_not_ids) > 0 else _NO_TERMS
+        query._genotype_key = None
+        query._body = None
+        query._last_explanation = None
+        query.fitness = fitness
+        query.n_mutations = n_mutations
+        return query
+
+    def clone(self) -> Query:
+        """Returns copy of query in O(1).
+        The copy shares the term arrays, which are never modified in place,
+        and does not carry over the last explanation.
+
+        :return: New query
+        :rtype: :class:`Query`
+        """
+        query = Query.from_term_ids(
+                must_ids = self._must_ids,
+                must_not_ids = self._must_not_ids,
+                fitness = self.fitness,
+                n_mutations = self.n_mutations,
+                )
+        query._genotype_key = self._genotype_key
+        return query
+
+    @staticmethod
+    def _term_ids(words: List[str]) -> array:
+        """Returns sorted array of interned term IDs of words.
+        """
+        if len(words) == 0:
+            return _NO_TERMS
+
+        return array(
+                'I',
+                sorted(
+                    [
+                        Vocabulary.term_id(word)
+                        for word in words
+                        ]
+                    )
+                )
+
+    def __getstate__(self) -> Dict:
+        # Term IDs are only valid within a process, so words are pickled.
+        return {
+                'musts': self._musts,
+                'must_nots': self._must_nots,
+                'fitness': self.fitness,
+                'n_mutations': self.n_mutations,
+                'last_explanation': self._last_explanation,
+                }
 
-        # Phenotype
-        self._update_body()
+    def __setstate__(self, state: Dict) -> None:
+        self._must_ids = Query._term_ids(state['musts'])
+        self._must_not_ids = Query._term_ids(state['must_nots'])
+        self._genotype_key = None
+        self._body = None
+        self.fitness = state['fitness']
+        self.n_mutations = state['n_mutations']
+        self._last_explanation = state['last_explanation']
+
+    @property
+    def _musts(self) -> List[str]:
+        """Positive terms, as a new list."""
+        return [
+                Vocabulary.term(term_id)
+                for term_id in self._must_ids
+                ]
+
+    @property
+    def _must_nots(self) -> List[str]:
+        """Negative terms, as a new list."""
+        return [
+                Vocabulary.term(term_id)
+                for term_id in self._must_not_ids
+                ]
+
+    @property
+    def body(self) -> Dict:
+        """Query body in Elasticsearch query DSL, rendered on first access
+        and cached until the next mutation or change of :attr:`compact_body`.
+        The body is shared between accesses and must not be modified.
+        """
+        if self._body is None or self._body[0] != Query.compact_body:
+            self._body = (
+                    Query.compact_body,
+                    Query.render_body(
+                        musts = self._musts,
+                        must_nots = self._must_nots,
+                        compact = Query.compact_body,
+                        )
+                    )
+
+        return self._body[1]
 
-    def _update_body(self) -> None:
-        """Updates query body with current terms.
+    @staticmethod
+    def render_body(
+            musts: List[str],
+            must_nots: List[str],
+            compact: Optional[Callable[[str], bool]] = None,
+            ) -> Dict:
+        """Returns query body in Elasticsearch query DSL.
+
+        The full form has one ``match`` clause per term.
+        The compact form has one ``match`` clause with operator ``and``
+        for all positive terms and one ``match`` clause for all negative terms.
+        Positive terms that the index analyzer splits into several tokens
+        keep their own ``match`` clause, since operator ``and`` would require
+        all of their tokens.
+        So both forms match and score the same documents.
+        (A ``terms`` query would be even smaller, but is not scored.)
+
+        :param musts: Positive terms
+        :type musts: List[str]
+
+        :param must_nots: Negative terms
+        :type must_nots: List[str]
+
+        :param compact: Predicate of terms that the index analyzes into a single token,
+            see :meth:`Backend.is_single_token`, to render the compact form,
+            defaults to None for the full form
+        :type compact: Callable[[str], bool], optional
+
+        :return: Search body
+        :rtype: Dict
         """
-        self.body = {
+        if compact is not None:
+            tokens = []
+            split_terms = []
+            for term in musts:
+                if compact(term):
+                    tokens.append(term)
+                else:
+                    split_terms.append(term)
+
+            return {
+                    'query': {
+                        'bool': {
+                            'must': ([
+                                {
+                                    'match': {
+                                        'full_text': {
+                                            'query': " ".join(tokens),
+                                            'operator': "and",
+                                            }
+                                        }
+                                    }
+                                ] if len(tokens) > 0 else []) + [
+                                {
+                                    'match': {
+                                        'full_text': term
+                                        }
+                                    }
+                                for term in split_terms
+                                ],
+                            'must_not': [
+                                {
+                                    'match': {
+                                        'full_text': " ".join(must_nots)
+                                        }
+                                    }
+                                ] if len(must_nots) > 0 else [],
+                            }
+                        }
+                    }
+
+        return {
                 'query': {
                     'bool': {
                         'must': [
@@ -60,14 +274,14 @@ class Query(Individual):
                                 'match': {
                                     'full_text': term
                                     }
-                                } for term in self._musts
+                                } for term in musts
                             ],
                         'must_not': [
                             {
                                 'match': {
                                     'full_text': term
                                     }
-                                } for term in self._must_nots
+                                } for term in must_nots
                             ]
                         }
                     }
@@ -89,16 +303,73 @@ class Query(Individual):
                 indent = 4
                 )
 
+    def genotype(self) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Returns canonical genotype, independent of term order.
+
+        :return: Sorted positive term IDs and sorted negative term IDs
+        :rtype: Tuple[Tuple[int, ...], Tuple[int, ...]]
+        """
+        return tuple(self._must_ids), \
+                tuple(self._must_not_ids)
+
+    def genotype_key(self) -> bytes:
+        """Returns canonical genotype as compact hashable key,
+        cached until the next mutation.
+        Queries with the same terms, in any order, have equal keys.
+
+        :return: Genotype key
+        :rtype: bytes
+        """
+        if self._genotype_key is None:
+            self._genotype_key = Query.genotype_key_of(
+                    self._must_ids,
+                    self._must_not_ids,
+                    )
+
+        return self._genotype_key
+
+    @staticmethod
+    def genotype_key_of(must_ids: array, must_not_ids: array) -> bytes:
+        """Returns genotype key of sorted term ID arrays, as in :meth:`genotype_key`.
+
+        :param must_ids: Sorted positive term IDs
+        :type must_ids: array
+
+        :param must_not_ids: Sorted negative term IDs
+        :type must_not_ids: array
+
+        :return: Genotype key
+        :rtype: bytes
+        """
+        return len(must_ids).to_bytes(4, sys.byteorder) \
+                + must_ids.tobytes() \
+                + must_not_ids.tobytes()
+
     def size(self) -> int:
         """Returns total number of terms.
 
         :rtype: int
         """
-        return len(self._musts) \
-                + len(self._must_nots)
+        return len(self._must_ids) \
+                + len(self._must_not_ids)
+
+    @property
+    def explanation(self) -> Optional[Dict]:
+        """Explanation tree of the last score, if it was kept for display,
+        see :meth:`update_with_explanation`.
+        """
+        if self._last_explanation is None:
+            return None
+
+        return self._last_explanation['explanation']
 
     def update_with_explanation(self, explanation: Dict) -> None:
-        """Updates query with explanation from Elasticsearch.
+        """Updates query with explanation from Elasticsearch,
+        keeping the explanation tree until the next score.
+
+        Explanations are costly to request and to retain,
+        so they are meant for the few queries on display only.
+        Evaluation uses :meth:`update_with_score`.
 
         :param explanation: Result from Elasticsearch explanation call
         :type explanation: Dict
@@ -107,97 +378,179 @@ class Query(Individual):
         self._last_explanation = explanation
         self.fitness = explanation['explanation']['value']
 
+    def update_with_score(self, score: float) -> None:
+        """Updates query with plain match score, dropping the last explanation.
+
+        :param score: Match score against target document
+        :type score: float
+        """
+        self._last_explanation = None
+        self.fitness = score
+
     @staticmethod
     def _random_element(
             terms: List,
-            blacklist: Optional[List] = None
+            blacklist: Optional[Container] = None
             ) -> Any:
-        """Returns random element from list.
+        """Returns random element from list in constant expected time,
+        see :func:`vocabulary.random_element`.
 
         :param terms: List
         :type terms: List
 
-        :param blacklist: List of elements to not return,
+        :param blacklist: Elements to not return,
             defaults to None
-        :type blacklist: List, optional
+        :type blacklist: Container, optional
 
-        :raises Exception: if there are elements in ``terms``
+        :raises Exception: if there are no elements in ``terms``
 
-        :return: Random element from ``terms``
+        :return: Random element from ``terms``, or None if all are blacklisted
         :rtype: Any
         """
         if len(terms) == 0:
             raise Exception()
+        elif blacklist is not None:
+            return random_element(
+                    terms,
+                    without = blacklist,
+                    )
         else:
-            terms_shuffled = copy.copy(terms)
-            random.shuffle(terms_shuffled)
-
-            if blacklist is not None:
-                for term in terms_shuffled:
-                    if term not in blacklist:
-                        return term
-                return None
-            else:
-                return terms_shuffled[0]
+            return random.choice(terms)
 
-    def _mutate_terms(self, words: List[str]) -> None:
-        """Mutates terms.
+    def _mutate_terms(
+            self,
+            words: List[str],
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
+            ) -> None:
+        """Mutates terms: either adds a random new term or removes a random term,
+        among either the positive or the negative terms.
 
         :param words: List of words from which to draw potential new terms
         :param type: List[str]
+
+        :param proposal: Distribution of new terms, see :meth:`mutate`,
+            defaults to None
+        :type proposal: Callable[[array, Container[str]], Optional[str]], optional
         """
-        random.choice(
-                [
-                    lambda l: l.append(
-                        Query._random_element(
-                            terms = words,
-                            blacklist = l,
-                            )
-                        ),
-                    lambda l: l.pop(
-                        random.randrange(
-                            len(l)
-                            )
+        self._must_ids, self._must_not_ids = Query.mutated_term_ids(
+                self._must_ids,
+                self._must_not_ids,
+                words,
+                proposal,
+                )
+        self._genotype_key = None
+        self._body = None
+
+    @staticmethod
+    def mutated_term_ids(
+            must_ids: array,
+            must_not_ids: array,
+            words: List[str],
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
+            ) -> Tuple[array, array]:
+        """Returns term IDs after one random mutation, as in :meth:`mutate`.
+        Unchanged arrays are returned as they are, changed arrays are new.
+
+        :param must_ids: Sorted positive term IDs
+        :type must_ids: array
+
+        :param must_not_ids: Sorted negative term IDs
+        :type must_not_ids: array
+
+        :param words: List of words from which to draw potential new terms
+        :type words: List[str]
+
+        :param proposal: Distribution of new terms, see :meth:`mutate`,
+            defaults to None
+        :type proposal: Callable[[array, Container[str]], Optional[str]], optional
+
+        :return: Positive and negative term IDs
+        :rtype: Tuple[array, array]
+        """
+        positive = random.choice([True, False])
+        term_ids = must_ids if positive else must_not_ids
+
+        if random.choice([True, False]):
+            if proposal is None:
+                word = Query._random_element(
+                        terms = words,
+                        blacklist = {
+                            Vocabulary.term(term_id)
+                            for term_id in term_ids
+                            },
                         )
-                        if len(l) > 0
-                        else [],
-                    ]
-                )(
-                        random.choice(
-                            [
-                                self._musts,
-                                self._must_nots,
-                                ]
-                            )
+            else:
+                # Proposals draw from the context of both kinds of terms,
+                # so both are blacklisted to not propose a term of the other kind
+                context = must_ids + must_not_ids
+                word = proposal(
+                        context,
+                        {
+                            Vocabulary.term(term_id)
+                            for term_id in context
+                            },
                         )
+            if word is None:
+                return must_ids, must_not_ids
 
-    def mutate(self, words: List[str]) -> None:
-        """Mutates query body.
+            term_ids = array('I', term_ids)
+            bisect.insort(term_ids, Vocabulary.term_id(word))
+
+        elif len(term_ids) > 0:
+            i = random.randrange(len(term_ids))
+            term_ids = term_ids[:i] + term_ids[i + 1:]
+
+        if positive:
+            return term_ids, must_not_ids
+        else:
+            return must_ids, term_ids
+
+    def mutate(
+            self,
+            words: List[str],
+            proposal: Optional[Callable[[array, Container[str]], Optional[str]]] = None,
+            ) -> None:
+        """Mutates query terms.
 
         :param words: List of words from which to draw potential new terms
         :type words: List[str]
+
+        :param proposal: Distribution of new terms instead of uniform draws from ``words``,
+            called with the term IDs of the query and a blacklist of words,
+            see :mod:`proposal`, defaults to None
+        :type proposal: Callable[[array, Container[str]], Optional[str]], optional
         """
         assert(len(words) > 0)
 
-        self._mutate_terms(words)
+        self._mutate_terms(words, proposal)
 
         logging.debug("mutated positive terms: " + str(self._musts))
         logging.debug("mutated negative terms: " + str(self._must_nots))
 
-        self._update_body()
         self.n_mutations += 1
 
-    def recombine(self, other_query: Query) -> Query:
+    def recombine(
+            self,
+            other_query: Query,
+            operator: Callable[[array, array], array] = crossover.uniform,
+            ) -> Query:
         """Recombines genotype with genotype from another query.
+        Positive and negative terms are crossed separately.
 
         :param other_query: Other :class:`Query` object
         :type other_query: Query
 
+        :param operator: Crossover operator on sorted term ID arrays,
+            see :mod:`crossover`, defaults to :func:`crossover.uniform`
+        :type operator: Callable[[array, array], array], optional
+
         :return: New offspring query
         :rtype: Query
         """
-        # TODO
-        pass
+        return Query.from_term_ids(
+                must_ids = operator(self._must_ids, other_query._must_ids),
+                must_not_ids = operator(self._must_not_ids, other_query._must_not_ids),
+                )
 
     def update_fitness(
             self,
@@ -0,0 +1,152 @@
+"""Selection operators on fitness scores.
+
+Each operator takes the fitness scores of a population and returns the
+positions of the selected individuals.
+Operators that select with replacement may return a position several times.
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import heapq
+import itertools
+import random
+
+
+def without_lowest(fitnesses: Sequence[float]) -> List[int]:
+    """Selects all individuals except those with the lowest score, in O(N).
+
+    :param fitnesses: Fitness scores
+    :type fitnesses: Sequence[float]
+
+    :return: Positions of selected individuals, in population order
+    :rtype: List[int]
+    """
+    if len(fitnesses) == 0:
+        return []
+
+    lowest = min(fitnesses)
+
+    return [
+            i
+            for i, fitness in enumerate(fitnesses)
+            if fitness > lowest
+            ]
+
+def truncation(fitnesses: Sequence[float], k: int) -> List[int]:
+    """Selects the ``k`` fittest individuals, in O(N log k).
+
+    :param fitnesses: Fitness scores
+    :type fitnesses: Sequence[float]
+
+    :param k: Number of individuals to select
+    :type k: int
+
+    :return: Positions of selected individuals, fittest first
+    :rtype: List[int]
+    """
+    return heapq.nlargest(
+            k,
+            range(len(fitnesses)),
+            key = fitnesses.__getitem__,
+            )
+
+def tournament(
+        fitnesses: Sequence[float],
+        k: int,
+        size: int = 2,
+        ) -> List[int]:
+    """Selects ``k`` individuals with replacement, each the fittest of
+    ``size`` randomly drawn individuals, in O(k * size).
+
+    :param fitnesses: Fitness scores
+    :type fitnesses: Sequence[float]
+
+    :param k: Number of individuals to select
+    :type k: int
+
+    :param size: Number of individuals per tournament,
+        defaults to 2
+    :type size: int, optional
+
+    :return: Positions of selected individuals
+    :rtype: List[int]
+    """
+    if len(fitnesses) == 0:
+        return []
+
+    n = len(fitnesses)
+
+    return [
+            max(
+                [
+                    random.randrange(n)
+                    for _ in range(size)
+                    ],
+                key = fitnesses.__getitem__,
+                )
+            for _ in range(k)
+            ]
+
+def roulette(fitnesses: Sequence[float], k: int) -> List[int]:
+    """Selects ``k`` individuals with replacement, with probabilities
+    proportional to fitness, in O(N + k log N).
+    If all individuals have zero fitness, all are equally likely.
+
+    :param fitnesses: Fitness scores, not negative
+    :type fitnesses: Sequence[float]
+
+    :param k: Number of individuals to select
+    :type k: int
+
+    :return: Positions of selected individuals
+    :rtype: List[int]
+    """
+    if len(fitnesses) == 0:
+        return []
+
+    cum_weights = list(itertools.accumulate(fitnesses))
+
+    if cum_weights[-1] <= 0.0:
+        return random.choices(
+                range(len(fitnesses)),
+                k = k,
+                )
+
+    return random.choices(
+            range(len(fitnesses)),
+            cum_weights = cum_weights,
+            k = k,
+            )
+
+def with_elites(
+        selected: List[int],
+        fitnesses: Sequence[float],
+        n_elites: int,
+        ) -> List[int]:
+    """Returns selection that additionally keeps the ``n_elites`` fittest individuals,
+    unless they are selected already.
+
+    :param selected: Positions of selected individuals
+    :type selected: List[int]
+
+    :param fitnesses: Fitness scores
+    :type fitnesses: Sequence[float]
+
+    :param n_elites: Number of fittest individuals to keep
+    :type n_elites: int
+
+    :return: Positions of elites not selected yet, followed by ``selected``
+    :rtype: List[int]
+    """
+    if n_elites <= 0:
+        return selected
+
+    already_selected = set(selected)
+
+    return [
+            i
+            for i in truncation(fitnesses, n_elites)
+            if i not in already_selected
+            ] + selected
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import random
+
+from action import Action
+from queries import Queries, RecombinationMode, SelectionMode
+
+
+class Strategy(ABC):
+    """Policy that picks evolutionary actions for unattended runs.
+
+    Actions are referred to by their position in the list of available actions,
+    like the numbers typed in interactive play.
+    """
+
+    def __init__(self):
+        super().__init__()
+
+    @abstractmethod
+    def actions(
+            self,
+            generation: int,
+            queries: Queries,
+            actions: List[Action],
+            ) -> List[Action]:
+        """Returns actions to apply, in order, after evaluating a generation.
+
+        :param generation: Zero-based generation number
+        :type generation: int
+
+        :param queries: Evaluated population
+        :type queries: :class:`Queries`
+
+        :param actions: Available actions
+        :type actions: List[Action]
+
+        :return: Actions to apply
+        :rtype: List[Action]
+        """
+        pass
+
+
+class FixedSequenceStrategy(Strategy):
+    """Applies one action per generation, cycling through a fixed sequence.
+
+    :param sequence: Action numbers
+    :type sequence: List[int]
+    """
+
+    def __init__(self, sequence: List[int]):
+        """Constructor method
+        """
+        super().__init__()
+
+        assert(len(sequence) > 0)
+
+        self.sequence = sequence
+
+    def actions(self, generation, queries, actions):
+        return [
+                actions[self.sequence[generation % len(self.sequence)]]
+                ]
+
+
+class WeightedRandomStrategy(Strategy):
+    """Applies one random action per generation.
+
+    :param weights: Relative probability of each action number,
+        defaults to None for uniform probabilities
+    :type weights: List[float], optional
+    """
+
+    def __init__(self, weights: Optional[List[float]] = None):
+        """Constructor method
+        """
+        super().__init__()
+
+        self.weights = weights
+
+    def actions(self, generation, queries, actions):
+        return random.choices(
+                actions,
+                weights = self.weights,
+                )
+
+
+class GeneticAlgorithmStrategy(Strategy):
+    """Applies a standard generational loop:
+    select, recombine, mutate, remove duplicates and cap the population size.
+
+    With the selection action, selection is skipped while all queries are
+    equally fit, since it would remove the whole population.
+
+    :param select: Action number of selection
+    :type select: int
+
+    :param recombine: Action number of recombination
+    :type recombine: int
+
+    :param mutate: Action number of mutation
+    :type mutate: int
+
+    :param remove_duplicates: Action number of duplicate removal
+    :type remove_duplicates: int
+
+    :param max_population: Population size above which random queries are removed,
+        defaults to None for no limit
+    :type max_population: int, optional
+
+    :param selection_mode: Selection operator to use instead of the selection action,
+        defaults to None
+    :type selection_mode: Member of enum :class:`SelectionMode`, optional
+
+    :param n_elites: Number of fittest queries kept by the selection operator,
+        defaults to 0
+    :type n_elites: int, optional
+
+    :param recombination_mode: Recombination mode to use instead of the recombination action,
+        defaults to None
+    :type recombination_mode: Member of enum :class:`RecombinationMode`, optional
+    """
+
+    def __init__(
+            self,
+            select: int,
+            recombine: int,
+            mutate: int,
+            remove_duplicates: int,
+            max_population: Optional[int] = None,
+            selection_mode: Optional[SelectionMode] = None,
+            n_elites: int = 0,
+            recombination_mode: Optional[RecombinationMode] = None,
+            ):
+        """Constructor method
+        """
+        super().__init__()
+
+        self._select = select
+        self._recombine = recombine
+        self._mutate = mutate
+        self._remove_duplicates = remove_duplicates
+
+        self.max_population = max_population
+        self.selection_mode = selection_mode
+        self.n_elites = n_elites
+        self.recombination_mode = recombination_mode
+
+    def actions(self, generation, queries, actions):
+        fitnesses = queries.fitnesses()
+
+        steps = []
+        if self.selection_mode is not None:
+            steps.append(
+                    Action(
+                        title = "Selection",
+                        descr = "Select queries by {}.".format(self.selection_mode.name.lower()),
+                        func = lambda: queries.select(
+                            mode = self.selection_mode,
+                            n_elites = self.n_elites,
+                            ),
+                        )
+                    )
+        elif len(fitnesses) > 0 and min(fitnesses) < max(fitnesses):
+            steps.append(actions[self._select])
+
+        if self.recombination_mode is not None:
+            steps.append(
+                    Action(
+                        title = "Recombination",
+                        descr = "Recombine queries by {}.".format(self.recombination_mode.name.lower()),
+                        func = lambda: queries.recombine(
+                            mode = self.recombination_mode,
+                            ),
+                        )
+                    )
+        else:
+            steps.append(actions[self._recombine])
+
+        steps.extend(
+                [
+                    actions[self._mutate],
+                    actions[self._remove_duplicates],
+                    ]
+                )
+
+        if self.max_population is not None:
+            steps.append(
+                    Action(
+                        title = "Cap population",
+                        descr = "Remove random queries beyond the maximum population size.",
+                        func = lambda: queries.random_purge(
+                            k = max(0, queries.size() - self.max_population)
+                            ),
+                        )
+                    )
+
+        return steps
@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Dict, List, Optional, Set
 
 from queries import Queries
+from query import Query
 from color import color
 
 
@@ -31,6 +32,35 @@ class StringMaker():
                     ]
                 )
 
+    @staticmethod
+    def explanations(queries: List[Query]) -> str:
+        return "\n".join(
+                [
+                    "{:>5}. {}\n{}".format(
+                        i + 1,
+                        query,
+                        StringMaker.explanation(query.explanation),
+                        )
+                    for i, query in enumerate(queries)
+                    ]
+                )
+
+    @staticmethod
+    def explanation(explanation: Dict, depth: int = 1) -> str:
+        return "\n".join(
+                [
+                    "{}{:.6g} {}".format(
+                        "      " * depth,
+                        explanation['value'],
+                        explanation['description'],
+                        ),
+                    *[
+                        StringMaker.explanation(detail, depth + 1)
+                        for detail in explanation.get('details', [])
+                        ],
+                    ]
+                )
+
     @staticmethod
     def actions(actions: List) -> str:
         return "\n".join(
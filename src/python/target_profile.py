@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+from local_backend import LocalBackend
+from query import Query
+from vocabulary import Vocabulary
+
+
+class TargetProfile():
+    """Precomputed scoring data of a single target document.
+
+    A query's score against the target only depends on the target's
+    per-term score contributions, so it can be computed without the backend:
+    the sum of the weights of all positive terms,
+    or 0.0 if a positive term is missing or a negative term is present.
+
+    :param weights: Score contribution of each analyzed term of the target document
+    :type weights: Dict[str, float]
+
+    :param analyzer: Callable that splits query words into analyzed terms,
+        defaults to :meth:`LocalBackend.analyzed`
+    :type analyzer: Callable[[str], List[str]], optional
+    """
+
+    def __init__(
+            self,
+            weights: Dict[str, float],
+            analyzer: Callable[[str], List[str]] = LocalBackend.analyzed,
+            ):
+        """Constructor method
+        """
+        self.weights = weights
+
+        self._analyzer = analyzer
+
+        # Query word -> weight, or None if no term of the word is in the target
+        self._word_weights = {}
+
+        # Same per interned term ID, only valid within this process
+        self._term_id_weights = {}
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+
+        # Term IDs are interned per process, so other processes refill the memo
+        state['_term_id_weights'] = {}
+
+        return state
+
+    def word_weight(self, word: str) -> Optional[float]:
+        """Returns score contribution of a query word.
+
+        :param word: Word as used in query terms
+        :type word: str
+
+        :return: Sum of weights of the word's analyzed terms in the target,
+            or None if none of them is in the target
+        :rtype: Optional[float]
+        """
+        try:
+            return self._word_weights[word]
+
+        except KeyError:
+            weights = [
+                    self.weights[term]
+                    for term in self._analyzer(word)
+                    if term in self.weights
+                    ]
+            weight = sum(weights) if len(weights) > 0 else None
+
+            self._word_weights[word] = weight
+            return weight
+
+    def term_id_weight(self, term_id: int) -> Optional[float]:
+        """Returns score contribution of a query term by interned ID.
+
+        :param term_id: Term ID
+        :type term_id: int
+
+        :return: Weight as per :meth:`word_weight`
+        :rtype: Optional[float]
+        """
+        try:
+            return self._term_id_weights[term_id]
+
+        except KeyError:
+            weight = self.word_weight(
+                    Vocabulary.term(term_id)
+                    )
+
+            self._term_id_weights[term_id] = weight
+            return weight
+
+    def score(self, query: Query) -> float:
+        """Returns score of query against target.
+
+        :param query: Query
+        :type query: :class:`Query`
+
+        :return: Score
+        :rtype: float
+        """
+        return self.score_term_ids(
+                query._must_ids,
+                query._must_not_ids,
+                )
+
+    def score_term_ids(
+            self,
+            must_ids: Sequence[int],
+            must_not_ids: Sequence[int],
+            ) -> float:
+        """Returns score of query genotype against target.
+
+        :param must_ids: Positive term IDs
+        :type must_ids: Sequence[int]
+
+        :param must_not_ids: Negative term IDs
+        :type must_not_ids: Sequence[int]
+
+        :return: Score
+        :rtype: float
+        """
+        term_id_weight = self.term_id_weight
+
+        for term_id in must_not_ids:
+            if term_id_weight(term_id) is not None:
+                return 0.0
+
+        if len(must_ids) == 0:
+            # Pure negative queries match without score, empty queries match all.
+            return 0.0 if len(must_not_ids) > 0 else 1.0
+
+        score = 0.0
+        for term_id in must_ids:
+            weight = term_id_weight(term_id)
+            if weight is None:
+                return 0.0
+            score += weight
+
+        return score
+
+    def score_many(self, queries: List[Query]) -> List[float]:
+        """Returns scores of many queries against target.
+
+        :param queries: List of queries
+        :type queries: List[Query]
+
+        :return: Scores in order of ``queries``
+        :rtype: List[float]
+        """
+        score = self.score
+
+        return [
+                score(query)
+                for query in queries
+                ]
@@ -1,26 +1,153 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Set
+from array import array
+from typing import Any, Container, Dict, List, Optional, Sequence, Set, Tuple
 
 from collections import defaultdict
 
+import mmap
 import random
+import struct
+import sys
+
+import instrumentation
+
+from alias_table import AliasTable
+
+
+# Number of rejected draws before falling back to a scan over all elements
+MAX_REJECTIONS = 16
+
+# Header of snapshot files: magic, format version, byte order of arrays,
+# numbers of words, bytes of words, documents and document words
+_SNAPSHOT_HEADER = struct.Struct("<4sI8sQQQQ")
+_SNAPSHOT_MAGIC = b"EAQV"
+_SNAPSHOT_VERSION = 1
+
+def random_element(
+        elements: Sequence,
+        without: Container = (),
+        alias_table: Optional[AliasTable] = None,
+        ) -> Any:
+    """Returns random element that is not in a blacklist.
+
+    Elements are drawn and rejected if blacklisted, which takes constant expected time
+    as long as the blacklist covers only a small part of the elements.
+    After :data:`MAX_REJECTIONS` rejections, the allowed elements are scanned instead.
+
+    :param elements: Elements to draw from
+    :type elements: Sequence
+
+    :param without: Blacklist of elements to not return,
+        defaults to ()
+    :type without: Container, optional
+
+    :param alias_table: Table of weights of elements to draw with,
+        defaults to None for uniform draws
+    :type alias_table: :class:`AliasTable`, optional
+
+    :return: Random element, or None if all elements are blacklisted
+    :rtype: Any
+    """
+    if len(elements) == 0:
+        return None
+
+    for _ in range(MAX_REJECTIONS):
+        if alias_table is None:
+            element = elements[random.randrange(len(elements))]
+        else:
+            element = elements[alias_table.draw()]
+
+        if element not in without:
+            return element
+
+    allowed = [
+            i
+            for i, element in enumerate(elements)
+            if element not in without
+            ]
+
+    if len(allowed) == 0:
+        return None
+    elif alias_table is None:
+        return elements[random.choice(allowed)]
+    else:
+        return elements[
+                random.choices(
+                    allowed,
+                    weights = [
+                        alias_table.weight(i)
+                        for i in allowed
+                        ],
+                    )[0]
+                ]
 
 
 class Vocabulary():
     """Class for managing vocabulary.
 
+    Random words are drawn in constant expected time from an indexed list of words,
+    optionally weighted by their counts. Both are built on first use
+    and rebuilt after words are added.
+
+    With ``record_documents``, documents added with :meth:`add_words_from` are also recorded
+    as sorted arrays of the indices of their unique words in :meth:`wordlist`,
+    for document statistics of mutation proposals (see :mod:`proposal`).
+
     :param words: List of words from some text,
         defaults to [].
     :type words: List[str], optional
+
+    :param record_documents: Whether to record documents added with :meth:`add_words_from`,
+        defaults to False
+    :type record_documents: bool, optional
     """
 
-    def __init__(self, words: List(str) = []):
+    # Process-wide interning of words to integer term IDs
+    _term_ids = {}
+    _terms = []
+
+    def __init__(self, words: List(str) = [], record_documents: bool = False):
         """Constructor method
         """
+        self.record_documents = record_documents
         self.words = defaultdict(int)
+        self._word_indices = {}
+        self._wordlist = None
+        self._alias_table = None
+
+        # Incremented whenever words are added
+        self.version = 0
+
+        # Documents in compressed sparse row layout, the words of document ``i``
+        # at ``_document_words[_document_offsets[i]:_document_offsets[i + 1]]``,
+        # or read-only views of a memory-mapped snapshot until documents are added
+        self._document_offsets = array('Q', [0])
+        self._document_words = array('I')
+
+        # Path of memory-mapped snapshot the document views belong to
+        self._snapshot_path = None
+
         self.add_words(words)
 
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+
+        # Workers map the snapshot themselves instead of receiving copies
+        if self._snapshot_path is not None:
+            state['_document_offsets'] = None
+            state['_document_words'] = None
+
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+
+        if self._snapshot_path is not None:
+            self._document_offsets, self._document_words = Vocabulary._mapped_documents(
+                    self._snapshot_path
+                    )
+
     def __str__(self):
         return "\n".join(
                 [
@@ -33,6 +160,222 @@ class Vocabulary():
                     ]
                 )
 
+    @staticmethod
+    def term_id(word: str) -> int:
+        """Returns integer ID of word, interning it on first use.
+        IDs are stable within a process, but not across processes.
+
+        :param word: Word
+        :type word: str
+
+        :return: Term ID
+        :rtype: int
+        """
+        try:
+            return Vocabulary._term_ids[word]
+
+        except KeyError:
+            term_id = len(Vocabulary._terms)
+            Vocabulary._term_ids[word] = term_id
+            Vocabulary._terms.append(word)
+            return term_id
+
+    @staticmethod
+    def term(term_id: int) -> str:
+        """Returns word of interned term ID.
+
+        :param term_id: Term ID
+        :type term_id: int
+
+        :return: Word
+        :rtype: str
+        """
+        return Vocabulary._terms[term_id]
+
+    def save(self, path: str) -> None:
+        """Saves snapshot of vocabulary, including recorded documents, to a binary file.
+
+        The file holds a header, the sorted words as offsets into their UTF-8 bytes,
+        the word counts, and the documents in compressed sparse row layout,
+        each section aligned to 8 bytes and the arrays in native byte order.
+
+        :param path: File path
+        :type path: str
+        """
+        wordlist = self._indexed_words()
+        order = sorted(
+                range(len(wordlist)),
+                key = wordlist.__getitem__
+                )
+
+        # Old word index -> index in sorted table
+        sorted_indices = array('I', bytes(4 * len(order)))
+        for i, old in enumerate(order):
+            sorted_indices[old] = i
+
+        encoded = [
+                wordlist[old].encode("utf-8")
+                for old in order
+                ]
+        word_offsets = array('Q', [0])
+        for word in encoded:
+            word_offsets.append(word_offsets[-1] + len(word))
+
+        counts = array(
+                'Q',
+                [
+                    self.words[wordlist[old]]
+                    for old in order
+                    ]
+                )
+
+        document_words = array('I')
+        for i in range(self.n_documents()):
+            document_words.extend(
+                    sorted(
+                        [
+                            sorted_indices[old]
+                            for old in self.document(i)
+                            ]
+                        )
+                    )
+
+        with open(path, "wb") as file:
+            file.write(
+                    _SNAPSHOT_HEADER.pack(
+                        _SNAPSHOT_MAGIC,
+                        _SNAPSHOT_VERSION,
+                        sys.byteorder.encode("ascii"),
+                        len(encoded),
+                        word_offsets[-1],
+                        self.n_documents(),
+                        len(document_words),
+                        )
+                    )
+
+            for section in [
+                    word_offsets.tobytes(),
+                    b"".join(encoded),
+                    counts.tobytes(),
+                    self._document_offsets.tobytes(),
+                    document_words.tobytes(),
+                    ]:
+                file.write(section)
+                file.write(bytes(-len(section) % 8))
+
+    @staticmethod
+    def _snapshot_sections(buffer) -> Tuple[memoryview, memoryview, memoryview, memoryview, memoryview]:
+        """Returns views of the sections of a snapshot, see :meth:`save`.
+
+        :raises ValueError: if buffer is not a snapshot readable on this machine
+        """
+        view = memoryview(buffer)
+
+        magic, version, byteorder, n_words, n_word_bytes, n_documents, n_document_words = \
+                _SNAPSHOT_HEADER.unpack_from(view)
+
+        if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+            raise ValueError("not a vocabulary snapshot")
+
+        if byteorder.rstrip(b"\0").decode("ascii") != sys.byteorder:
+            raise ValueError("vocabulary snapshot has {} byte order".format(byteorder))
+
+        sections = []
+        start = _SNAPSHOT_HEADER.size
+        for size in [
+                8 * (n_words + 1),
+                n_word_bytes,
+                8 * n_words,
+                8 * (n_documents + 1),
+                4 * n_document_words,
+                ]:
+            sections.append(view[start:start + size])
+            start += size + (-size % 8)
+
+        word_offsets, word_bytes, counts, document_offsets, document_words = sections
+
+        return word_offsets.cast('Q'), \
+                word_bytes, \
+                counts.cast('Q'), \
+                document_offsets.cast('Q'), \
+                document_words.cast('I')
+
+    @staticmethod
+    def _mapped_documents(path: str) -> Tuple[memoryview, memoryview]:
+        """Returns read-only views of the documents of a memory-mapped snapshot.
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        _, _, _, document_offsets, document_words = Vocabulary._snapshot_sections(buffer)
+
+        return document_offsets, document_words
+
+    @staticmethod
+    def load(path: str, use_mmap: bool = True, record_documents: bool = False) -> Vocabulary:
+        """Returns vocabulary from snapshot file written by :meth:`save`.
+
+        With ``use_mmap``, recorded documents stay in the memory-mapped file,
+        which worker processes share, until further documents are added.
+
+        :param path: File path
+        :type path: str
+
+        :param use_mmap: Whether to memory-map recorded documents instead of reading them,
+            defaults to True
+        :type use_mmap: bool, optional
+
+        :param record_documents: Whether to record documents added after loading,
+            defaults to False
+        :type record_documents: bool, optional
+
+        :raises ValueError: if file is not a snapshot readable on this machine
+
+        :return: Vocabulary
+        :rtype: :class:`Vocabulary`
+        """
+        with open(path, "rb") as file:
+            if use_mmap:
+                buffer = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+            else:
+                buffer = file.read()
+
+        word_offsets, word_bytes, counts, document_offsets, document_words = \
+                Vocabulary._snapshot_sections(buffer)
+
+        words = bytes(word_bytes).decode("utf-8")
+        if len(words) == len(word_bytes):
+            # ASCII words can be sliced by byte offsets
+            wordlist = [
+                    words[word_offsets[i]:word_offsets[i + 1]]
+                    for i in range(len(counts))
+                    ]
+        else:
+            wordlist = [
+                    bytes(word_bytes[word_offsets[i]:word_offsets[i + 1]]).decode("utf-8")
+                    for i in range(len(counts))
+                    ]
+
+        vocabulary = Vocabulary(record_documents = record_documents)
+        vocabulary._word_indices = dict(
+                zip(wordlist, range(len(wordlist)))
+                )
+        vocabulary.words.update(
+                zip(wordlist, counts)
+                )
+
+        if use_mmap:
+            vocabulary._document_offsets = document_offsets
+            vocabulary._document_words = document_words
+            vocabulary._snapshot_path = path
+        else:
+            vocabulary._document_offsets = array('Q', document_offsets.cast('B').tobytes())
+            vocabulary._document_words = array('I', document_words.cast('B').tobytes())
+
+        vocabulary.version += 1
+
+        return vocabulary
+
     @staticmethod
     def _tokenized(text: str) -> List[str]:
         """Returns tokenized string.
@@ -52,23 +395,144 @@ class Vocabulary():
         :type words: List[str]
         """
         for word in words:
+            if word not in self._word_indices:
+                self._word_indices[word] = len(self._word_indices)
             self.words[word] += 1
 
+        self._wordlist = None
+        self._alias_table = None
+        self.version += 1
+
     def add_words_from(self, text: str) -> None:
-        """Adds words from text to dictionary counter.
+        """Adds words from text to dictionary counter
+        and records text as document if :attr:`record_documents` is set.
 
         :param text: Text string
         :type text: str
         """
-        self.add_words(
-                Vocabulary._tokenized(text)
+        words = Vocabulary._tokenized(text)
+
+        instrumentation.count("vocabulary.documents")
+
+        self.add_words(words)
+
+        if not self.record_documents:
+            return
+
+        if self._snapshot_path is not None:
+            self._document_offsets = array('Q', self._document_offsets.cast('B').tobytes())
+            self._document_words = array('I', self._document_words.cast('B').tobytes())
+            self._snapshot_path = None
+
+        self._document_words.extend(
+                sorted(
+                    {
+                        self._word_indices[word]
+                        for word in words
+                        }
+                    )
+                )
+        self._document_offsets.append(len(self._document_words))
+
+    def index_of(self, word: str) -> Optional[int]:
+        """Returns index of word in :meth:`wordlist`.
+
+        :param word: Word
+        :type word: str
+
+        :return: Index, or None if word is not in vocabulary
+        :rtype: int, optional
+        """
+        return self._word_indices.get(word)
+
+    def n_documents(self) -> int:
+        """Returns number of recorded documents.
+
+        :rtype: int
+        """
+        return len(self._document_offsets) - 1
+
+    def document(self, i: int) -> array:
+        """Returns sorted indices of the unique words of a recorded document.
+
+        :param i: Number of document, in order of addition
+        :type i: int
+
+        :return: Word indices
+        :rtype: array
+        """
+        return self._document_words[
+                self._document_offsets[i]:self._document_offsets[i + 1]
+                ]
+
+    def document_frequencies(self) -> List[int]:
+        """Returns number of recorded documents containing each word,
+        aligned with :meth:`wordlist`.
+
+        :rtype: List[int]
+        """
+        frequencies = [ 0 ] * len(self._word_indices)
+
+        for i in self._document_words:
+            frequencies[i] += 1
+
+        return frequencies
+
+    def _indexed_words(self) -> List[str]:
+        """Returns cached list of unique words, the index for random draws.
+        """
+        if self._wordlist is None:
+            self._wordlist = list(self._word_indices.keys())
+
+        return self._wordlist
+
+    def _count_table(self) -> AliasTable:
+        """Returns cached alias table of word counts, aligned with :meth:`_indexed_words`.
+        """
+        if self._alias_table is None:
+            self._alias_table = AliasTable(
+                    [
+                        self.words[word]
+                        for word in self._indexed_words()
+                        ]
+                    )
+
+        return self._alias_table
+
+    def random_word(
+            self,
+            without: Container[str] = (),
+            weighted: bool = False,
+            ) -> Optional[str]:
+        """Returns random word from vocabulary in constant expected time.
+
+        :param without: Blacklist of words to not return,
+            defaults to ()
+        :type without: Container[str], optional
+
+        :param weighted: Whether to draw words proportionally to their counts,
+            defaults to False
+        :type weighted: bool, optional
+
+        :return: Random word, or None if all words are blacklisted
+        :rtype: str, optional
+        """
+        instrumentation.count("vocabulary.random_words")
+
+        return random_element(
+                self._indexed_words(),
+                without = without,
+                alias_table = self._count_table()
+                if weighted and len(self.words) > 0
+                else None,
                 )
 
     def sample(self,
             n: int = 1,
-            without: List[str] = []
+            without: List[str] = [],
+            weighted: bool = False,
             ) -> List[str]:
-        """Returns random sample words from vocabulary.
+        """Returns random sample of distinct words from vocabulary.
 
         :param n: Number of sample words to be returned
         :type n: int
@@ -76,17 +540,47 @@ class Vocabulary():
         :param without: Blacklist of words to not include in returned sample
         :type without: List[str]
 
+        :param weighted: Whether to draw words proportionally to their counts,
+            defaults to False
+        :type weighted: bool, optional
+
+        :raises ValueError: if there are fewer than ``n`` words that are not blacklisted
+
         :return: Sample words
         :rtype: List[str]
         """
-        return random.sample(
-                [
-                    word
-                    for word in self.wordlist()
-                    if word not in without
-                    ],
-                n
-                )
+        with instrumentation.timer("vocabulary.sample"):
+            return self._sample(n, without, weighted)
+
+    def _sample(self, n: int, without: List[str], weighted: bool) -> List[str]:
+        words = self._indexed_words()
+
+        if not weighted and 2 * (n + len(without)) > len(words):
+            # Rejections would be frequent, so filter once instead
+            return random.sample(
+                    [
+                        word
+                        for word in words
+                        if word not in without
+                        ],
+                    n
+                    )
+
+        excluded = set(without)
+        sample = []
+
+        for _ in range(n):
+            word = self.random_word(
+                    without = excluded,
+                    weighted = weighted,
+                    )
+            if word is None:
+                raise ValueError("sample larger than vocabulary")
+
+            excluded.add(word)
+            sample.append(word)
+
+        return sample
 
     def wordlist(self) -> List[str]:
         """Returns list of unique words from vocabulary.
@@ -94,4 +588,4 @@ class Vocabulary():
         :return: List of words
         :rtype: List[str]
         """
-        return list(self.words.keys())
+        return list(self._indexed_words())
@@ -0,0 +1,166 @@
+import pytest
+
+import asyncio
+
+from async_index import AsyncIndex
+from columnar_queries import ColumnarQueries
+from index import Index
+from queries import Queries
+from query import Query
+
+index_name = "test_index"
+
+texts = [
+        "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
+        "Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.",
+        ]
+
+def test_evaluate_population():
+    index = Index(index_name)
+
+    index.es.index(
+            index = index_name,
+            id = 1,
+            refresh = "wait_for",
+            body = {
+                'full_text': texts[0]
+                },
+            )
+
+    queries = Queries(
+            queries = [
+                Query(
+                    musts = [ texts[0].split()[0] ]
+                    ),
+                Query(
+                    musts = [ texts[1].split()[0] ]
+                    ),
+                ],
+            words = [],
+            )
+
+    async def evaluate(explain):
+        async with AsyncIndex(index_name, concurrency = 2) as async_index:
+            await async_index.evaluate_population(
+                    queries = queries,
+                    target_id = 1,
+                    explain = explain,
+                    )
+
+    asyncio.run(evaluate(explain = True))
+    explained = [ query.fitness for query in queries.queries ]
+
+    asyncio.run(evaluate(explain = False))
+
+    assert [ query.fitness for query in queries.queries ] == explained
+    assert explained[0] > 0.0
+    assert explained[1] == 0.0
+
+def local_async_index(index):
+    """Returns AsyncIndex whose searches are answered by the local backend of ``index``,
+    and the list of sent search bodies.
+    """
+    async_index = AsyncIndex(index_name, concurrency = 2)
+    bodies = []
+
+    async def search(index, body, filter_path):
+        bodies.append(body)
+
+        hits = index_backend.search(
+                {
+                    'query': body['query']['bool']['must'],
+                    },
+                )['hits']['hits']
+
+        return {
+                'hits': {
+                    'hits': [
+                        { '_score': hit['_score'] }
+                        for hit in hits
+                        if hit['_id'] == body['query']['bool']['filter'][0]['ids']['values'][0]
+                        ],
+                    },
+                } if len(hits) > 0 else {}
+
+    index_backend = index.backend
+    async_index.es.search = search
+
+    return async_index, bodies
+
+def test_evaluate_population_cached():
+    from local_backend import LocalBackend
+
+    index = Index(index_name, backend = LocalBackend(index_name))
+    index.add_bulk(texts)
+
+    word = texts[0].split()[0]
+
+    queries = Queries(
+            queries = [
+                Query(musts = [ word ]),
+                Query(musts = [ word ]),
+                Query(musts = [ texts[1].split()[0] ]),
+                ],
+            words = [],
+            )
+
+    async def evaluate():
+        async_index, bodies = local_async_index(index)
+
+        async with async_index:
+            await async_index.evaluate_population(
+                    queries = queries,
+                    target_id = "1",
+                    index = index,
+                    )
+
+        return bodies
+
+    # Equal genotypes are requested once
+    assert len(asyncio.run(evaluate())) == 2
+    assert [ query.fitness for query in queries.queries ] \
+            == index.score_many(queries.queries, id = "1")
+    assert queries.queries[0].fitness > 0.0
+
+    # Cached scores are not requested again
+    assert len(asyncio.run(evaluate())) == 0
+
+def test_evaluate_population_columnar():
+    from local_backend import LocalBackend
+
+    index = Index(index_name, backend = LocalBackend(index_name))
+    index.add_bulk(texts)
+
+    query_list = [
+            Query(musts = [ texts[0].split()[0] ]),
+            Query(musts = [ texts[1].split()[0] ]),
+            ]
+
+    queries = ColumnarQueries(
+            queries = query_list,
+            words = [],
+            )
+
+    async def evaluate():
+        async_index, bodies = local_async_index(index)
+
+        async with async_index:
+            await async_index.evaluate_population(
+                    queries = queries,
+                    target_id = "1",
+                    )
+
+    asyncio.run(evaluate())
+
+    # Scores are written into the fitness column
+    assert queries.fitnesses().tolist() == index.score_many(query_list, id = "1")
+    assert queries.fitnesses()[0] > 0.0
+
+    with pytest.raises(TypeError):
+        asyncio.run(
+                AsyncIndex(index_name).evaluate_population(
+                    queries = queries,
+                    target_id = "1",
+                    explain = True,
+                    )
+                )
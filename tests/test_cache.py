@@ -0,0 +1,46 @@
+import pytest
+
+from cache import FitnessCache
+
+def test_get_put():
+    cache = FitnessCache(maxsize = 2)
+
+    assert cache.get("a") is None
+
+    cache.put("a", 1.0)
+
+    assert cache.get("a") == 1.0
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_lru_eviction():
+    cache = FitnessCache(maxsize = 2)
+
+    cache.put("a", 1.0)
+    cache.put("b", 2.0)
+
+    # Mark "a" as recently used, so "b" is evicted
+    cache.get("a")
+    cache.put("c", 3.0)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1.0
+    assert cache.get("c") == 3.0
+
+def test_disabled():
+    cache = FitnessCache(maxsize = 0)
+
+    cache.put("a", 1.0)
+
+    assert len(cache) == 0
+    assert cache.get("a") is None
+
+def test_clear():
+    cache = FitnessCache()
+
+    cache.put("a", 1.0)
+    cache.clear()
+
+    assert len(cache) == 0
+    assert cache.get("a") is None
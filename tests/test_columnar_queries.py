@@ -0,0 +1,227 @@
+import pytest
+
+import pickle
+
+from columnar_queries import ColumnarQueries, TermMatrix, _runs
+from queries import RecombinationMode, SelectionMode
+from query import Query
+from target_profile import TargetProfile
+
+from decorators import repeater
+
+def new_query_list():
+    return [
+            Query(
+                musts = [ "must11", "must12" ],
+                must_nots = [ "must_not11", "must_not12" ],
+                fitness = 1.1,
+                ),
+            Query(
+                musts = [ "must21", "must22" ],
+                must_nots = [ "must_not21", "must_not22" ],
+                fitness = 2.4,
+                ),
+            Query(
+                musts = [ "must31", "must32" ],
+                must_nots = [ "must_not31", "must_not32" ],
+                fitness = 3.7,
+                ),
+            ]
+
+def new_queries():
+    return ColumnarQueries(
+            queries = new_query_list(),
+            words = [ "word1", "word2", "word3", "word4", "word5" ],
+            )
+
+def strings(queries):
+    return [ str(query) for query in queries.queries ]
+
+def test_term_matrix():
+    matrix = TermMatrix()
+    matrix.append([1, 2])
+    matrix.append([])
+    matrix.append([3])
+
+    assert len(matrix) == 3
+    assert list(matrix.row(1)) == []
+    assert list(matrix.take([2, 0]).row(1)) == [1, 2]
+    assert [ list(matrix.doubled().row(i)) for i in range(6) ] \
+            == [ [1, 2], [], [3], [1, 2], [], [3] ]
+
+def test_term_matrix_take_runs():
+    matrix = TermMatrix()
+    for i in range(100):
+        matrix.append([i] * (i % 3))
+
+    indices = list(range(10, 40)) + [ 41, 43 ] + list(range(50, 90))
+
+    assert _runs(indices) == [ (10, 40), (41, 42), (43, 44), (50, 90) ]
+    assert _runs(list(range(0, 100, 2))) is None
+    assert _runs([]) == []
+
+    taken = matrix.take(indices, runs = _runs(indices))
+    assert [ list(taken.row(i)) for i in range(len(taken)) ] \
+            == [ list(matrix.row(i)) for i in indices ]
+
+def test_term_matrix_compacted():
+    matrix = TermMatrix()
+    for i in range(10):
+        matrix.append([i, i + 1])
+
+    compacted = matrix.take([7, 2]).compacted()
+
+    assert list(compacted.terms) == [7, 8, 2, 3]
+    assert compacted.n_terms() == 4
+    assert compacted.row_bytes() == [ matrix.row(7).tobytes(), matrix.row(2).tobytes() ]
+
+def test_queries_view():
+    queries = new_queries()
+
+    assert strings(queries) == [ str(query) for query in new_query_list() ]
+    assert queries.fitnesses().tolist() == [1.1, 2.4, 3.7]
+
+def test_average_score():
+    assert new_queries().average_score() == pytest.approx(2.4)
+
+def test_recombine_clone():
+    queries = new_queries()
+
+    queries.recombine(
+            mode = RecombinationMode.CLONE
+            )
+
+    assert strings(queries) == strings(new_queries()) * 2
+
+def test_recombine_union():
+    queries = new_queries()
+
+    queries.recombine(
+            mode = RecombinationMode.UNION
+            )
+
+    assert queries.size() == 6
+    assert all(
+            query.size() == 8
+            for query in queries.queries[3:]
+            )
+
+@repeater(5)
+def test_mutate():
+    queries = new_queries()
+
+    queries.mutate()
+
+    assert queries.size() == 3
+    assert all(
+            query.n_mutations == 1
+            for query in queries.queries
+            )
+
+def test_select():
+    queries = new_queries()
+
+    queries.select()
+
+    assert strings(queries) == strings(new_queries())[1:]
+
+@repeater(5)
+def test_random_purge():
+    queries = new_queries()
+
+    with pytest.raises(ValueError):
+        queries.random_purge(k = 4)
+
+    queries.random_purge(k = 2)
+
+    assert queries.size() == 1
+
+def test_remove_duplicates():
+    queries = new_queries()
+
+    queries.add(
+            Query(
+                musts = [ "must12", "must11" ],
+                must_nots = [ "must_not12", "must_not11" ],
+                )
+            )
+
+    queries.remove_duplicates()
+
+    assert strings(queries) == strings(new_queries())
+
+def test_evaluate_with_profile():
+    queries = new_queries()
+
+    queries.evaluate_with_profile(
+            TargetProfile(
+                {
+                    'must11': 1.0,
+                    'must12': 2.0,
+                    }
+                )
+            )
+
+    assert queries.fitnesses().tolist() == [3.0, 0.0, 0.0]
+
+def test_evaluate():
+    class ScoringIndex():
+        def score_genotypes(self, keys, body, id):
+            self.keys = keys
+            return [
+                    float(len(body(i)['query']['bool']['must']))
+                    for i in range(len(keys))
+                    ]
+
+    queries = new_queries()
+    queries.recombine(RecombinationMode.CLONE)
+    index = ScoringIndex()
+
+    queries.evaluate(index, target_id = 1)
+
+    assert index.keys == [ query.genotype_key() for query in queries.queries ]
+    assert queries.fitnesses().tolist() == [2.0] * 6
+
+def test_pickle():
+    queries = new_queries()
+
+    unpickled = pickle.loads(pickle.dumps(queries))
+
+    assert strings(unpickled) == strings(queries)
+    assert unpickled.fitnesses() == queries.fitnesses()
+
+def test_select_truncation():
+    queries = new_queries()
+
+    queries.select(
+            mode = SelectionMode.TRUNCATION,
+            k = 2,
+            )
+
+    assert queries.fitnesses().tolist() == [3.7, 2.4]
+
+def test_top():
+    assert [
+            query.fitness
+            for query in new_queries().top(2)
+            ] == [3.7, 2.4]
+
+def test_explain_top():
+    class ExplainingIndex():
+        def explain(self, query, id):
+            return {
+                    'matched': True,
+                    'explanation': {
+                        'value': query.fitness,
+                        'description': "sum of:",
+                        'details': [],
+                        },
+                    }
+
+    top = new_queries().explain_top(
+            index = ExplainingIndex(),
+            target_id = "1",
+            k = 2,
+            )
+
+    assert [ query.explanation['value'] for query in top ] == [3.7, 2.4]
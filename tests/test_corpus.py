@@ -0,0 +1,43 @@
+import pytest
+
+import corpus
+
+def write_file(tmp_path, content):
+    path = tmp_path / "language.txt"
+    path.write_bytes(content.encode("utf-8"))
+    return str(path)
+
+def test_lines(tmp_path):
+    path = write_file(tmp_path, "first line\nsecond  \n\nfourth äöü")
+
+    for use_mmap in [False, True]:
+        assert list(corpus.lines(path, use_mmap = use_mmap)) \
+                == ["first line", "second", "", "fourth äöü"]
+        assert list(corpus.lines(path, n_lines = 2, use_mmap = use_mmap)) \
+                == ["first line", "second"]
+
+def test_lines_empty_file(tmp_path):
+    path = write_file(tmp_path, "")
+
+    assert list(corpus.lines(path)) == []
+    assert list(corpus.lines(path, use_mmap = True)) == []
+
+def test_lines_are_streamed(tmp_path):
+    path = write_file(tmp_path, "a\nb\n")
+
+    lines = corpus.lines(path)
+
+    assert next(lines) == "a"
+    assert next(lines) == "b"
+    with pytest.raises(StopIteration):
+        next(lines)
+
+def test_fingerprint(tmp_path):
+    path = write_file(tmp_path, "a\nb\nc\n")
+    fingerprint = corpus.fingerprint(path)
+
+    assert fingerprint == corpus.fingerprint(path)
+    assert corpus.fingerprint(path, n_lines = 2) != fingerprint
+    assert corpus.fingerprint(path, n_lines = 2) \
+            == corpus.fingerprint(write_file(tmp_path, "a\nb\nd\n"), n_lines = 2)
+    assert corpus.fingerprint(path) != fingerprint
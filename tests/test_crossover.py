@@ -0,0 +1,39 @@
+import pytest
+
+from array import array
+
+import crossover
+
+from decorators import repeater
+
+a = array('I', [1, 3, 5])
+b = array('I', [2, 3, 6])
+
+def test_union():
+    assert crossover.union(a, b).tolist() == [1, 2, 3, 5, 6]
+
+def test_intersection():
+    assert crossover.intersection(a, b).tolist() == [3]
+
+@repeater(5)
+def test_uniform():
+    child = crossover.uniform(a, b).tolist()
+
+    assert 3 in child
+    assert child == sorted(child)
+    assert set(child) <= {1, 2, 3, 5, 6}
+
+@repeater(5)
+def test_one_point():
+    child = crossover.one_point(a, b).tolist()
+
+    assert child == sorted(child)
+    assert child in [
+            [2, 3, 6],
+            [1, 2, 3, 6],
+            [1, 3, 6],
+            [1, 3, 5, 6],
+            [1, 3, 5],
+            ]
+
+    assert crossover.one_point(array('I'), array('I')).tolist() == []
@@ -0,0 +1,106 @@
+import pytest
+
+import datetime
+
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
+
+import es_backend
+
+from es_backend import ESBackend, OrjsonSerializer
+
+def test_json_serializer():
+    assert type(es_backend.json_serializer("json")) is JSONSerializer
+
+    if es_backend.orjson is None:
+        assert type(es_backend.json_serializer()) is JSONSerializer
+
+        with pytest.raises(ImportError):
+            es_backend.json_serializer("orjson")
+
+        return
+
+    assert type(es_backend.json_serializer()) is OrjsonSerializer
+
+    serializer = OrjsonSerializer()
+    data = {
+            'query': { 'match': { 'full_text': "grün" } },
+            'date': datetime.date(2021, 6, 1),
+            }
+
+    assert serializer.dumps(data) == JSONSerializer().dumps(data)
+    assert serializer.loads(serializer.dumps(data)) \
+            == JSONSerializer().loads(JSONSerializer().dumps(data))
+
+    # Bulk lines are serialized already
+    assert serializer.dumps('{"index":{}}') == '{"index":{}}'
+
+    with pytest.raises(SerializationError):
+        serializer.loads("{")
+
+    with pytest.raises(SerializationError):
+        serializer.dumps({ 'set': { 1 } })
+
+def test_filtered_responses(monkeypatch):
+    backend = ESBackend("test_index")
+    requests = []
+
+    def perform_request(method, url, headers = None, params = None, body = None):
+        requests.append((url, params))
+
+        if url.endswith("/_mapping"):
+            # No fingerprint left after filtering
+            return {}
+
+        if url.endswith("/_msearch"):
+            return {
+                    'responses': [
+                        { 'status': 200, 'hits': { 'hits': [ { '_score': 1.5 } ] } },
+                        { 'status': 200 },
+                        ],
+                    }
+
+        return { 'found': True }
+
+    monkeypatch.setattr(backend.es.transport, "perform_request", perform_request)
+
+    assert backend.fingerprint() is None
+    assert backend.score_many([ { 'query': {} } ] * 2, id = "1") == [ 1.5, 0.0 ]
+    assert backend.term_weights("1") == {}
+    backend.get("1")
+    backend.search({ 'query': {} })
+    backend.random_document()
+
+    # Parameters are encoded by the client
+    assert [ params['filter_path'].decode("utf-8") for url, params in requests ] == [
+            "*.mappings._meta.fingerprint",
+            "responses.status,responses.error,responses." + es_backend.SCORE_FILTER_PATH,
+            es_backend.TERM_VECTORS_FILTER_PATH,
+            es_backend.GET_FILTER_PATH,
+            es_backend.SEARCH_FILTER_PATH,
+            es_backend.DOCUMENT_FILTER_PATH,
+            ]
+
+def test_is_single_token(monkeypatch):
+    backend = ESBackend("test_index")
+    requests = []
+
+    def perform_request(method, url, headers = None, params = None, body = None):
+        requests.append(body['text'])
+
+        # Like the standard analyzer, which splits CJK text into characters
+        return {
+                'tokens': [
+                    { 'token': token }
+                    for token in (list(body['text']) if body['text'] == "東京" else [ body['text'] ])
+                    ],
+                }
+
+    monkeypatch.setattr(backend.es.transport, "perform_request", perform_request)
+
+    assert backend.is_single_token("apple")
+    assert not backend.is_single_token("東京")
+    assert backend.is_single_token("apple")
+
+    # The index is asked once per term
+    assert requests == [ "apple", "東京" ]
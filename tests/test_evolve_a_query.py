@@ -0,0 +1,25 @@
+import pytest
+
+import pathlib
+import subprocess
+import sys
+
+root = pathlib.Path(__file__).parent.parent
+
+def run(*args):
+    return subprocess.run(
+            [ sys.executable, "evolve-a-query.py" ] + list(args),
+            cwd = root,
+            capture_output = True,
+            text = True,
+            )
+
+def test_reuse_index_requires_elasticsearch(tmp_path):
+    result = run(
+            "--backend", "local",
+            "--reuse-index", str(tmp_path),
+            str(tmp_path / "language.txt"),
+            )
+
+    assert result.returncode == 2
+    assert "--reuse-index requires --backend elasticsearch" in result.stderr
@@ -89,6 +89,43 @@ def test_add_bulk():
                     index.vocabulary.wordlist()
                     )
 
+def test_add_bulk_parallel():
+    from es_backend import ESBackend
+
+    index = Index(
+            index_name,
+            backend = ESBackend(
+                index_name,
+                bulk_chunk_size = 1,
+                bulk_threads = 2,
+                ),
+            )
+
+    assert index.add_bulk(texts) == (len(texts), [])
+    assert index.bulk_stats['documents'] == len(texts)
+
+    # Documents are searchable and settings are restored after the load
+    assert index.es.count(index = index_name)['count'] == len(texts)
+
+    settings = index.es.indices.get_settings(
+            index = index_name,
+            flat_settings = True,
+            )[index_name]['settings']
+
+    assert settings['index.number_of_replicas'] == "1"
+    assert 'index.refresh_interval' not in settings
+
+def test_load(tmp_path):
+    snapshot_dir = str(tmp_path)
+
+    assert not new_index().load(texts, "corpus", snapshot_dir)
+
+    index = Index(index_name, recreate = False)
+
+    assert index.load(iter([]), "corpus", snapshot_dir)
+    assert index.es.count(index = index_name)['count'] == len(texts)
+    assert len(index.vocabulary.wordlist()) > 0
+
 def test_search():
     index = new_index()
 
@@ -110,3 +147,56 @@ def test_search():
     assert len(result['hits']['hits']) == 1
 
 
+
+def test_score_many():
+    index = new_index()
+
+    index.es.index(
+            index = index_name,
+            id = 1,
+            refresh = "wait_for",
+            body = {
+                'full_text': texts[0]
+                },
+            )
+
+    queries = [
+            Query(
+                musts = [ texts[0].split()[0] ]
+                ),
+            Query(
+                musts = [ texts[1].split()[0] ]
+                ),
+            ]
+
+    scores = index.score_many(
+            queries = queries,
+            id = 1,
+            )
+
+    assert scores[0] == index.explain(queries[0], id = 1)['explanation']['value']
+    assert scores[1] == 0.0
+
+def test_target_profile():
+    index = new_index()
+
+    for id, text in enumerate(texts):
+        index.es.index(
+                index = index_name,
+                id = id,
+                refresh = "wait_for",
+                body = {
+                    'full_text': text
+                    },
+                )
+
+    queries = [
+            Query(
+                musts = text.split()[:2],
+                must_nots = [ "pariatur." ],
+                )
+            for text in texts
+            ]
+
+    assert index.target_profile(0).score_many(queries) \
+            == pytest.approx(index.score_many(queries, id = 0), rel = 1e-5)
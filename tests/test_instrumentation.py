@@ -0,0 +1,78 @@
+import pytest
+
+import instrumentation
+
+from instrumentation import Instrumentation
+
+def test_record():
+    metrics = Instrumentation()
+
+    with metrics.timer("phase"):
+        metrics.count("events")
+        metrics.count("events", 2)
+
+    with pytest.raises(ValueError):
+        with metrics.timer("phase"):
+            raise ValueError()
+
+    metrics.gauge("size", 10)
+
+    record = metrics.record(generation = 1)
+
+    assert record['generation'] == 1
+    assert record['calls'] == { 'phase': 2 }
+    assert record['seconds']['phase'] >= 0.0
+    assert record['counters'] == { 'events': 3 }
+    assert record['gauges'] == { 'size': 10 }
+    assert record['memory']['allocated_blocks'] > 0
+
+    # Records cover what was collected since the last record
+    record = metrics.record(generation = 2)
+
+    assert record['calls'] == {}
+    assert record['counters'] == {}
+
+def test_prometheus_text():
+    text = instrumentation.prometheus_text(
+            {
+                'generation': 3,
+                'seconds': { 'action.Gamma "Party"': 0.5 },
+                'calls': { 'action.Gamma "Party"': 1 },
+                'counters': { 'index.cache_hits': 7 },
+                'gauges': {},
+                'memory': { 'allocated_blocks': 100 },
+                }
+            )
+
+    lines = text.splitlines()
+
+    assert "# TYPE evolve_a_query_generation gauge" in lines
+    assert "evolve_a_query_generation 3.0" in lines
+    assert 'evolve_a_query_phase_seconds{name="action.Gamma \\"Party\\""} 0.5' in lines
+    assert 'evolve_a_query_events{name="index.cache_hits"} 7.0' in lines
+    assert 'evolve_a_query_memory{kind="allocated_blocks"} 100.0' in lines
+
+def test_index_instrumented():
+    from index import Index
+    from local_backend import LocalBackend
+    from query import Query
+
+    index = Index(
+            "test_index",
+            backend = LocalBackend("test_index"),
+            )
+    index.add_bulk([ "a b", "b c" ])
+
+    instrumentation.reset()
+
+    queries = [ Query(musts = [ "a" ]), Query(musts = [ "a" ]), Query(musts = [ "b" ]) ]
+    index.score_many(queries, id = "1")
+    index.score_many(queries, id = "1")
+
+    record = instrumentation.record()
+
+    assert record['counters']['index.backend_calls'] == 1
+    assert record['counters']['index.scored_queries'] == 2
+    assert record['counters']['index.cache_misses'] == 3
+    assert record['counters']['index.cache_hits'] == 3
+    assert record['calls']['index.score_many'] == 1
@@ -0,0 +1,113 @@
+import pytest
+
+import islands as islands_module
+from islands import Islands, ProfileEvaluator
+from queries import Queries, RecombinationMode
+from query import Query
+from strategy import FixedSequenceStrategy, GeneticAlgorithmStrategy
+from target_profile import TargetProfile
+
+words = [ "a", "b", "c", "d" ]
+
+profile = TargetProfile(
+        {
+            'a': 1.0,
+            'b': 2.0,
+            }
+        )
+
+def new_islands(n_islands = 2):
+    return Islands(
+            populations = [
+                Queries(
+                    queries = [
+                        Query(
+                            musts = [ words[i] ],
+                            fitness = float(i),
+                            )
+                        ],
+                    words = words,
+                    )
+                for i in range(n_islands)
+                ],
+            words = words,
+            evaluator = ProfileEvaluator(profile),
+            strategy = GeneticAlgorithmStrategy(
+                select = 1,
+                recombine = 0,
+                mutate = 3,
+                remove_duplicates = 4,
+                max_population = 20,
+                ),
+            max_workers = 2,
+            seed = 1,
+            )
+
+def test_migrate():
+    islands = new_islands()
+
+    islands.migrate()
+
+    assert [
+            sorted(str(query) for query in queries.queries)
+            for queries in islands.populations
+            ] == [ ["[+a]", "[+b]"], ["[+a]", "[+b]"] ]
+
+def test_evolve():
+    islands = new_islands()
+
+    epochs = list(
+            islands.evolve(
+                n_epochs = 2,
+                n_generations = 3,
+                )
+            )
+
+    assert epochs == [0, 1]
+    assert len(islands.populations) == 2
+
+    # Each island keeps at most max_population queries and receives one migrant
+    sizes = [ queries.size() for queries in islands.populations ]
+
+    assert all(1 <= size <= 20 + 1 for size in sizes)
+
+    best = islands.best()
+
+    assert best is not None
+    assert best.fitness > 0.0
+    assert best.fitness == TargetProfile({ 'a': 1.0, 'b': 2.0 }).score(best)
+
+    # Islands are seeded, so evolution is reproducible
+    islands = new_islands()
+    list(
+            islands.evolve(
+                n_epochs = 2,
+                n_generations = 3,
+                )
+            )
+
+    assert [ queries.size() for queries in islands.populations ] == sizes
+    assert str(islands.best()) == str(best)
+
+def test_evolve_island_recombination_mode():
+    islands_module._init_worker(
+            ProfileEvaluator(profile),
+            words,
+            None,
+            RecombinationMode.UNION,
+            )
+
+    try:
+        individuals = islands_module._evolve_island(
+                [ Query(musts = [ word ]) for word in words ],
+                FixedSequenceStrategy([0]),
+                1,
+                1,
+                )
+    finally:
+        islands_module._init_worker(None, None, None, RecombinationMode.CLONE)
+
+    # Workers return bare queries, cross-bred with the configured mode instead of cloned
+    assert all(isinstance(query, Query) for query in individuals)
+    assert len(individuals) == 2 * len(words)
+    assert any(query.size() == 2 for query in individuals[len(words):])
@@ -0,0 +1,253 @@
+import pytest
+
+import math
+
+from index import Index
+from local_backend import LocalBackend, lossy_length
+from query import Query
+
+index_name = "test_index"
+
+texts = [
+        "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
+        "Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.",
+        "Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur.",
+        "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.",
+        ]
+
+def new_index():
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            )
+
+    index.add_bulk(texts)
+
+    return index
+
+def bm25(freq, n, N, dl, avgdl):
+    return 2.2 \
+            * math.log(1 + (N - n + 0.5) / (n + 0.5)) \
+            * freq / (freq + 1.2 * (1 - 0.75 + 0.75 * dl / avgdl))
+
+def test_analyzed():
+    assert LocalBackend.analyzed("Lorem ipsum, dolor-sit AMET.") \
+            == ["lorem", "ipsum", "dolor", "sit", "amet"]
+
+def test_is_single_token():
+    assert LocalBackend.is_single_token("Lorem")
+    assert not LocalBackend.is_single_token("dolor-sit")
+    assert not LocalBackend.is_single_token("...")
+
+def test_lossy_length():
+    assert [ lossy_length(i) for i in range(24) ] == list(range(24))
+    assert lossy_length(100) == 96
+    assert lossy_length(1000) == 984
+
+def test_add():
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            )
+
+    result = index.add(texts[0])
+
+    assert result['_index'] == index_name
+    assert result['_shards']['failed'] == 0
+    assert index.get(result['_id'])['_source']['full_text'] == texts[0]
+
+def test_add_bulk():
+    index = new_index()
+
+    result = index.backend.search({ 'size': 10 })
+
+    assert result['hits']['total']['value'] == len(texts)
+    assert sorted(
+            [
+                hit['_source']['full_text']
+                for hit in result['hits']['hits']
+                ]
+            ) == sorted(texts)
+
+def test_add_bulk_stream():
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            record_documents = True,
+            )
+
+    assert index.add_bulk(
+            text
+            for text in texts
+            ) == (len(texts), [])
+    assert index.vocabulary.n_documents() == len(texts)
+    assert index.bulk_stats['documents'] == len(texts)
+    assert index.bulk_stats['bytes'] == sum(len(text) for text in texts)
+    assert index.bulk_stats['documents_per_second'] > 0
+    assert index.backend.search({ 'size': 10 })['hits']['total']['value'] == len(texts)
+
+def test_load(tmp_path):
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            record_documents = True,
+            )
+    snapshot_dir = str(tmp_path / "snapshots")
+
+    assert not index.load(texts, "corpus", snapshot_dir)
+    wordlist = sorted(index.vocabulary.wordlist())
+
+    # Texts are not consumed when the index is reused
+    assert index.load(iter([]), "corpus", snapshot_dir)
+    assert index.vocabulary.wordlist() == wordlist
+    assert index.backend.search({ 'size': 10 })['hits']['total']['value'] == len(texts)
+
+    assert not index.load(texts[:1], "other corpus", snapshot_dir)
+    assert index.backend.search({ 'size': 10 })['hits']['total']['value'] == 1
+    assert index.vocabulary.n_documents() == 1
+
+    # Snapshots without documents are kept apart
+    index = Index(
+            index_name,
+            backend = index.backend,
+            recreate = False,
+            )
+
+    assert not index.load(texts[:1], "other corpus", snapshot_dir)
+    assert index.vocabulary.n_documents() == 0
+    assert index.load(iter([]), "other corpus", snapshot_dir)
+    assert index.vocabulary.n_documents() == 0
+
+def test_load_new_backend(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+
+    assert not Index(index_name, backend = LocalBackend(index_name)) \
+            .load(texts, "corpus", snapshot_dir)
+
+    # The index lives in memory only, so a new backend cannot reuse it despite the snapshot
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            recreate = False,
+            )
+
+    assert not index.load(texts, "corpus", snapshot_dir)
+    assert index.backend.search({ 'size': 10 })['hits']['total']['value'] == len(texts)
+
+def test_search():
+    index = new_index()
+
+    result = index.search(
+            Query(
+                musts = [ "dolor" ],
+                must_nots = [ "Duis" ],
+                )
+            )
+
+    assert [ hit['_id'] for hit in result['hits']['hits'] ] == [ "1" ]
+
+def test_explain_bm25():
+    index = new_index()
+
+    lengths = [
+            len(LocalBackend.analyzed(text))
+            for text in texts
+            ]
+    avgdl = sum(lengths) / len(lengths)
+
+    result = index.explain(
+            Query(
+                musts = [ "dolor", "in" ],
+                ),
+            id = "3",
+            )
+
+    assert result['matched']
+    assert result['explanation']['value'] == pytest.approx(
+            bm25(1, 2, 4, lengths[2], avgdl) \
+                    + bm25(2, 2, 4, lengths[2], avgdl)
+            )
+
+def test_explain_no_match():
+    index = new_index()
+
+    result = index.explain(
+            Query(
+                musts = [ "dolor" ],
+                must_nots = [ "in" ],
+                ),
+            id = "3",
+            )
+
+    assert not result['matched']
+    assert result['explanation']['value'] == 0.0
+
+def test_score_many():
+    index = new_index()
+
+    queries = [
+            Query(musts = [ "dolor" ]),
+            Query(musts = [ "dolor" ], must_nots = [ "ipsum" ]),
+            Query(musts = [ "dolor", "in" ]),
+            Query(must_nots = [ "veniam" ]),
+            ]
+
+    scores = index.score_many(
+            queries = queries,
+            id = "1",
+            )
+
+    assert scores[0] == index.explain(queries[0], id = "1")['explanation']['value']
+    assert scores[1:] == [0.0, 0.0, 0.0]
+
+def test_score_compact_body():
+    index = new_index()
+
+    queries = [
+            Query(musts = ["dolor"]),
+            Query(musts = ["dolor", "in"], must_nots = ["magna"]),
+            Query(musts = ["dolor", "lorem"]),
+            Query(musts = ["ut"], must_nots = ["enim", "lorem"]),
+            # Split by the analyzer
+            Query(musts = ["dolor", "lorem-ipsum"]),
+            Query(musts = ["dolor-magna"], must_nots = ["ipsum-xyz"]),
+            ]
+
+    for id in ["1", "2", "3"]:
+        assert index.backend.score_many(
+                [
+                    Query.render_body(query._musts, query._must_nots, compact = index.backend.is_single_token)
+                    for query in queries
+                    ],
+                id = id,
+                ) == index.backend.score_many(
+                [
+                    Query.render_body(query._musts, query._must_nots)
+                    for query in queries
+                    ],
+                id = id,
+                )
+
+def test_score_many_cached():
+    index = new_index()
+
+    queries = [
+            Query(musts = [ "dolor", "ipsum" ]),
+            Query(musts = [ "ipsum", "dolor" ]),
+            Query(musts = [ "sit" ]),
+            ]
+
+    scores = index.score_many(queries, id = "1")
+
+    assert scores[0] == scores[1]
+    assert index.fitness_cache.misses == 3
+    assert len(index.fitness_cache) == 2
+
+    assert index.score_many(queries, id = "1") == scores
+    assert index.fitness_cache.hits == 3
+
+    # New document changes term statistics
+    index.add(texts[0])
+
+    assert len(index.fitness_cache) == 0
+    assert index.score_many(queries, id = "1") != scores
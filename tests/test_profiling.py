@@ -0,0 +1,102 @@
+import json
+import pstats
+import sys
+import tracemalloc
+
+import profiling
+
+from columnar_queries import ColumnarQueries
+from profiling import Profiler, ProfileMode
+from queries import Queries
+from query import Query
+
+def new_queries(population_class=Queries):
+    return population_class(
+            queries = [
+                Query(musts = [ "a", "b" ], must_nots = [ "c" ]),
+                Query(musts = [ "b" ]),
+                ],
+            words = [ "a", "b", "c", "d" ],
+            )
+
+def test_deep_size():
+    shared = [ 1.5 ] * 100
+    twice = [ shared, shared ]
+
+    # Shared objects are counted once
+    assert profiling.deep_size(twice) \
+            == sys.getsizeof(twice) + profiling.deep_size(shared)
+
+    assert profiling.deep_size({ 'a': shared }, exclude = [ shared ]) \
+            == profiling.deep_size({ 'a': None }) - profiling.deep_size(None)
+
+def test_population_memory():
+    queries = new_queries()
+
+    usage = profiling.population_memory(queries)
+
+    assert usage['size'] == 2
+    assert usage['bytes'] > 0
+    assert usage['explanations'] == 0
+    assert usage['explanation_bytes'] == 0
+
+    queries.queries[0].update_with_explanation(
+            {
+                'explanation': {
+                    'value': 1.0,
+                    'description': "sum of:",
+                    'details': [],
+                    },
+                }
+            )
+
+    retained = profiling.population_memory(queries)
+
+    assert retained['explanations'] == 1
+    assert retained['explanation_bytes'] > 0
+    assert retained['bytes'] >= usage['bytes'] + retained['explanation_bytes']
+
+    queries.recombine()
+
+    assert profiling.population_memory(queries)['size'] == 4
+
+def test_population_memory_columnar():
+    usage = profiling.population_memory(new_queries(ColumnarQueries))
+
+    assert usage['size'] == 2
+    assert usage['bytes'] > 0
+    assert 'explanations' not in usage
+
+def test_profiler_cpu(tmp_path):
+    with Profiler(ProfileMode.CPU, tmp_path, top_n = 5) as profiler:
+        for generation in range(2):
+            new_queries().recombine()
+            profiler.snapshot(generation)
+
+    assert (tmp_path / "generation-0000.pstats").exists()
+    assert (tmp_path / "generation-0001.pstats").exists()
+    assert "recombine" in (tmp_path / "cpu.txt").read_text()
+
+    stats = pstats.Stats(str(tmp_path / "cpu.pstats"))
+
+    assert stats.total_calls > 0
+
+def test_profiler_memory(tmp_path):
+    with Profiler(ProfileMode.MEMORY, tmp_path, top_n = 5) as profiler:
+        retained = []
+
+        for generation in range(2):
+            queries = new_queries()
+            retained.append([ bytearray(10000) for _ in range(10) ])
+            profiler.snapshot(generation, [ queries ])
+
+    assert not tracemalloc.is_tracing()
+
+    with open(tmp_path / "memory.jsonl") as file:
+        reports = [ json.loads(line) for line in file ]
+
+    assert [ report['generation'] for report in reports ] == [ 0, 1 ]
+    assert reports[1]['populations'][0]['size'] == 2
+    assert len(reports[1]['top_sites']) <= 5
+    assert reports[1]['top_growth'][0]['bytes_diff'] >= 100000
+    assert "test_profiling.py" in reports[1]['top_growth'][0]['site']
@@ -0,0 +1,117 @@
+import pytest
+
+from array import array
+
+from proposal import PROPOSALS, CooccurrenceProposal, IdfProposal, ProposalMode
+from queries import Queries
+from query import Query
+from vocabulary import Vocabulary
+
+from decorators import repeater
+
+texts = [
+        "apple banana",
+        "apple cherry",
+        "apple date",
+        "elderberry fig",
+        ]
+
+def new_vocabulary():
+    vocabulary = Vocabulary(record_documents = True)
+
+    for text in texts:
+        vocabulary.add_words_from(text)
+
+    return vocabulary
+
+def term_ids(words):
+    return array(
+            'I',
+            sorted(
+                [
+                    Vocabulary.term_id(word)
+                    for word in words
+                    ]
+                )
+            )
+
+@repeater(5)
+def test_proposals():
+    vocabulary = new_vocabulary()
+
+    for mode in ProposalMode:
+        proposal = PROPOSALS[mode](vocabulary)
+
+        assert proposal(term_ids(["apple"])) in vocabulary.wordlist()
+        assert proposal(term_ids([]), without = { "apple", "banana", "cherry", "date", "elderberry" }) == "fig"
+        assert proposal(term_ids([]), without = set(vocabulary.wordlist())) is None
+
+def test_idf_proposal():
+    proposal = IdfProposal(new_vocabulary())
+    draws = [ proposal(term_ids([])) for _ in range(2000) ]
+
+    # "apple" occurs in most documents and is least discriminative
+    assert draws.count("apple") < draws.count("fig")
+
+@repeater(5)
+def test_cooccurrence_proposal():
+    proposal = CooccurrenceProposal(new_vocabulary())
+
+    assert proposal(term_ids(["elderberry"]), without = { "elderberry" }) == "fig"
+    assert proposal(term_ids(["banana"]), without = { "banana" }) == "apple"
+    assert proposal(term_ids(["cherry", "date"]), without = { "cherry", "date" }) == "apple"
+
+def test_refresh_after_add_words():
+    vocabulary = new_vocabulary()
+    proposal = CooccurrenceProposal(vocabulary)
+
+    proposal(term_ids(["fig"]))
+    vocabulary.add_words_from("fig grape")
+
+    assert proposal(term_ids(["grape"]), without = { "grape" }) == "fig"
+
+@repeater(5)
+def test_mutate_with_proposal():
+    vocabulary = new_vocabulary()
+
+    queries = Queries(
+            queries = [
+                Query(
+                    musts = [ "elderberry" ],
+                    )
+                for _ in range(10)
+                ],
+            words = vocabulary.wordlist(),
+            proposal = CooccurrenceProposal(vocabulary),
+            )
+
+    queries.mutate()
+
+    assert all(
+            set(query._musts + query._must_nots) <= { "elderberry", "fig" }
+            for query in queries.queries
+            )
+
+@repeater(5)
+def test_mutate_with_proposal_keeps_kinds_apart():
+    vocabulary = new_vocabulary()
+
+    queries = Queries(
+            queries = [
+                Query(
+                    musts = [ "elderberry" ],
+                    must_nots = [ "fig" ],
+                    )
+                for _ in range(10)
+                ],
+            words = vocabulary.wordlist(),
+            proposal = CooccurrenceProposal(vocabulary),
+            )
+
+    for _ in range(5):
+        queries.mutate()
+
+        assert all(
+                set(query._musts).isdisjoint(query._must_nots)
+                for query in queries.queries
+                )
@@ -1,6 +1,7 @@
 import pytest
 
-from queries import Queries, RecombinationMode
+from queries import EvaluationMode, Queries, RecombinationMode, SelectionMode
+from target_profile import TargetProfile
 from query import Query
 
 from decorators import repeater
@@ -83,6 +84,49 @@ def test_recombine_clone():
                 )
             ) == size_original
 
+def test_recombine_clone_shares_terms():
+    queries = new_queries()
+
+    queries.recombine(
+            mode = RecombinationMode.CLONE
+            )
+
+    for query, clone in zip(queries.queries[:3], queries.queries[3:]):
+        assert clone is not query
+        assert clone._must_ids is query._must_ids
+
+@repeater(5)
+def test_recombine_crossover():
+    for mode in [
+            RecombinationMode.UNIFORM,
+            RecombinationMode.ONE_POINT,
+            RecombinationMode.UNION,
+            ]:
+        queries = new_queries()
+
+        queries.recombine(
+                mode = mode
+                )
+
+        # Children without terms are discarded, which only union rules out
+        if mode == RecombinationMode.UNION:
+            assert queries.size() == 6
+        else:
+            assert 3 <= queries.size() <= 6
+        assert all(
+                query.size() > 0
+                for query in queries.queries
+                )
+
+def test_recombine_intersection_discards_empty_children():
+    queries = new_queries()
+
+    queries.recombine(
+            mode = RecombinationMode.INTERSECTION
+            )
+
+    assert queries.size() == 3
+
 @repeater(5)
 def test_mutate():
     queries = new_queries()
@@ -208,3 +252,149 @@ def test_remove_duplicates():
                 )
             ) == len(queries.queries)
 
+
+def test_remove_duplicates_ignores_term_order():
+    queries = new_queries()
+
+    queries.queries.append(
+            Query(
+                musts = [
+                    "must12",
+                    "must11",
+                    ],
+                must_nots = [
+                    "must_not12",
+                    "must_not11",
+                    ],
+                )
+            )
+
+    queries.remove_duplicates()
+
+    assert len(queries.queries) == 3
+    assert queries.queries[0].fitness == 1.1
+
+def test_evaluate():
+    class ConstantIndex():
+        def score_many(self, queries, id):
+            return [
+                    float(i) + 0.5
+                    for i in range(len(queries))
+                    ]
+
+    queries = new_queries()
+
+    queries.evaluate(
+            index = ConstantIndex(),
+            target_id = "1",
+            )
+
+    assert [
+            query.fitness
+            for query in queries.queries
+            ] == [0.5, 1.5, 2.5]
+
+def test_evaluate_profile():
+    class ProfileIndex():
+        def target_profile(self, id):
+            return TargetProfile(
+                    {
+                        'must11': 1.0,
+                        'must12': 2.0,
+                        }
+                    )
+
+    queries = new_queries()
+
+    queries.evaluate(
+            index = ProfileIndex(),
+            target_id = "1",
+            mode = EvaluationMode.PROFILE,
+            )
+
+    assert [
+            query.fitness
+            for query in queries.queries
+            ] == [3.0, 0.0, 0.0]
+
+class ExplainingIndex():
+    def __init__(self):
+        self.explained = []
+
+    def explain(self, query, id):
+        self.explained.append(str(query))
+
+        return {
+                'matched': True,
+                'explanation': {
+                    'value': query.fitness,
+                    'description': "sum of:",
+                    'details': [],
+                    },
+                }
+
+def test_explain_top():
+    queries = new_queries()
+    index = ExplainingIndex()
+
+    top = queries.explain_top(
+            index = index,
+            target_id = "1",
+            k = 2,
+            )
+
+    assert top == queries.top(2)
+    assert index.explained == [ str(query) for query in top ]
+    assert top[0].explanation['value'] == 3.7
+    assert queries.queries[0].explanation is None
+
+    # Explanations of queries that fell out of the top are dropped
+    queries.queries[2].fitness = 0.0
+
+    top = queries.explain_top(
+            index = index,
+            target_id = "1",
+            k = 1,
+            )
+
+    assert [
+            query.explanation is not None
+            for query in queries.queries
+            ] == [False, True, False]
+    assert queries.queries[2].fitness == 0.0
+
+def test_select_truncation():
+    queries = new_queries()
+
+    queries.select(
+            mode = SelectionMode.TRUNCATION,
+            k = 2,
+            )
+
+    assert [
+            query.fitness
+            for query in queries.queries
+            ] == [3.7, 2.4]
+
+@repeater(5)
+def test_select_tournament_copies_repeated_queries():
+    queries = new_queries()
+
+    queries.select(
+            mode = SelectionMode.TOURNAMENT,
+            k = 10,
+            n_elites = 1,
+            )
+
+    # Elite is added unless a tournament selected it already
+    assert queries.size() in [10, 11]
+    assert 3.7 in queries.fitnesses()
+    assert len(set(map(id, queries.queries))) == queries.size()
+
+def test_top():
+    queries = new_queries()
+
+    assert queries.top(2) == [
+            queries.queries[2],
+            queries.queries[1],
+            ]
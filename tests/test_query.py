@@ -1,9 +1,14 @@
 import pytest
 
+import copy
+import pickle
 import random
 
 random.seed(10)
 
+import crossover
+
+from local_backend import LocalBackend
 from query import Query
 
 from decorators import repeater
@@ -97,7 +102,211 @@ def test_update_fitness():
 
     assert query.fitness == 0.0
 
+def test_update_with_score():
+    query = new_query()
+
+    query.update_with_explanation(
+            {
+                'explanation': {
+                    'value': 1.5,
+                    },
+                }
+            )
+
+    assert query.explanation == { 'value': 1.5 }
+
+    query.update_with_score(0.25)
+
+    assert query.fitness == 0.25
+    assert query.explanation is None
+
+def test_genotype():
+    assert Query(
+            musts = ["b", "a"],
+            must_nots = ["d", "c"],
+            ).genotype() \
+            == Query(
+                    musts = ["a", "b"],
+                    must_nots = ["c", "d"],
+                    ).genotype()
+
+    assert Query(musts = ["a"]).genotype() \
+            != Query(must_nots = ["a"]).genotype()
+
+def test_genotype_key():
+    query = Query(
+            musts = ["a", "b"],
+            must_nots = ["c"],
+            )
+
+    assert query.genotype_key() \
+            == Query(
+                    musts = ["b", "a"],
+                    must_nots = ["c"],
+                    ).genotype_key()
+
+    assert query.genotype_key() \
+            != Query(
+                    musts = ["a"],
+                    must_nots = ["b", "c"],
+                    ).genotype_key()
+
+    key = query.genotype_key()
+
+    while query.genotype_key() == key:
+        query.mutate(words = ["d"])
+
+    assert query.genotype_key() \
+            == Query.genotype_key_of(query._must_ids, query._must_not_ids)
+
+def test_compact_genotype():
+    query = new_query()
+
+    assert not hasattr(query, '__dict__')
+    assert query._musts == ["must1", "must2"]
+    assert list(query._must_ids) == sorted(query._must_ids)
+    assert new_query_halfempty()._must_not_ids is Query()._must_ids
+
+def test_body():
+    assert new_query_halfempty().body == {
+            'query': {
+                'bool': {
+                    'must': [
+                        { 'match': { 'full_text': "must1" } },
+                        { 'match': { 'full_text': "must2" } },
+                        ],
+                    'must_not': [],
+                    }
+                }
+            }
+
+def test_body_cached():
+    query = new_query()
+    body = query.body
+
+    assert query.body is body
+
+    query.mutate(
+            words = [
+                "foo",
+                ]
+            )
+
+    assert query.body is not body
+    assert query.body == Query.render_body(query._musts, query._must_nots)
+
+def test_compact_body():
+    query = new_query()
+
+    Query.compact_body = LocalBackend.is_single_token
+    try:
+        assert query.body == {
+                'query': {
+                    'bool': {
+                        'must': [
+                            { 'match': { 'full_text': { 'query': "must1 must2", 'operator': "and" } } },
+                            ],
+                        'must_not': [
+                            { 'match': { 'full_text': "must_not1 must_not2" } },
+                            ],
+                        }
+                    }
+                }
+    finally:
+        Query.compact_body = None
+
+    assert query.body == Query.render_body(query._musts, query._must_nots)
+
+def test_compact_body_multi_token_terms():
+    body = Query.render_body(
+            musts = [ "must1", "lorem-ipsum", "must2", "東京" ],
+            must_nots = [ "dolor-sit" ],
+            compact = lambda term: term.startswith("must"),
+            )
+
+    # Terms the index splits into several tokens keep their own clause,
+    # whichever analyzer tells them apart
+    assert body['query']['bool']['must'] == [
+            { 'match': { 'full_text': { 'query': "must1 must2", 'operator': "and" } } },
+            { 'match': { 'full_text': "lorem-ipsum" } },
+            { 'match': { 'full_text': "東京" } },
+            ]
+    assert body['query']['bool']['must_not'] == [
+            { 'match': { 'full_text': "dolor-sit" } },
+            ]
+
+    assert Query.render_body([ "lorem-ipsum" ], [], compact = LocalBackend.is_single_token) \
+            == Query.render_body([ "lorem-ipsum" ], [])
+
+@repeater(5)
+def test_mutate_does_not_modify_shared_terms():
+    query = new_query()
+    other = copy.copy(query)
+
+    query.mutate(
+            words = [
+                "foo",
+                "bar",
+                ]
+            )
+
+    assert other._musts == ["must1", "must2"]
+    assert other._must_nots == ["must_not1", "must_not2"]
+
+@repeater(5)
+def test_clone():
+    query = new_query()
+    query.update_with_explanation(
+            {
+                'explanation': {
+                    'value': 1.5,
+                    },
+                }
+            )
+
+    clone = query.clone()
+
+    assert clone is not query
+    assert clone._must_ids is query._must_ids
+    assert clone._last_explanation is None
+    assert clone.fitness == 1.5
+    assert clone.genotype_key() == query.genotype_key()
+
+    clone.mutate(
+            words = [
+                "foo",
+                ]
+            )
+
+    assert str(query) == "[+must1,+must2,-must_not1,-must_not2]"
+
+def test_pickle():
+    query = new_query()
+    query.fitness = 0.5
+    query.n_mutations = 2
+
+    unpickled = pickle.loads(pickle.dumps(query))
+
+    assert str(unpickled) == str(query)
+    assert unpickled.fitness == 0.5
+    assert unpickled.n_mutations == 2
+
 def test_recombine():
-    # TODO
-    pass
+    query = new_query()
+
+    child = query.recombine(
+            Query(
+                musts = [
+                    "must2",
+                    "must3",
+                    ],
+                ),
+            operator = crossover.union,
+            )
+
+    assert str(child) == "[+must1,+must2,+must3,-must_not1,-must_not2]"
+    assert child.fitness == 0.0
+
+    # Parent arrays are not modified
+    assert str(query) == "[+must1,+must2,-must_not1,-must_not2]"
 
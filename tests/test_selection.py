@@ -0,0 +1,43 @@
+import pytest
+
+import selection
+
+from decorators import repeater
+
+fitnesses = [0.5, 0.1, 2.0, 0.1, 1.0]
+
+def test_without_lowest():
+    assert selection.without_lowest(fitnesses) == [0, 2, 4]
+    assert selection.without_lowest([1.0, 1.0]) == []
+    assert selection.without_lowest([]) == []
+
+def test_truncation():
+    assert selection.truncation(fitnesses, 2) == [2, 4]
+    assert selection.truncation(fitnesses, 10) == [2, 4, 0, 1, 3]
+
+@repeater(5)
+def test_tournament():
+    selected = selection.tournament(fitnesses, 100, size = 2)
+
+    assert len(selected) == 100
+    # The least fit individuals can only win against each other
+    assert all(
+            i in [0, 2, 4] or fitnesses[i] == 0.1
+            for i in selected
+            )
+
+    assert set(selection.tournament(fitnesses, 10, size = 100)) == {2}
+
+@repeater(5)
+def test_roulette():
+    selected = selection.roulette([0.0, 1.0, 0.0, 3.0], 100)
+
+    assert len(selected) == 100
+    assert set(selected) <= {1, 3}
+
+    assert len(selection.roulette([0.0, 0.0], 10)) == 10
+
+def test_with_elites():
+    assert selection.with_elites([1, 3], fitnesses, 2) == [2, 4, 1, 3]
+    assert selection.with_elites([2, 1], fitnesses, 2) == [4, 2, 1]
+    assert selection.with_elites([1], fitnesses, 0) == [1]
@@ -0,0 +1,119 @@
+import pytest
+
+from action import Action, evolutionary_actions
+from queries import Queries, RecombinationMode, SelectionMode
+from query import Query
+from strategy import FixedSequenceStrategy, GeneticAlgorithmStrategy, WeightedRandomStrategy
+
+from decorators import repeater
+
+def new_queries(fitnesses):
+    return Queries(
+            queries = [
+                Query(
+                    musts = [ "must" + str(i) ],
+                    fitness = fitness,
+                    )
+                for i, fitness in enumerate(fitnesses)
+                ],
+            words = [ "word1", "word2" ],
+            )
+
+def new_actions(n = 5):
+    return [
+            Action(
+                title = str(i),
+                descr = "",
+                func = lambda: None,
+                )
+            for i in range(n)
+            ]
+
+def titles(actions):
+    return [ action.title for action in actions ]
+
+def test_fixed_sequence():
+    strategy = FixedSequenceStrategy([2, 0])
+    actions = new_actions()
+
+    assert [
+            titles(strategy.actions(generation, new_queries([]), actions))
+            for generation in range(3)
+            ] == [ ["2"], ["0"], ["2"] ]
+
+@repeater(5)
+def test_weighted_random():
+    strategy = WeightedRandomStrategy([0, 0, 1, 0, 0])
+
+    assert titles(
+            strategy.actions(0, new_queries([]), new_actions())
+            ) == ["2"]
+
+def test_genetic_algorithm():
+    strategy = GeneticAlgorithmStrategy(
+            select = 1,
+            recombine = 0,
+            mutate = 3,
+            remove_duplicates = 4,
+            )
+    actions = new_actions()
+
+    assert titles(
+            strategy.actions(0, new_queries([1.0, 2.0]), actions)
+            ) == ["1", "0", "3", "4"]
+
+    # Selection would remove all equally fit queries
+    assert titles(
+            strategy.actions(0, new_queries([1.0, 1.0]), actions)
+            ) == ["0", "3", "4"]
+
+def test_genetic_algorithm_max_population():
+    strategy = GeneticAlgorithmStrategy(
+            select = 1,
+            recombine = 0,
+            mutate = 3,
+            remove_duplicates = 4,
+            max_population = 2,
+            )
+    queries = new_queries([1.0, 1.0, 1.0, 1.0])
+
+    strategy.actions(0, queries, new_actions())[-1].func()
+
+    assert queries.size() == 2
+
+def test_genetic_algorithm_selection_mode():
+    strategy = GeneticAlgorithmStrategy(
+            select = 1,
+            recombine = 0,
+            mutate = 3,
+            remove_duplicates = 4,
+            selection_mode = SelectionMode.TRUNCATION,
+            )
+    queries = new_queries([1.0, 1.0, 2.0, 3.0])
+
+    steps = strategy.actions(0, queries, new_actions())
+
+    assert titles(steps)[1:] == ["0", "3", "4"]
+
+    steps[0].func()
+
+    assert queries.fitnesses() == [3.0, 2.0]
+
+def test_evolutionary_actions_recombination_mode():
+    queries = new_queries([1.0, 2.0])
+
+    evolutionary_actions(queries)[0].func()
+
+    assert [ str(query) for query in queries.queries[2:] ] \
+            == [ str(query) for query in queries.queries[:2] ]
+
+    queries = new_queries([1.0, 2.0])
+
+    evolutionary_actions(
+            queries,
+            recombination_mode = RecombinationMode.UNION,
+            )[0].func()
+
+    # Each child of the two queries holds both terms
+    assert [ str(query) for query in queries.queries[2:] ] \
+            == [ str(Query(musts = [ "must0", "must1" ])) ] * 2
@@ -0,0 +1,90 @@
+import pytest
+
+import pickle
+import random
+
+from index import Index
+from local_backend import LocalBackend
+from query import Query
+from target_profile import TargetProfile
+
+from decorators import repeater
+
+index_name = "test_index"
+
+texts = [
+        "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.",
+        "Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.",
+        "Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu fugiat nulla pariatur.",
+        "Excepteur sint occaecat cupidatat non proident, sunt in culpa qui officia deserunt mollit anim id est laborum.",
+        ]
+
+def new_index():
+    index = Index(
+            index_name,
+            backend = LocalBackend(index_name),
+            )
+
+    index.add_bulk(texts)
+
+    return index
+
+def test_score():
+    profile = TargetProfile(
+            {
+                'a': 1.0,
+                'b': 0.5,
+                }
+            )
+
+    assert profile.score(Query(musts = ["a", "B"])) == 1.5
+    assert profile.score(Query(musts = ["a", "c"])) == 0.0
+    assert profile.score(Query(musts = ["a"], must_nots = ["b"])) == 0.0
+    assert profile.score(Query(musts = ["a"], must_nots = ["c"])) == 1.0
+    assert profile.score(Query(must_nots = ["c"])) == 0.0
+
+def test_pickle():
+    profile = TargetProfile(
+            {
+                'a': 1.0,
+                'b': 0.5,
+                }
+            )
+    query = Query(musts = ["a", "b"])
+
+    assert profile.score(query) == 1.5
+
+    # Term IDs differ between processes, so the memo by term ID is not sent along
+    other = pickle.loads(pickle.dumps(profile))
+
+    assert other._term_id_weights == {}
+    assert other._word_weights == profile._word_weights
+    assert other.score(query) == 1.5
+
+@repeater(5)
+def test_score_many_matches_backend():
+    index = new_index()
+
+    words = index.vocabulary.wordlist()
+
+    queries = [
+            Query(
+                musts = random.sample(words, random.randrange(3)),
+                must_nots = random.sample(words, random.randrange(2)),
+                )
+            for _ in range(50)
+            ]
+
+    assert index.target_profile("3").score_many(queries) \
+            == pytest.approx(index.score_many(queries, id = "3"))
+
+def test_target_profile_invalidated_by_add():
+    index = new_index()
+
+    profile = index.target_profile("1")
+
+    assert index.target_profile("1") is profile
+
+    index.add(texts[0])
+
+    assert index.target_profile("1") is not profile
@@ -0,0 +1,158 @@
+import pytest
+
+import pickle
+import random
+
+from alias_table import AliasTable
+from vocabulary import Vocabulary, random_element
+
+from decorators import repeater
+
+def new_vocabulary():
+    return Vocabulary(
+            words = [ "a" ] * 90 + [ "b" ] * 9 + [ "c" ]
+            )
+
+def test_alias_table():
+    table = AliasTable([ 0.0, 3.0, 1.0 ])
+    draws = [ table.draw() for _ in range(4000) ]
+
+    assert len(table) == 3
+    assert draws.count(0) == 0
+    assert 2500 < draws.count(1) < 3500
+
+    with pytest.raises(ValueError):
+        AliasTable([ 0.0 ])
+
+@repeater(5)
+def test_random_element():
+    assert random_element([ 1, 2, 3, 4, 5 ], without = [ 1, 2, 3, 5 ]) == 4
+    assert random_element([ 1, 2 ], without = [ 1, 2 ]) is None
+    assert random_element([], without = [ 1 ]) is None
+
+    table = AliasTable([ 1.0, 0.0, 1.0 ])
+    assert random_element([ 1, 2, 3 ], without = { 1 }, alias_table = table) == 3
+
+@repeater(5)
+def test_random_word():
+    vocabulary = new_vocabulary()
+
+    assert vocabulary.random_word(without = { "a", "b" }) == "c"
+    assert vocabulary.random_word(without = { "a", "b", "c" }) is None
+    assert Vocabulary().random_word(weighted = True) is None
+
+def test_random_word_weighted():
+    vocabulary = new_vocabulary()
+    draws = [ vocabulary.random_word(weighted = True) for _ in range(1000) ]
+
+    assert draws.count("a") > 800
+
+@repeater(5)
+def test_sample():
+    vocabulary = new_vocabulary()
+
+    assert sorted(vocabulary.sample(3)) == [ "a", "b", "c" ]
+    assert vocabulary.sample(1, without = [ "a", "b" ]) == [ "c" ]
+    assert len(set(vocabulary.sample(2, weighted = True))) == 2
+
+    with pytest.raises(ValueError):
+        vocabulary.sample(3, without = [ "a" ])
+
+def test_sample_after_add_words():
+    vocabulary = new_vocabulary()
+    vocabulary.sample(1, weighted = True)
+
+    vocabulary.add_words([ "d" ])
+
+    assert vocabulary.random_word(without = { "a", "b", "c" }) == "d"
+    assert "d" in vocabulary.wordlist()
+
+def test_documents():
+    vocabulary = Vocabulary(record_documents = True)
+    vocabulary.add_words_from("b a b")
+    vocabulary.add_words_from("c a")
+
+    assert vocabulary.wordlist() == [ "b", "a", "c" ]
+    assert vocabulary.index_of("c") == 2
+    assert vocabulary.index_of("d") is None
+    assert vocabulary.n_documents() == 2
+    assert list(vocabulary.document(0)) == [ 0, 1 ]
+    assert list(vocabulary.document(1)) == [ 1, 2 ]
+    assert vocabulary.document_frequencies() == [ 1, 2, 1 ]
+
+def test_documents_not_recorded(tmp_path):
+    vocabulary = Vocabulary()
+    vocabulary.add_words_from("b a b")
+
+    assert vocabulary.words == { "b": 2, "a": 1 }
+    assert vocabulary.n_documents() == 0
+    assert vocabulary.document_frequencies() == [ 0, 0 ]
+
+    path = str(tmp_path / "snapshot.vocabulary")
+    vocabulary.save(path)
+
+    for use_mmap in [True, False]:
+        loaded = Vocabulary.load(path, use_mmap = use_mmap)
+
+        assert loaded.wordlist() == [ "a", "b" ]
+        assert loaded.n_documents() == 0
+
+def new_documents_vocabulary():
+    vocabulary = Vocabulary(record_documents = True)
+    vocabulary.add_words_from("b a b")
+    vocabulary.add_words_from("c a")
+    vocabulary.add_words_from("ä c")
+    return vocabulary
+
+def test_save_load(tmp_path):
+    vocabulary = new_documents_vocabulary()
+
+    path = str(tmp_path / "snapshot.vocabulary")
+    vocabulary.save(path)
+
+    for use_mmap in [True, False]:
+        loaded = Vocabulary.load(path, use_mmap = use_mmap)
+
+        # Words are stored sorted
+        assert loaded.wordlist() == [ "a", "b", "c", "ä" ]
+        assert loaded.words == vocabulary.words
+        assert loaded.n_documents() == 3
+        assert [
+                sorted(loaded.wordlist()[i] for i in loaded.document(d))
+                for d in range(3)
+                ] == [ [ "a", "b" ], [ "a", "c" ], [ "c", "ä" ] ]
+        assert loaded.document_frequencies() == [ 2, 1, 2, 1 ]
+        assert loaded.random_word(without = { "a", "b", "c" }, weighted = True) == "ä"
+
+def test_load_then_add(tmp_path):
+    path = str(tmp_path / "snapshot.vocabulary")
+    new_documents_vocabulary().save(path)
+
+    vocabulary = Vocabulary.load(path, record_documents = True)
+    vocabulary.add_words_from("d a")
+
+    assert vocabulary.n_documents() == 4
+    assert list(vocabulary.document(3)) == [ 0, 4 ]
+
+    # Saved snapshot is unchanged
+    assert Vocabulary.load(path).n_documents() == 3
+
+def test_pickle_loaded(tmp_path):
+    path = str(tmp_path / "snapshot.vocabulary")
+    new_documents_vocabulary().save(path)
+
+    vocabulary = pickle.loads(
+            pickle.dumps(
+                Vocabulary.load(path)
+                )
+            )
+
+    assert vocabulary.n_documents() == 3
+    assert vocabulary.document_frequencies() == [ 2, 1, 2, 1 ]
+
+def test_load_invalid(tmp_path):
+    path = tmp_path / "snapshot.vocabulary"
+    path.write_bytes(bytes(64))
+
+    with pytest.raises(ValueError):
+        Vocabulary.load(str(path))